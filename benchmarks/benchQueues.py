@@ -0,0 +1,71 @@
+"""
+    Compare the in-process queues of the IRC with the multiprocessing.Manager queues it used before.
+
+    Measures IRC construction time and the put -> get latency of a command crossing a queue
+    (half of a ping-pong round trip between two threads).
+
+    Usage: python benchmarks/benchQueues.py [messages]
+"""
+import multiprocessing
+import sys
+import threading
+import time
+
+from twitchirc.irc import IRC
+from twitchirc.queues import threadQueue
+
+COMMAND = "PRIVMSG #channel :this is a pretty average chat message Kappa\r\n"
+
+
+def startup(name, newFactory, count=5):
+    start = time.time()
+    for _ in xrange(count):
+        IRC("oauth:token", "username", queueFactory=newFactory())
+    elapsed = (time.time() - start) / count
+    print "{:<10} startup        {:>10.3f} ms/instance".format(name, elapsed * 1000)
+
+
+def latency(name, factory, count):
+    ping = factory()
+    pong = factory()
+    latencies = []
+
+    def echo():
+        for _ in xrange(count):
+            pong.put(ping.get())
+
+    t = threading.Thread(target=echo)
+    t.start()
+    for _ in xrange(count):
+        start = time.time()
+        ping.put(COMMAND)
+        pong.get()
+        latencies.append((time.time() - start) / 2)
+    t.join()
+
+    latencies.sort()
+    print "{:<10} put->get       {:>10.1f} us p50  {:>10.1f} us p99".format(
+        name, latencies[len(latencies) // 2] * 1e6, latencies[int(len(latencies) * .99)] * 1e6)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    startup("thread", lambda: threadQueue)
+    latency("thread", threadQueue, count)
+
+    # the old behaviour: one Manager process per IRC instance
+    managers = []
+
+    def newManager():
+        managers.append(multiprocessing.Manager())
+        return managers[-1].Queue
+
+    startup("process", newManager)
+    latency("process", newManager(), count)
+    for manager in managers:
+        manager.shutdown()
+
+
+if __name__ == '__main__':
+    main()
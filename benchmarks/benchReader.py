@@ -0,0 +1,74 @@
+"""
+    Compare the old byte-at-a-time readline with the buffered LineReader.
+
+    A writer thread pushes PRIVMSG lines through a local socket pair while the reader counts lines/sec.
+
+    Usage: python benchmarks/benchReader.py [lines]
+"""
+import socket
+import sys
+import threading
+import time
+
+from twitchirc.reader import LineReader
+
+LINE = ":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :this is a pretty average chat message Kappa\r\n"
+
+
+def byteReadline(conn):
+    # the pre-LineReader IRC.__readline implementation
+    line = []
+    while True:
+        c = conn.recv(1)
+        if c == '\n' or c == '':
+            break
+        else:
+            line.append(c)
+
+    size = len(line) - 1
+    if size > 0 and line[size] == '\r':
+        del line[size]
+
+    return ''.join(line)
+
+
+def writer(conn, count):
+    chunk = LINE * 1000
+    for _ in xrange(count // 1000):
+        conn.sendall(chunk)
+    conn.close()
+
+
+def run(name, readline, count):
+    server, client = socket.socketpair()
+    t = threading.Thread(target=writer, args=(server, count))
+    t.start()
+
+    start = time.time()
+    for _ in xrange(count):
+        readline(client)
+    elapsed = time.time() - start
+
+    t.join()
+    client.close()
+    print "{:<12} {:>10} lines in {:.3f}s  {:>12,.0f} lines/sec".format(name, count, elapsed, count / elapsed)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    run("recv(1)", byteReadline, count)
+
+    readers = {}
+
+    def bufferedReadline(conn):
+        reader = readers.get(conn)
+        if reader is None:
+            reader = readers[conn] = LineReader(conn)
+        return reader.readline()
+
+    run("LineReader", bufferedReadline, count)
+
+
+if __name__ == '__main__':
+    main()
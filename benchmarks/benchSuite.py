@@ -0,0 +1,269 @@
+"""
+    Benchmark the receive and send pipelines with a mixed traffic corpus (see corpus.py).
+
+    parse       tokenize lines and read a tag, lines/sec
+    dispatch    IRC.onResponse with every callback overridden, lines/sec
+    recv        lines pushed by a local FakeTMIServer through the IRC recv thread, lines/sec
+    memory      bytes retained per tokenized line with its Tags
+    send        sendMessage -> server -> other client latency while the send limiter is saturated
+
+    Results are printed and written as JSON, so runs of different versions can be compared:
+
+    Usage: python benchmarks/benchSuite.py [--lines N] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+from corpus import generate, USERNAME
+from twitchirc.fakeserver import FakeTMIServer
+from twitchirc.irc import IRC
+from twitchirc.parser import tokenize, Tags
+from twitchirc.ratelimit import RateLimiter, monotonic
+
+# higher is better for these metrics, lower for the rest
+HIGHER_IS_BETTER = ("lines_per_sec",)
+
+
+class NullBot(IRC):
+    """
+        Bot whose callbacks take tags and do nothing, so dispatch cost is measured without bot code
+    """
+
+    def onMessage(self, channel, viewer, message, tags=None):
+        pass
+
+    def onCommand(self, channel, viewer, command, value, tags=None):
+        pass
+
+    def onJoinPart(self, channel, viewer, state, tags=None):
+        pass
+
+    def onMode(self, channel, viewer, opcode, tags=None):
+        pass
+
+    def onNotice(self, channel, msgid, message, tags=None):
+        pass
+
+    def onHostTarget(self, hosting, target, amount, tags=None):
+        pass
+
+    def onClearChat(self, channel, viewer, tags=None):
+        pass
+
+    def onUserNotice(self, channel, message, tags=None):
+        pass
+
+    def onUserState(self, channel, tags=None):
+        pass
+
+    def onRoomState(self, channel, tags=None):
+        pass
+
+    def onIRCInfo(self, line, tags=None):
+        pass
+
+
+class MessageBot(IRC):
+    """
+        Bot that only overrides the message callbacks, the lines of the others are dropped unparsed
+    """
+
+    def onMessage(self, channel, viewer, message, tags=None):
+        pass
+
+    def onCommand(self, channel, viewer, command, value, tags=None):
+        pass
+
+
+class CountingBot(NullBot):
+    def __init__(self, *args, **kwargs):
+        super(CountingBot, self).__init__(*args, **kwargs)
+        self.expected = 0
+        self.count = 0
+        self.done = threading.Event()
+
+    def onResponse(self, line):
+        super(CountingBot, self).onResponse(line)
+        self.count += 1
+        if self.count == self.expected:
+            self.done.set()
+
+
+class LatencyBot(IRC):
+    def __init__(self, *args, **kwargs):
+        super(LatencyBot, self).__init__(*args, **kwargs)
+        self.latencies = []
+        self.expected = 0
+        self.done = threading.Event()
+
+    def onMessage(self, channel, viewer, message):
+        self.latencies.append(monotonic() - float(message))
+        if len(self.latencies) == self.expected:
+            self.done.set()
+
+
+def rate(count, elapsed):
+    return {"lines": count, "secs": round(elapsed, 4), "lines_per_sec": round(count / elapsed)}
+
+
+def benchParse(corpus):
+    start = time.time()
+    for line in corpus:
+        tags, prefix, command, params = tokenize(line)
+        if tags:
+            Tags(tags).get("display-name")
+    return rate(len(corpus), time.time() - start)
+
+
+def benchDispatch(corpus, botClass=NullBot):
+    bot = botClass("oauth:token", USERNAME, tags=True)
+    onResponse = bot.onResponse
+    start = time.time()
+    for line in corpus:
+        onResponse(line)
+    return rate(len(corpus), time.time() - start)
+
+
+def benchRecv(corpus):
+    server = FakeTMIServer()
+    server.start()
+    bot = CountingBot("oauth:token", USERNAME, tags=True)
+    bot.expected = len(corpus)
+    try:
+        bot.connect(timeout=5, host="127.0.0.1", port=server.port)
+        server.waitForClients(1)
+        chunks = ["\r\n".join(corpus[i:i + 1000]) + "\r\n" for i in xrange(0, len(corpus), 1000)]
+
+        start = time.time()
+        for chunk in chunks:
+            server.sendRaw(chunk)
+        bot.done.wait(60)
+        return rate(bot.count, time.time() - start)
+    finally:
+        bot.shutdown()
+        server.stop()
+
+
+def deepSize(obj, seen):
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (tuple, list, set)):
+        size += sum(deepSize(item, seen) for item in obj)
+    elif isinstance(obj, dict):
+        size += sum(deepSize(k, seen) + deepSize(v, seen) for k, v in obj.iteritems())
+    elif isinstance(obj, Tags):
+        # tags are parsed lazily, count the parsed dict only if something read them
+        size += deepSize(obj.raw, seen) + deepSize(getattr(obj, "_Tags__tags", None), seen)
+    return size
+
+
+def benchMemory(corpus):
+    events = []
+    for line in corpus:
+        tags, prefix, command, params = tokenize(line)
+        events.append((Tags(tags) if tags else None, prefix, command, params))
+
+    gc.collect()
+    seen = set(id(line) for line in corpus)  # the lines themselves are input, not retained per event
+    total = sum(deepSize(event, seen) for event in events)
+    return {"events": len(events), "bytes_per_event": round(float(total) / len(events), 1)}
+
+
+def benchSend(messages=600, limit=200, offered=400):
+    """
+    Send `messages` at `offered`/sec through a limiter of `limit`/sec, so the send queue builds up
+    """
+    server = FakeTMIServer()
+    server.start()
+    receiver = LatencyBot("oauth:token", "receiver")
+    receiver.expected = messages
+    sender = IRC("oauth:token", USERNAME, sendLimiter=RateLimiter(limit, 1.0))
+    try:
+        receiver.joinChannel("latency")
+        receiver.connect(timeout=5, host="127.0.0.1", port=server.port)
+        server.waitForClients(1, "latency")
+        sender.connect(timeout=5, host="127.0.0.1", port=server.port)
+        sender.getSendQueue().setModerator("latency", True)
+
+        start = monotonic()
+        for i in xrange(messages):
+            time.sleep(max(0, start + float(i) / offered - monotonic()))
+            sender.sendMessage("latency", repr(monotonic()))
+        receiver.done.wait(60)
+
+        latencies = sorted(receiver.latencies)
+        percentile = lambda p: round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 3)
+        return {"messages": len(latencies), "limit_per_sec": limit, "offered_per_sec": offered,
+                "p50_ms": percentile(0.5), "p99_ms": percentile(0.99), "max_ms": percentile(1)}
+    finally:
+        sender.shutdown()
+        receiver.shutdown()
+        server.stop()
+
+
+def compare(results, baseline):
+    print
+    print "{:<10} {:<16} {:>14} {:>14} {:>8}".format("bench", "metric", "baseline", "current", "change")
+    for name, metrics in sorted(results.iteritems()):
+        for metric, value in sorted(metrics.iteritems()):
+            old = baseline.get(name, {}).get(metric)
+            if not old or metric not in HIGHER_IS_BETTER + ("bytes_per_event", "p50_ms", "p99_ms", "max_ms"):
+                continue
+            change = (value - old) / float(old) * 100
+            better = (change > 0) == (metric in HIGHER_IS_BETTER)
+            print "{:<10} {:<16} {:>14} {:>14} {:>+7.1f}%{}".format(name, metric, old, value, change,
+                                                                    "" if better or not change else " !")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the twitchirc pipelines")
+    parser.add_argument("--lines", type=int, default=100000, help="corpus size")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--only", nargs="*", help="benchmarks to run")
+    args = parser.parse_args()
+
+    corpus = generate(args.lines)
+    benches = [("parse", lambda: benchParse(corpus)),
+               ("dispatch", lambda: benchDispatch(corpus)),
+               ("dispatch_messages", lambda: benchDispatch(corpus, MessageBot)),
+               ("recv", lambda: benchRecv(corpus)),
+               ("memory", lambda: benchMemory(corpus[:20000])),
+               ("send", benchSend)]
+
+    # the IRC prints every command it sends, keep it out of the results
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    results = {}
+    try:
+        for name, bench in benches:
+            if args.only and name not in args.only:
+                continue
+            results[name] = bench()
+            print >> sys.stderr, "{:<10} {}".format(name, json.dumps(results[name], sort_keys=True))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    report = {"python": platform.python_version(), "platform": platform.platform(), "time": int(time.time()),
+              "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        print json.dumps(report, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)["results"])
+
+
+if __name__ == '__main__':
+    main()
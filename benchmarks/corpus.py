@@ -0,0 +1,78 @@
+"""
+    Deterministic mixed Twitch IRC traffic for the benchmarks.
+
+    The mix follows a busy channel with tags requested: mostly PRIVMSGs, some bot commands and membership
+    events, and the occasional NOTICE, CLEARCHAT, HOSTTARGET, USERNOTICE and state lines.
+"""
+import random
+
+USERNAME = "benchbot"
+CHANNELS = ["channel{}".format(i) for i in xrange(20)]
+VIEWERS = ["viewer{}".format(i) for i in xrange(500)]
+WORDS = ["Kappa", "PogChamp", "hello", "this", "is", "a", "pretty", "average", "chat", "message", "LUL", "gg",
+         "what", "happened", "there", "clip", "it", "ResidentSleeper", "monkaS", "4Head"]
+
+PRIVMSG_TAGS = ("@badges=subscriber/12,premium/1;color=#1E90FF;display-name={viewer};emotes=25:0-4;"
+                "id=b34ccfc7-4977-403a-8a94-33c6bac34fb8;mod=0;room-id=1337;subscriber=1;tmi-sent-ts=1507246572675;"
+                "turbo=0;user-id={userId};user-type= ")
+
+# (weight, kind)
+MIX = [(70, "privmsg"),
+       (10, "tagless"),
+       (5, "command"),
+       (5, "join"),
+       (2, "part"),
+       (2, "notice"),
+       (2, "clearchat"),
+       (1, "hosttarget"),
+       (1, "usernotice"),
+       (1, "roomstate"),
+       (1, "mode")]
+
+
+def _message(rand):
+    return " ".join(rand.choice(WORDS) for _ in xrange(rand.randint(1, 12)))
+
+
+def _line(kind, rand):
+    channel = rand.choice(CHANNELS)
+    viewer = rand.choice(VIEWERS)
+    user = ":{0}!{0}@{0}.tmi.twitch.tv".format(viewer)
+
+    if kind == "privmsg":
+        return PRIVMSG_TAGS.format(viewer=viewer, userId=rand.randint(1, 10 ** 8)) + \
+               "{} PRIVMSG #{} :{}".format(user, channel, _message(rand))
+    if kind == "tagless":
+        return "{} PRIVMSG #{} :{}".format(user, channel, _message(rand))
+    if kind == "command":
+        return PRIVMSG_TAGS.format(viewer=viewer, userId=rand.randint(1, 10 ** 8)) + \
+               "{} PRIVMSG #{} :!{} {}".format(user, channel, rand.choice(WORDS).lower(), _message(rand))
+    if kind == "join":
+        return "{} JOIN #{}".format(user, channel)
+    if kind == "part":
+        return "{} PART #{}".format(user, channel)
+    if kind == "notice":
+        return "@msg-id=slow_on :tmi.twitch.tv NOTICE #{} :This room is now in slow mode.".format(channel)
+    if kind == "clearchat":
+        return "@ban-duration=600;ban-reason= :tmi.twitch.tv CLEARCHAT #{} :{}".format(channel, viewer)
+    if kind == "hosttarget":
+        return ":tmi.twitch.tv HOSTTARGET #{} :{} {}".format(channel, rand.choice(CHANNELS), rand.randint(0, 9999))
+    if kind == "usernotice":
+        return ("@badges=subscriber/6;login={0};msg-id=resub;msg-param-months=6;system-msg=6\\smonths :tmi.twitch.tv "
+                "USERNOTICE #{1} :{2}".format(viewer, channel, _message(rand)))
+    if kind == "roomstate":
+        return "@broadcaster-lang=;r9k=0;slow=0;subs-only=0 :tmi.twitch.tv ROOMSTATE #{}".format(channel)
+    if kind == "mode":
+        return ":jtv MODE #{} {} {}".format(channel, rand.choice(("+o", "-o")), viewer)
+    raise ValueError(kind)
+
+
+def generate(count, seed=0):
+    """
+    :param int count: amount of lines
+    :param seed: random seed, the same seed always gives the same corpus
+    :return: list of lines without the trailing newline
+    """
+    rand = random.Random(seed)
+    kinds = [kind for weight, kind in MIX for _ in xrange(weight)]
+    return [_line(rand.choice(kinds), rand) for _ in xrange(count)]
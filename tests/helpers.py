@@ -0,0 +1,40 @@
+"""
+    Helpers shared by the tests
+"""
+import time
+
+
+class FakeClock(object):
+    """
+        Clock that only moves when a test moves it. Give `sleep` to code that sleeps on the clock
+    """
+
+    def __init__(self, now=0.0, step=0):
+        """
+        :param float now: starting time
+        :param float step: secs the clock advances on every read
+        """
+        self.now = now
+        self.step = step
+        self.slept = []
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+    def sleep(self, secs):
+        self.slept.append(secs)
+        self.now += secs
+
+
+def waitUntil(predicate, timeout=5):
+    """
+    Poll until the predicate is true
+    :return: False if it wasn't true within the timeout
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
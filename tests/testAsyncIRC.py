@@ -0,0 +1,195 @@
+import errno
+import socket
+import threading
+import unittest
+
+import twitchirc.irc
+from twitchirc.asyncirc import AsyncIRC, loop
+from twitchirc.exception import AuthenticationError, IllegalArgumentError
+from twitchirc.fakeserver import FakeTMIServer
+
+WELCOME = ":tmi.twitch.tv 001 testuser :Welcome, GLHF!\r\n:tmi.twitch.tv 376 testuser :>\r\n"
+CAPS = ":tmi.twitch.tv CAP * ACK :twitch.tv/membership\r\n:tmi.twitch.tv CAP * ACK :twitch.tv/commands\r\n"
+
+
+class MiniServer(object):
+    """
+        Accepts connections and answers the login of each one with the lines given
+    """
+
+    def __init__(self, login, afterJoin=""):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]
+        self.login = login
+        self.afterJoin = afterJoin
+        self.received = []
+
+    def serve(self, clients):
+        threads = []
+        for _ in xrange(clients):
+            conn, addr = self.sock.accept()
+            t = threading.Thread(target=self.__handle, args=(conn,))
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+        self.sock.close()
+
+    def __handle(self, conn):
+        data = ""
+        while "NICK" not in data:
+            data += conn.recv(1024)
+        conn.sendall(self.login)
+
+        while "JOIN" not in data and self.afterJoin:
+            data += conn.recv(1024)
+        conn.sendall(self.afterJoin)
+
+        while True:
+            chunk = conn.recv(1024)
+            if not chunk:
+                break
+            data += chunk
+        self.received.append(data)
+        conn.close()
+
+
+class FlakyAsyncIRC(AsyncIRC):
+    """
+        Fails to connect `failures` times
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(FlakyAsyncIRC, self).__init__(*args, **kwargs)
+        self.failures = 0
+
+    def createSocket(self):
+        if self.failures:
+            self.failures -= 1
+            raise socket.error(errno.ECONNREFUSED, "Connection refused")
+        return super(FlakyAsyncIRC, self).createSocket()
+
+
+class TestAsyncIRC(unittest.TestCase):
+    def test_connections_share_one_loop(self):
+        messages = []
+
+        class TESTIRC(AsyncIRC):
+            def onMessage(self, channel, viewer, message):
+                messages.append((self.getUsername(), channel, viewer, message))
+                if len(messages) == 2:
+                    for bot in bots:
+                        bot.shutdown()
+
+        server = MiniServer(WELCOME + CAPS, ":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :ping\r\n")
+        t = threading.Thread(target=server.serve, args=(2,))
+        t.start()
+
+        socketMap = {}
+        bots = [TESTIRC("noauth", "testuser", socketMap=socketMap) for _ in xrange(2)]
+        for bot in bots:
+            bot.joinChannel("channel")
+            bot.connect(timeout=5, host="127.0.0.1", port=server.port, block=False)
+        loop(socketMap)
+        t.join()
+
+        self.assertEqual(messages, [("testuser", "channel", "viewer", "ping")] * 2)
+        for data in server.received:
+            self.assertTrue(data.startswith("PASS noauth\r\nNICK testuser\r\nCAP REQ :twitch.tv/membership\r\n"))
+            self.assertIn("JOIN #channel\r\n", data)
+
+    def test_login_failure(self):
+        server = MiniServer(":tmi.twitch.tv NOTICE * :Login authentication failed\r\n")
+        t = threading.Thread(target=server.serve, args=(1,))
+        t.start()
+
+        bot = AsyncIRC("noauth", "testuser", socketMap={})
+        self.assertRaises(AuthenticationError, bot.connect, 5, "127.0.0.1", server.port)
+        t.join()
+
+    def test_login_waits_on_every_capability(self):
+        unknown = []
+
+        class TESTIRC(AsyncIRC):
+            def onResponse(self, line):
+                unknown.append(line)
+
+        # the ACKs arrive after the MOTD and the server PINGs before the login is done
+        server = MiniServer(WELCOME + "PING :tmi.twitch.tv\r\n" + CAPS)
+        t = threading.Thread(target=server.serve, args=(1,))
+        t.start()
+
+        socketMap = {}
+        bot = TESTIRC("noauth", "testuser", socketMap=socketMap)
+        try:
+            bot.connect(timeout=5, host="127.0.0.1", port=server.port)
+            loop(socketMap, count=1)  # writes the PONG
+            self.assertTrue(bot.isConnected())
+            self.assertEqual(unknown, [])
+            timings = bot.getConnectTimings()
+            for phase in ("tcp", "welcome", "login", "caps", "total"):
+                self.assertIn(phase, timings)
+            self.assertGreaterEqual(timings["total"], timings["caps"])
+        finally:
+            bot.shutdown()
+        t.join()
+        self.assertIn("PONG :tmi.twitch.tv\r\n", server.received[0])
+
+    def test_constructor_matches_irc(self):
+        bot = AsyncIRC("noauth", "testuser", False, True, "?", socketMap={})
+        self.assertEqual(bot.cmdShebang, "?")
+        for kwargs in ({"overrideSend": True}, {"tls": True}, {"dispatcher": object()}, {"queueFactory": list}):
+            self.assertRaises(IllegalArgumentError, AsyncIRC, "noauth", "testuser", **kwargs)
+
+    def test_reconnect(self):
+        server = FakeTMIServer()
+        server.start()
+        socketMap = {}
+        bot = AsyncIRC("noauth", "testuser", socketMap=socketMap)
+        try:
+            request = bot.joinChannels(["channel"])
+            bot.connect(timeout=5, host="127.0.0.1", port=server.port)
+            while not request.done():
+                loop(socketMap, count=1)
+
+            server.reconnect()
+            while len(server.getClients("channel")) != 1:
+                loop(socketMap, count=1)
+            self.assertTrue(bot.isConnected())
+        finally:
+            bot.shutdown()
+            server.stop()
+
+    def test_lost_connection_reconnects_with_backoff(self):
+        reconnectDelay = twitchirc.irc.RECONNECT_DELAY
+        twitchirc.irc.RECONNECT_DELAY = 0.01
+        server = FakeTMIServer()
+        server.start()
+        socketMap = {}
+        bot = FlakyAsyncIRC("noauth", "testuser", socketMap=socketMap)
+        try:
+            request = bot.joinChannels(["channel"])
+            bot.connect(timeout=5, host="127.0.0.1", port=server.port)
+            while not request.done():
+                loop(socketMap, count=1)
+
+            bot.failures = 1
+            server.getClients()[0].conn.shutdown(socket.SHUT_RDWR)  # connection lost without a RECONNECT
+            while len(server.getClients("channel")) != 1 or not bot.isConnected():
+                loop(socketMap, count=1)
+
+            snapshot = bot.getMetrics().snapshot()
+            self.assertEqual(snapshot["reconnects_total"], 1)
+            self.assertEqual(snapshot["reconnect_failures_total"], 1)
+            self.assertTrue(snapshot["bytes_received_total"] > 0)
+            self.assertTrue(snapshot["bytes_sent_total"] > 0)
+        finally:
+            twitchirc.irc.RECONNECT_DELAY = reconnectDelay
+            bot.shutdown()
+            server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -45,6 +45,31 @@ class TestCallbacks(unittest.TestCase):
         chat = TESTIRC("noauth", TestCallbacks.USER)
         chat.onResponse(msg)
 
+    def test_on_message_with_tags(self):
+        MESSAGE = "testmessage"
+        func = inspect.stack()[0][3]
+
+        def callback(irc, channel, viewer, message, tags):
+            self.assertIsNotNone(irc)
+            self.assertEqual(channel, TestCallbacks.CHANNEL)
+            self.assertEqual(viewer, TestCallbacks.VIEWER)
+            self.assertEqual(message, MESSAGE)
+            self.assertEqual(tags["user-id"], "1337")
+            self.assertEqual(tags["display-name"], "Test Viewer")
+            self.assertEqual(tags.getBadges(), {"moderator": "1"})
+            TestCallbacks.tests[func] = True
+
+        class TESTIRC(IRC):
+            def onMessage(self, channel, viewer, message, tags=None):
+                callback(self, channel, viewer, message, tags)
+
+        msg = "@badges=moderator/1;display-name=Test\\sViewer;user-id=1337 " \
+              ":{viewer}!{viewer}@{viewer}.tmi.twitch.tv PRIVMSG #{channel} :{message}".format(
+            viewer=TestCallbacks.VIEWER, channel=TestCallbacks.CHANNEL, message=MESSAGE)
+
+        chat = TESTIRC("noauth", TestCallbacks.USER, tags=True)
+        chat.onResponse(msg)
+
     def test_on_command(self):
         SHEBANG = "!"
         COMMAND = "command"
@@ -93,6 +118,31 @@ class TestCallbacks(unittest.TestCase):
         chat = TESTIRC("noauth", TestCallbacks.USER, cmdShebang=SHEBANG)
         chat.onResponse(msg)
 
+    def test_on_command_with_regex_shebang(self):
+        SHEBANG = '^'
+        COMMAND = "caretcommand"
+        VALUE = "caretvalue"
+        func = inspect.stack()[0][3]
+
+        def callback(irc, channel, viewer, command, value):
+            self.assertIsNotNone(irc)
+            self.assertEqual(channel, TestCallbacks.CHANNEL)
+            self.assertEqual(viewer, TestCallbacks.VIEWER)
+            self.assertEqual(command, COMMAND)
+            self.assertEqual(value, VALUE)
+            TestCallbacks.tests[func] = True
+
+        class TESTIRC(IRC):
+            def onCommand(self, channel, viewer, command, value):
+                callback(self, channel, viewer, command, value)
+
+        msg = ":{viewer}!{viewer}@{viewer}.tmi.twitch.tv PRIVMSG #{channel} :{shebang}{command} {value}".format(
+            viewer=TestCallbacks.VIEWER, channel=TestCallbacks.CHANNEL, shebang=SHEBANG, command=COMMAND, value=VALUE)
+
+        chat = TESTIRC("noauth", TestCallbacks.USER)
+        chat.cmdShebang = SHEBANG
+        chat.onResponse(msg)
+
     def test_on_join(self):
         func = inspect.stack()[0][3]
 
@@ -0,0 +1,73 @@
+import threading
+import unittest
+
+from twitchirc.dispatch import CallbackDispatcher, DROP_NEWEST, DROP_OLDEST
+from twitchirc.irc import IRC
+
+
+class TestCallbackDispatcher(unittest.TestCase):
+    def test_callbacks_of_a_channel_run_in_order(self):
+        dispatcher = CallbackDispatcher(workers=4)
+        seen = {}
+
+        def callback(channel, i):
+            seen.setdefault(channel, []).append(i)
+
+        for i in xrange(200):
+            for channel in ("first", "second", "third"):
+                dispatcher.submit(channel, callback, channel, i)
+        dispatcher.join()
+        dispatcher.stop()
+
+        self.assertEqual(seen, dict((channel, range(200)) for channel in ("first", "second", "third")))
+
+    def test_slow_channel_does_not_block_other_channels(self):
+        dispatcher = CallbackDispatcher(workers=2)
+        release = threading.Event()
+        done = threading.Event()
+
+        # find a key on a different worker than "slow"
+        other = next(key for key in xrange(10) if hash(key) % 2 != hash("slow") % 2)
+        dispatcher.submit("slow", release.wait, 5)
+        dispatcher.submit(other, done.set)
+        self.assertTrue(done.wait(5))
+        release.set()
+        dispatcher.stop()
+
+    def test_drop_policies(self):
+        for policy, expected in ((DROP_NEWEST, [0, 1]), (DROP_OLDEST, [2, 3])):
+            dispatcher = CallbackDispatcher(workers=1, maxsize=2, policy=policy)
+            release = threading.Event()
+            ran = []
+            dispatcher.submit(None, release.wait, 5)  # keep the worker busy while the queue fills up
+            while dispatcher.qsize():
+                pass
+            for i in xrange(4):
+                dispatcher.submit(None, ran.append, i)
+            release.set()
+            dispatcher.join()
+            dispatcher.stop()
+
+            self.assertEqual(ran, expected)
+            self.assertEqual(dispatcher.getDropped(), 2)
+
+    def test_irc_runs_callbacks_on_workers(self):
+        ran = []
+
+        class TESTIRC(IRC):
+            def onMessage(self, channel, viewer, message):
+                ran.append((threading.current_thread(), channel, viewer, message))
+
+        dispatcher = CallbackDispatcher(workers=2)
+        chat = TESTIRC("noauth", "testuser", dispatcher=dispatcher)
+        chat.onResponse(":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :hello")
+        dispatcher.join()
+        dispatcher.stop()
+
+        self.assertEqual(len(ran), 1)
+        self.assertIsNot(ran[0][0], threading.current_thread())
+        self.assertEqual(ran[0][1:], ("channel", "viewer", "hello"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import pickle
+import time
+import unittest
+
+from twitchirc.events import Message, Command, JoinPart, Mode, Notice, HostTarget, ClearChat, UserNotice, \
+    UserState, RoomState, IRCInfo
+from twitchirc.irc import IRC
+from twitchirc.shard import ShardedIRC
+
+
+class EventIRC(IRC):
+    def __init__(self, *args, **kwargs):
+        super(EventIRC, self).__init__(*args, **kwargs)
+        self.events = []
+        self.messages = []
+
+    def onMessage(self, channel, viewer, message):
+        self.messages.append(message)
+
+    def onEvent(self, event):
+        self.events.append(event)
+
+
+class EventHandler(object):
+    def __init__(self):
+        self.events = []
+
+    def onEvent(self, event):
+        self.events.append(event)
+
+
+class TestEvents(unittest.TestCase):
+    def setUp(self):
+        self.irc = EventIRC("oauth:abcdefghijklmnopqrstuvwxyz", "username", tags=True)
+
+    def event(self, line):
+        self.irc.onResponse(line)
+        return self.irc.events[-1]
+
+    def test_events(self):
+        line = "@display-name=Viewer :viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :hello there"
+        event = self.event(line)
+        self.assertIsInstance(event, Message)
+        self.assertEqual((event.channel, event.viewer, event.message), ("channel", "viewer", "hello there"))
+        self.assertEqual(event.line, line)
+        self.assertEqual(event.tags["display-name"], "Viewer")
+        self.assertTrue(event.time > 0)
+        self.assertEqual(self.irc.messages, ["hello there"])  # the callback still runs
+
+        event = self.event(":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :!uptime now")
+        self.assertIsInstance(event, Command)
+        self.assertEqual((event.command, event.value), ("uptime", "now"))
+
+        event = self.event(":viewer!viewer@viewer.tmi.twitch.tv PART #channel")
+        self.assertEqual(event, JoinPart(event.line, event.time, event.tags, "channel", "viewer", IRC.PART))
+
+        event = self.event(":jtv MODE #channel +o viewer")
+        self.assertIsInstance(event, Mode)
+        self.assertEqual((event.viewer, event.opcode), ("viewer", IRC.OP))
+
+        event = self.event("@msg-id=slow_on :tmi.twitch.tv NOTICE #channel :This room is now in slow mode.")
+        self.assertIsInstance(event, Notice)
+        self.assertEqual(event.msgid, "slow_on")
+
+        event = self.event(":tmi.twitch.tv HOSTTARGET #hosting :- 0")
+        self.assertIsInstance(event, HostTarget)
+        self.assertEqual((event.channel, event.target, event.amount), ("hosting", None, 0))
+
+        self.assertIsInstance(self.event(":tmi.twitch.tv CLEARCHAT #channel"), ClearChat)
+        self.assertIsInstance(self.event(":tmi.twitch.tv USERNOTICE #channel :resub"), UserNotice)
+        self.assertIsInstance(self.event(":tmi.twitch.tv USERSTATE #channel"), UserState)
+        self.assertIsInstance(self.event(":tmi.twitch.tv ROOMSTATE #channel"), RoomState)
+
+        event = self.event(":username.tmi.twitch.tv 366 username #channel :End of /NAMES list")
+        self.assertIsInstance(event, IRCInfo)
+        self.assertIsNone(event.channel)
+        self.assertEqual(event.info, "#channel :End of /NAMES list")
+
+    def test_time_is_the_receive_time(self):
+        class SlowIRC(EventIRC):
+            def onMessage(self, channel, viewer, message):
+                time.sleep(0.2)
+
+        irc = SlowIRC("oauth:abcdefghijklmnopqrstuvwxyz", "username")
+        start = time.time()
+        irc.onResponse(":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :hello")
+        self.assertLess(irc.events[0].time - start, 0.1)
+
+    def test_unknown_lines_have_no_event(self):
+        self.irc.onResponse(":tmi.twitch.tv CAP * ACK :twitch.tv/tags")
+        self.assertEqual(self.irc.events, [])
+
+    def test_slots(self):
+        event = self.event(":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :hello")
+        self.assertFalse(hasattr(event, "__dict__"))
+        self.assertRaises(AttributeError, setattr, event, "extra", 1)
+
+    def test_pickle(self):
+        event = self.event("@badges=moderator/1 :viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :hello")
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            copy = pickle.loads(pickle.dumps(event, protocol))
+            self.assertEqual(copy, event)
+            self.assertEqual(copy.tags["badges"], "moderator/1")
+
+    def test_sharded_handler(self):
+        handler = EventHandler()
+        pool = ShardedIRC("oauth:abcdefghijklmnopqrstuvwxyz", "username", handler, shards=1)
+        pool.getShards()[0].onResponse(":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :hello")
+        self.assertEqual([event.message for event in handler.events], ["hello"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 
+from twitchirc.exception import IllegalArgumentError
 from twitchirc.irc import IRC
 
 
@@ -42,5 +43,42 @@ class TestIRC(unittest.TestCase):
         self.assertTrue(exceptionRaised, "{} Exception was not raised".format(type(value)))
 
 
+class MessageIRC(IRC):
+    def __init__(self, *args, **kwargs):
+        super(MessageIRC, self).__init__(*args, **kwargs)
+        self.calls = []
+
+    def onMessage(self, channel, viewer, message):
+        self.calls.append(("onMessage", message))
+
+    def onJoinPart(self, channel, viewer, state):
+        self.calls.append(("onJoinPart", viewer))
+
+
+class TestCallbackSkipping(unittest.TestCase):
+    JOIN = ":viewer!viewer@viewer.tmi.twitch.tv JOIN #channel"
+    PRIVMSG = ":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :hello"
+
+    def test_overridden_callbacks_are_called(self):
+        irc = MessageIRC("oauthToken", "username")
+        irc.onResponse(self.JOIN)
+        irc.onResponse(self.PRIVMSG)
+        self.assertEqual(irc.calls, [("onJoinPart", "viewer"), ("onMessage", "hello")])
+
+    def test_lines_of_other_callbacks_are_dropped(self):
+        irc = MessageIRC("oauthToken", "username", callbacks=("onMessage",))
+        irc.onResponse(self.JOIN)
+        irc.onResponse(":tmi.twitch.tv HOSTTARGET #channel :- 0")
+        irc.onResponse(self.PRIVMSG)
+        self.assertEqual(irc.calls, [("onMessage", "hello")])
+
+        snapshot = irc.getMetrics().snapshot()
+        self.assertEqual(snapshot["lines_received_total"], {"JOIN": 1, "HOSTTARGET": 1, "PRIVMSG": 1})
+        self.assertEqual(snapshot["unknown_lines_total"], 0)
+
+    def test_unknown_callback_raises(self):
+        self.assertRaises(IllegalArgumentError, IRC, "oauthToken", "username", callbacks=("onMesage",))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,12 +1,185 @@
+import errno
+import itertools
+import socket
+import threading
+import time
 import unittest
 
+from tests.helpers import waitUntil
+import twitchirc.irc
+from twitchirc.exception import AuthenticationError
+from twitchirc.fakeserver import FakeTMIServer
+from twitchirc.irc import IRC, COMMAND_LIMIT
+from twitchirc.ratelimit import RateLimiter
+
+
+class RecordingIRC(IRC):
+    def __init__(self, *args, **kwargs):
+        super(RecordingIRC, self).__init__(*args, **kwargs)
+        self.messages = []
+        self.lock = threading.Lock()
+
+    def onMessage(self, channel, viewer, message):
+        with self.lock:
+            self.messages.append((channel, viewer, message))
+
+
+class FlakyIRC(RecordingIRC):
+    """
+        Fails to connect `failures` times
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(FlakyIRC, self).__init__(*args, **kwargs)
+        self.failures = 0
+
+    def createSocket(self):
+        if self.failures:
+            self.failures -= 1
+            raise socket.error(errno.ECONNREFUSED, "Connection refused")
+        return super(FlakyIRC, self).createSocket()
+
 
 class TestIRC(unittest.TestCase):
     def setUp(self):
-        pass
+        self.server = FakeTMIServer(tokens={"testuser": "oauth:token"})
+        self.server.start()
+        self.bot = FlakyIRC("oauth:token", "testuser")
+        self.reconnectDelay = twitchirc.irc.RECONNECT_DELAY
+        twitchirc.irc.RECONNECT_DELAY = 0.01
+
+    def tearDown(self):
+        twitchirc.irc.RECONNECT_DELAY = self.reconnectDelay
+        self.bot.shutdown()
+        self.server.stop()
+
+    def connect(self):
+        self.bot.connect(timeout=5, host="127.0.0.1", port=self.server.port)
 
     def test_login_passes_with_correct_password(self):
-        pass
+        self.connect()
+        self.assertTrue(self.server.waitForClients(1))
+        received = self.server.getReceived("testuser")
+        self.assertEqual(received[:2], ["PASS oauth:token", "NICK testuser"])
+        self.assertIn("CAP REQ :twitch.tv/membership", received)
+        self.assertIn("CAP REQ :twitch.tv/commands", received)
+
+    def test_login_is_pipelined(self):
+        bot = IRC("oauth:token", "testuser", tags=True)
+        try:
+            bot.connect(timeout=5, host="127.0.0.1", port=self.server.port)
+            self.assertTrue(self.server.waitForClients(1))
+            self.assertEqual(self.server.getReceived("testuser")[:5],
+                             ["PASS oauth:token", "NICK testuser", "CAP REQ :twitch.tv/membership",
+                              "CAP REQ :twitch.tv/commands", "CAP REQ :twitch.tv/tags"])
+
+            timings = bot.getConnectTimings()
+            self.assertEqual(sorted(timings), ["caps", "login", "tcp", "total", "welcome"])
+            self.assertTrue(timings["tcp"] <= timings["welcome"] <= timings["login"] <= timings["total"] < 1)
+            self.assertEqual(bot.getMetrics().snapshot()["login_seconds"]["count"], 1)
+        finally:
+            bot.shutdown()
+
+    def test_login_ignores_wall_clock_jumps(self):
+        jumps = itertools.count()
+        twitchirc.irc.timer = lambda: time.time() + 3600 * next(jumps)  # an hour later on every call
+        try:
+            self.connect()
+        finally:
+            twitchirc.irc.timer = time.time
+        self.assertTrue(self.server.waitForClients(1))
+        self.assertLess(self.bot.getConnectTimings()["total"], 1)
+
+    def test_login_fails_with_wrong_password(self):
+        bot = IRC("oauth:wrong", "testuser")
+        start = time.time()
+        self.assertRaises(AuthenticationError, bot.connect, 5, "127.0.0.1", self.server.port)
+        self.assertLess(time.time() - start, 1)
+        bot.close()
+
+    def test_joins_are_packed_and_confirmed(self):
+        request = self.bot.joinChannels(["first", "second"])
+        self.connect()
+        self.assertTrue(request.wait(5))
+        joins = [line for line in self.server.getReceived("testuser") if line.startswith("JOIN")]
+        self.assertEqual(len(joins), 1)
+        self.assertEqual(sorted(joins[0][5:].split(",")), ["#first", "#second"])
+
+    def test_parted_channels_are_not_joined(self):
+        bot = IRC("oauth:token", "testuser", joinLimiter=RateLimiter(1, 0.3))
+        try:
+            bot.connect(timeout=5, host="127.0.0.1", port=self.server.port)
+            request = bot.joinChannels(["first", "second"])
+            self.assertTrue(self.server.waitForClients(1, "first"))
+            bot.partChannels(["second"])  # while the join worker waits on the limiter
+            self.assertTrue(request.wait(1) is False and request.getFailed() == {"second"})
+
+            time.sleep(0.5)
+            joins = [line for line in self.server.getReceived("testuser") if line.startswith("JOIN")]
+            self.assertEqual(joins, ["JOIN #first"])
+            self.assertEqual(self.server.getClients("second"), [])
+        finally:
+            bot.shutdown()
+
+    def test_ping_pong(self):
+        self.connect()
+        self.server.ping()
+        self.assertTrue(waitUntil(lambda: self.server.getPongs() == 1))
+
+    def test_messages_are_received(self):
+        self.bot.joinChannels(["channel"]).wait(0)
+        self.connect()
+        self.assertTrue(self.server.waitForClients(1, "channel"))
+        self.server.flood("channel", rate=5000, count=2000, block=True)
+        self.assertTrue(waitUntil(lambda: len(self.bot.messages) == 2000))
+        self.assertEqual(self.bot.messages[-1], ("channel", "viewer", "message 1999"))
+
+    def test_sends_stay_within_rate_limit(self):
+        self.bot.joinChannels(["channel"])
+        self.connect()
+        self.assertTrue(self.server.waitForClients(1, "channel"))
+        self.bot.getSendQueue().setModerator("channel", True)  # only the account limit applies
+        for i in xrange(COMMAND_LIMIT + 5):
+            self.bot.sendMessage("channel", "message {}".format(i))
+
+        sent = lambda: [line for line in self.server.getReceived("testuser") if line.startswith("PRIVMSG")]
+        self.assertTrue(waitUntil(lambda: len(sent()) == COMMAND_LIMIT))
+        time.sleep(0.2)
+        self.assertEqual(len(sent()), COMMAND_LIMIT)
+        self.assertEqual(self.server.getViolations(), [])
+
+    def test_reconnect_rejoins_channels(self):
+        self.bot.joinChannels(["first", "second"])
+        self.connect()
+        self.assertTrue(self.server.waitForClients(1, "second"))
+
+        self.server.reconnect()
+        self.assertTrue(waitUntil(lambda: len(self.server.getClients("first")) == 1 and
+                                  len(self.server.getClients("second")) == 1))
+        joins = [line for line in self.server.getReceived("testuser") if line.startswith("JOIN")]
+        self.assertEqual(len(joins), 1)
+
+        metrics = self.bot.getMetrics()
+        self.assertTrue(waitUntil(lambda: metrics.snapshot()["rejoin_seconds"]["count"] == 1))
+        self.assertEqual(metrics.snapshot()["reconnects_total"], 1)
+        self.assertEqual(metrics.snapshot()["reconnect_seconds"]["count"], 1)
+
+        self.server.message("first", "viewer", "after")
+        self.assertTrue(waitUntil(lambda: ("first", "viewer", "after") in self.bot.messages))
+
+    def test_commands_queued_while_reconnecting_are_sent(self):
+        self.bot.joinChannels(["channel"])
+        self.connect()
+        self.assertTrue(self.server.waitForClients(1, "channel"))
+
+        self.bot.failures = 3
+        self.server.reconnect()
+        self.assertTrue(waitUntil(lambda: self.bot.failures < 3))
+        self.bot.sendMessage("channel", "queued")
+
+        sent = lambda: [line for line in self.server.getReceived("testuser") if line.startswith("PRIVMSG")]
+        self.assertTrue(waitUntil(lambda: sent() == ["PRIVMSG #channel :queued"]))
+        self.assertEqual(self.bot.getMetrics().snapshot()["reconnect_failures_total"], 3)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,99 @@
+import unittest
+
+from tests.helpers import FakeClock
+from twitchirc.irc import IRC
+from twitchirc.joins import packLines, JoinTracker, JoinRequest, MAX_LINE_LENGTH
+
+
+class TestPackLines(unittest.TestCase):
+    def test_channels_share_a_line(self):
+        self.assertEqual(packLines("JOIN", ["a", "b", "c"]), [("JOIN #a,#b,#c\r\n", ["a", "b", "c"])])
+
+    def test_lines_stay_within_limit(self):
+        channels = ["channel{:03}".format(i) for i in xrange(200)]
+        lines = packLines("JOIN", channels)
+        self.assertGreater(len(lines), 1)
+        for line, packed in lines:
+            self.assertLessEqual(len(line), MAX_LINE_LENGTH)
+        self.assertEqual(sum((packed for line, packed in lines), []), channels)
+
+    def test_line_is_filled_exactly(self):
+        # "PART #aaaa\r\n" is 12 bytes, each extra channel adds 6
+        lines = packLines("PART", ["aaaa"] * 4, maxLength=24)
+        self.assertEqual([len(line) for line, packed in lines], [24, 12])
+
+
+class TestJoinTracker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.tracker = JoinTracker(timeout=10, retries=1, clock=self.clock)
+
+    def test_confirm_completes_request(self):
+        done = []
+        request = self.tracker.add(["a", "b"])
+        request.addCallback(done.append)
+        self.tracker.confirm("a")
+        self.assertFalse(request.done())
+        self.tracker.confirm("b")
+        self.assertTrue(request.wait(0))
+        self.assertEqual(done, [request])
+        self.assertEqual(request.getJoined(), {"a", "b"})
+
+    def test_unconfirmed_joins_are_retried_then_failed(self):
+        request = self.tracker.add(["a"])
+        self.tracker.sent("a")
+        self.assertEqual(self.tracker.expired(), [])
+
+        self.clock.now = 10
+        self.assertEqual(self.tracker.expired(), ["a"])
+        self.assertEqual(self.tracker.expired(), [])  # not retried again until resent
+
+        self.tracker.sent("a")
+        self.clock.now = 20
+        self.assertEqual(self.tracker.expired(), [])
+        self.assertFalse(request.wait(0))
+        self.assertEqual(request.getFailed(), {"a"})
+        self.assertEqual(self.tracker.getPending(), set())
+
+    def test_cancelled_join_is_not_retried(self):
+        request = self.tracker.add(["a"])
+        self.tracker.sent("a")
+        self.tracker.cancel("a")
+        self.assertEqual(request.getFailed(), {"a"})
+
+        self.clock.now = 20
+        self.assertEqual(self.tracker.expired(), [])
+
+    def test_empty_request_is_done(self):
+        self.assertTrue(JoinRequest([]).wait(0))
+
+
+class TestIRCJoinConfirmation(unittest.TestCase):
+    def setUp(self):
+        self.irc = IRC("noauth", "testuser")
+
+    def test_join_echo_confirms(self):
+        request = self.irc.joinChannels(["channel", "other"])
+        self.irc.onResponse(":testuser!testuser@testuser.tmi.twitch.tv JOIN #channel")
+        self.irc.onResponse(":viewer!viewer@viewer.tmi.twitch.tv JOIN #other")
+        self.assertEqual(request.getJoined(), {"channel"})
+
+        self.irc.onResponse(":tmi.twitch.tv ROOMSTATE #other")
+        self.assertTrue(request.wait(0))
+
+    def test_part_while_disconnected(self):
+        request = self.irc.joinChannels(["channel"])
+        self.irc.partChannels(["channel"])
+        self.assertEqual(request.getFailed(), {"channel"})
+        self.assertEqual(self.irc.getJoinTracker().getPending(), set())
+
+    def test_suspended_channel_fails(self):
+        request = self.irc.joinChannels(["channel"])
+        self.irc.onResponse("@msg-id=msg_channel_suspended :tmi.twitch.tv NOTICE #channel :This channel has been "
+                            "suspended.")
+        self.assertFalse(request.wait(0))
+        self.assertEqual(request.getFailed(), {"channel"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+import twitchirc.irc
+from twitchirc.irc import IRC
+from twitchirc.metrics import Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def test_counter(self):
+        counter = self.metrics.counter("lines_total", "Lines", "command")
+        counter.inc(label="PRIVMSG")
+        counter.inc(2, label="PRIVMSG")
+        counter.inc(label="JOIN")
+        self.assertEqual(self.metrics.snapshot(), {"lines_total": {"PRIVMSG": 3, "JOIN": 1}})
+
+    def test_histogram(self):
+        histogram = self.metrics.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.observe(value)
+        self.assertEqual(self.metrics.snapshot()["latency_seconds"],
+                         {"count": 4, "sum": 5.65, "buckets": [(0.1, 2), (1, 3), (float("inf"), 4)]})
+
+    def test_duplicate_names_raise(self):
+        self.metrics.counter("lines_total", "Lines")
+        self.assertRaises(ValueError, self.metrics.gauge, "lines_total", "Lines", lambda: 0)
+
+    def test_prometheus_format(self):
+        self.metrics.counter("lines_total", "Lines", "command").inc(label='say "hi"')
+        self.metrics.gauge("queue_depth", "Queued", lambda: 7)
+        self.metrics.histogram("latency_seconds", "Latency", buckets=(1,)).observe(0.5)
+        self.assertEqual(self.metrics.toPrometheus(), "\n".join([
+            '# HELP twitchirc_lines_total Lines',
+            '# TYPE twitchirc_lines_total counter',
+            'twitchirc_lines_total{command="say \\"hi\\""} 1',
+            '# HELP twitchirc_queue_depth Queued',
+            '# TYPE twitchirc_queue_depth gauge',
+            'twitchirc_queue_depth 7',
+            '# HELP twitchirc_latency_seconds Latency',
+            '# TYPE twitchirc_latency_seconds histogram',
+            'twitchirc_latency_seconds_bucket{le="1"} 1',
+            'twitchirc_latency_seconds_bucket{le="+Inf"} 1',
+            'twitchirc_latency_seconds_sum 0.5',
+            'twitchirc_latency_seconds_count 1',
+        ]) + "\n")
+
+
+class TestIRCMetrics(unittest.TestCase):
+    def setUp(self):
+        self.sampleEvery = twitchirc.irc.SAMPLE_EVERY
+        twitchirc.irc.SAMPLE_EVERY = 1  # time every line
+
+    def tearDown(self):
+        twitchirc.irc.SAMPLE_EVERY = self.sampleEvery
+
+    def test_lines_are_counted(self):
+        irc = IRC("noauth", "testuser", callbacks=("onMessage",))
+        irc.onResponse(":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :hello")
+        irc.onResponse(":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :hello")
+        irc.onResponse(":tmi.twitch.tv WHATEVER #channel")
+
+        snapshot = irc.getMetrics().snapshot()
+        self.assertEqual(snapshot["lines_received_total"], {"PRIVMSG": 2, "WHATEVER": 1})
+        self.assertEqual(snapshot["unknown_lines_total"], 1)
+        self.assertEqual(snapshot["parse_seconds"]["count"], 3)
+        self.assertEqual(snapshot["callback_seconds"]["count"], 2)
+        self.assertEqual(snapshot["send_queue_depth"], 0)
+        self.assertEqual(snapshot["throttle_seconds_total"], {"join": 0, "send": 0})
+        self.assertIn("twitchirc_bytes_received_total 0", irc.getMetrics().toPrometheus())
+
+
+if __name__ == '__main__':
+    unittest.main()
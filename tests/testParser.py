@@ -0,0 +1,58 @@
+import unittest
+
+from twitchirc.parser import tokenize, splitParams, nick, parseTags, Tags
+
+
+class TestParser(unittest.TestCase):
+    def test_tokenize_privmsg(self):
+        line = ":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :hello : world"
+        tags, prefix, command, params = tokenize(line)
+        self.assertIsNone(tags)
+        self.assertEqual(prefix, "viewer!viewer@viewer.tmi.twitch.tv")
+        self.assertEqual(command, "PRIVMSG")
+        self.assertEqual(splitParams(params), ["#channel", "hello : world"])
+
+    def test_tokenize_tags(self):
+        line = "@msg-id=slow_off :tmi.twitch.tv NOTICE #channel :This room is no longer in slow mode."
+        tags, prefix, command, params = tokenize(line)
+        self.assertEqual(tags, "msg-id=slow_off")
+        self.assertEqual(prefix, "tmi.twitch.tv")
+        self.assertEqual(command, "NOTICE")
+
+    def test_tokenize_without_prefix(self):
+        self.assertEqual(tokenize("PING :tmi.twitch.tv"), (None, None, "PING", ":tmi.twitch.tv"))
+
+    def test_tokenize_without_params(self):
+        self.assertEqual(tokenize(":tmi.twitch.tv RECONNECT"), (None, "tmi.twitch.tv", "RECONNECT", ""))
+
+    def test_tokenize_skipped_command(self):
+        skip = frozenset(["JOIN", "PART"])
+        self.assertEqual(tokenize(":viewer!viewer@viewer.tmi.twitch.tv JOIN #channel", skip),
+                         (None, None, "JOIN", None))
+        self.assertEqual(tokenize("@tag=1 :tmi.twitch.tv PART #channel", skip), (None, None, "PART", None))
+        self.assertEqual(tokenize("@tag=1 :tmi.twitch.tv NOTICE #channel :hi", skip),
+                         ("tag=1", "tmi.twitch.tv", "NOTICE", "#channel :hi"))
+
+    def test_split_params_without_trailing(self):
+        self.assertEqual(splitParams("#channel +o viewer"), ["#channel", "+o", "viewer"])
+
+    def test_nick(self):
+        self.assertEqual(nick("viewer!viewer@viewer.tmi.twitch.tv"), "viewer")
+        self.assertIsNone(nick("tmi.twitch.tv"))
+        self.assertIsNone(nick(None))
+
+    def test_parse_tags_unescapes_values(self):
+        tags = parseTags("display-name=Viewer;system-msg=5\\smonths\\:\\sPogChamp;emotes=")
+        self.assertEqual(tags, {"display-name": "Viewer", "system-msg": "5 months; PogChamp", "emotes": ""})
+
+    def test_tags_are_parsed_lazily(self):
+        tags = Tags("badges=subscriber/12,bits/100;room-id=42")
+        self.assertEqual(tags.raw, "badges=subscriber/12,bits/100;room-id=42")
+        self.assertEqual(tags.get("room-id"), "42")
+        self.assertEqual(tags.getBadges(), {"subscriber": "12", "bits": "100"})
+        self.assertFalse(Tags())
+        self.assertIsNone(Tags().get("room-id"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from twitchirc.irc import IRC
+from twitchirc.profiling import CallbackProfiler
+
+
+class SlowBot(IRC):
+    def __init__(self, *args, **kwargs):
+        super(SlowBot, self).__init__(*args, **kwargs)
+        self.delay = 0
+
+    def onMessage(self, channel, viewer, message):
+        if self.delay:
+            self.slowPart()
+
+    def slowPart(self):
+        time.sleep(self.delay)
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.profiler = CallbackProfiler(slowThreshold=0.05, sampleInterval=0.01)
+        self.irc = SlowBot("oauth:abcdefghijklmnopqrstuvwxyz", "username", profiler=self.profiler,
+                           callbacks=("onMessage", "onJoinPart", "onIRCInfo"))
+
+    def tearDown(self):
+        self.profiler.stop()
+        shutil.rmtree(self.dir)
+
+    def test_per_callback_and_channel(self):
+        self.irc.onResponse(":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :hello")
+        self.irc.onResponse(":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #other :hello")
+        self.irc.onResponse(":viewer!viewer@viewer.tmi.twitch.tv JOIN #channel")
+        self.irc.onResponse(":username.tmi.twitch.tv 353 username = #channel :username")
+
+        stats = self.profiler.getStats()
+        self.assertEqual(stats["callbacks"]["onMessage"]["count"], 2)
+        self.assertEqual(stats["callbacks"]["onJoinPart"]["count"], 1)
+        self.assertEqual(stats["callbacks"]["onIRCInfo"]["count"], 1)
+        self.assertEqual(stats["channels"]["channel"]["count"], 2)
+        self.assertEqual(stats["channels"]["other"]["count"], 1)
+        self.assertEqual(stats["channels"][None]["count"], 1)
+        self.assertEqual(stats["slow"], 0)
+
+    def test_slow_stacks(self):
+        self.irc.delay = 0.15
+        self.irc.onResponse(":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :hello")
+
+        self.assertEqual(self.profiler.getStats()["slow"], 1)
+        self.assertEqual(self.profiler.getSlowestChannels(1)[0][0], "channel")
+        samples = self.profiler.getSlowSamples()
+        self.assertTrue(samples)
+        self.assertEqual(samples[0]["callback"], "onMessage")
+        self.assertEqual(samples[0]["channel"], "channel")
+        self.assertTrue(samples[0]["stack"][-1].startswith("slowPart "))
+
+        path = os.path.join(self.dir, "slow.folded")
+        self.profiler.dumpSlowStacks(path)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines[0].startswith("onMessage;"))
+        self.assertEqual(sum(int(line.rsplit(" ", 1)[1]) for line in lines), len(samples))
+
+    def test_cprofile_window(self):
+        self.assertIsNone(self.profiler.stopProfile())
+
+        self.profiler.startProfile()
+        self.irc.onResponse(":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :hello")
+        path = os.path.join(self.dir, "callbacks.prof")
+        stats = self.profiler.stopProfile(path)
+
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(any(func[2] == "onMessage" for func in stats.stats))
+
+    def test_callback_errors_are_recorded(self):
+        def fail(channel):
+            raise ValueError("boom")
+
+        self.assertRaises(ValueError, self.profiler.call, "onFail", "channel", fail, "channel")
+        self.assertEqual(self.profiler.getStats()["callbacks"]["onFail"]["count"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import Queue
+import unittest
+
+from twitchirc.irc import IRC
+from twitchirc.queues import threadQueue
+
+
+class TestQueues(unittest.TestCase):
+    def test_thread_queue(self):
+        q = threadQueue()
+        self.assertIsInstance(q, Queue.Queue)
+        q.put("JOIN #channel\r\n")
+        self.assertEqual(q.get(), "JOIN #channel\r\n")
+
+    def test_join_queue_comes_from_factory(self):
+        queues = []
+
+        def factory():
+            queues.append(threadQueue())
+            return queues[-1]
+
+        chat = IRC("noauth", "testuser", queueFactory=factory)
+        self.assertEqual(len(queues), 1)
+        queues[0].put(("channel", 0))
+        self.assertEqual(chat.getMetrics().snapshot()["join_queue_depth"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from tests.helpers import FakeClock
+from twitchirc.ratelimit import RateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(1000.0)
+
+    def limiter(self, limit, period):
+        return RateLimiter(limit, period, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_sends_immediately_while_budget_is_available(self):
+        limiter = self.limiter(20, 30)
+        for _ in xrange(20):
+            self.assertTrue(limiter.acquire())
+        self.assertEqual(self.clock.slept, [])
+        self.assertEqual(limiter.remaining(), 0)
+        self.assertFalse(limiter.tryAcquire())
+
+    def test_sleeps_exactly_until_oldest_command_expires(self):
+        limiter = self.limiter(2, 30)
+        limiter.acquire()
+        self.clock.now += 10
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(self.clock.slept, [20])
+        limiter.acquire()
+        self.assertEqual(self.clock.slept, [20, 10])
+
+    def test_no_burst_at_window_edge(self):
+        # a fixed window would allow 2x the limit around the window reset
+        limiter = self.limiter(100, 30)
+        self.clock.now += 29
+        for _ in xrange(100):
+            limiter.acquire()
+        self.clock.now += 2
+        self.assertFalse(limiter.tryAcquire())
+        self.assertAlmostEqual(limiter.delay(), 28)
+
+    def test_acquire_timeout(self):
+        limiter = self.limiter(1, 15)
+        limiter.acquire()
+        self.assertFalse(limiter.acquire(timeout=5))
+        self.assertEqual(self.clock.slept, [5])
+        self.assertTrue(limiter.acquire(timeout=10))
+
+    def test_invalid_limits(self):
+        self.assertRaises(ValueError, RateLimiter, 0, 30)
+        self.assertRaises(ValueError, RateLimiter, 20, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
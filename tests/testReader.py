@@ -0,0 +1,43 @@
+import socket
+import unittest
+
+from twitchirc.reader import LineReader
+
+
+class TestLineReader(unittest.TestCase):
+    def setUp(self):
+        self.server, self.client = socket.socketpair()
+
+    def tearDown(self):
+        self.server.close()
+        self.client.close()
+
+    def test_splits_irc_newlines(self):
+        self.server.sendall("PING :tmi.twitch.tv\r\n:tmi.twitch.tv ROOMSTATE #channel\r\n")
+        reader = LineReader(self.client)
+        self.assertEqual(reader.readline(), "PING :tmi.twitch.tv")
+        self.assertEqual(reader.readline(), ":tmi.twitch.tv ROOMSTATE #channel")
+
+    def test_partial_lines_are_kept_between_reads(self):
+        reader = LineReader(self.client, bufferSize=8)
+        self.server.sendall(":tmi.twitch.tv USERSTATE #channel\r")
+        self.server.sendall("\n:tmi.twitch.tv ROOMSTATE #other\r\n")
+        self.assertEqual(reader.readline(), ":tmi.twitch.tv USERSTATE #channel")
+        self.assertEqual(reader.readline(), ":tmi.twitch.tv ROOMSTATE #other")
+
+    def test_bare_newline(self):
+        self.server.sendall("line one\nline two\r\n")
+        reader = LineReader(self.client)
+        self.assertEqual(reader.readline(), "line one")
+        self.assertEqual(reader.readline(), "line two")
+
+    def test_closed_connection_returns_none(self):
+        self.server.sendall("last line\r\nunfinished")
+        self.server.close()
+        reader = LineReader(self.client)
+        self.assertEqual(list(reader), ["last line"])
+        self.assertIsNone(reader.readline())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from tests.helpers import FakeClock
+from twitchirc.irc import IRC
+from twitchirc.recorder import Recorder, logFiles, readLog, replay, FASTEST
+
+
+class ReplayIRC(IRC):
+    def __init__(self, *args, **kwargs):
+        super(ReplayIRC, self).__init__(*args, **kwargs)
+        self.messages = []
+
+    def onMessage(self, channel, viewer, message):
+        self.messages.append((channel, viewer, message))
+
+
+def privmsg(i):
+    return ":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #channel :message {}".format(i)
+
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "logs", "chat.log.gz")
+        self.clock = FakeClock(1000.0)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def record(self, lines, **kwargs):
+        recorder = Recorder(self.path, clock=self.clock, **kwargs)
+        for line in lines:
+            recorder.record(line)
+            self.clock.now += 0.5
+        recorder.close()
+
+    def test_lines_are_timestamped(self):
+        self.record([privmsg(0), privmsg(1)])
+        self.assertEqual(list(readLog(self.path)), [(1000.0, privmsg(0)), (1000.5, privmsg(1))])
+
+    def test_logs_rotate(self):
+        lines = [privmsg(i) for i in xrange(100)]
+        self.record(lines, maxBytes=1000, backupCount=3)
+        files = logFiles(self.path)
+        self.assertEqual(files, [self.path + ".3", self.path + ".2", self.path + ".1", self.path])
+        recorded = [line for timestamp, line in readLog(files)]
+        self.assertEqual(recorded, lines[-len(recorded):])
+
+    def test_unclosed_log_is_readable(self):
+        lines = [privmsg(i) for i in xrange(5000)]
+        recorder = Recorder(self.path, clock=self.clock)
+        for line in lines:
+            recorder.record(line)
+        recorder.flush()  # the process dies here, the log has no gzip trailer
+        self.assertEqual([line for timestamp, line in readLog(self.path)], lines)
+
+        # a restart rotates the broken log away instead of appending to it
+        self.record([privmsg("restart")])
+        self.assertEqual(logFiles(self.path), [self.path + ".1", self.path])
+        self.assertEqual([line for timestamp, line in readLog(logFiles(self.path))], lines + [privmsg("restart")])
+        recorder.close()
+
+    def test_records_after_close_are_ignored(self):
+        recorder = Recorder(self.path, clock=self.clock)
+        recorder.close()
+        recorder.record(privmsg(0))
+        self.assertEqual(logFiles(self.path), [])
+
+    def test_replay_as_fast_as_possible(self):
+        self.record([privmsg(0), "PING :tmi.twitch.tv", privmsg(1)])
+        irc = ReplayIRC("noauth", "testuser")
+        self.assertEqual(replay(irc, logFiles(self.path), speed=FASTEST), 2)
+        self.assertEqual(irc.messages, [("channel", "viewer", "message 0"), ("channel", "viewer", "message 1")])
+
+    def test_replay_keeps_scaled_pace(self):
+        self.record([privmsg(i) for i in xrange(3)])
+        clock = FakeClock(1000.0)
+        sleeps = []
+
+        def sleep(secs):
+            sleeps.append(secs)
+            clock.now += secs
+
+        replay(ReplayIRC("noauth", "testuser"), self.path, speed=10, sleep=sleep, clock=clock)
+        self.assertEqual([round(secs, 3) for secs in sleeps], [0.05, 0.05])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from tests.helpers import FakeClock
+from twitchirc.irc import IRC
+from twitchirc.roster import Roster
+
+
+class TestRoster(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.roster = Roster(maxChatters=10, clock=self.clock)
+
+    def test_join_part(self):
+        self.roster.join("channel", "viewer")
+        self.assertTrue(self.roster.contains("channel", "viewer"))
+        self.assertFalse(self.roster.contains("other", "viewer"))
+        self.roster.part("channel", "viewer")
+        self.assertFalse(self.roster.contains("channel", "viewer"))
+
+    def test_moderators(self):
+        self.roster.setModerator("channel", "mod", True)
+        self.assertTrue(self.roster.contains("channel", "mod"))
+        self.assertEqual(self.roster.getModerators("channel"), {"mod"})
+        self.roster.setModerator("channel", "mod", False)
+        self.assertFalse(self.roster.isModerator("channel", "mod"))
+
+    def test_least_recently_seen_are_evicted(self):
+        for i in xrange(10):
+            self.clock.now = i
+            self.roster.join("channel", "viewer{}".format(i))
+        self.clock.now = 10
+        self.roster.seen("channel", "viewer0")
+        self.roster.join("channel", "new")
+
+        self.assertEqual(self.roster.count("channel"), 10)
+        self.assertFalse(self.roster.contains("channel", "viewer1"))
+        self.assertTrue(self.roster.contains("channel", "viewer0"))
+        self.assertEqual(self.roster.getLastSeen("channel", "new"), 10)
+
+    def test_seed_once(self):
+        viewers = {"viewers": {"moderators": [u"mod"], "viewers": [u"viewer"]}, "count": 2}
+        self.assertTrue(self.roster.seed("channel", viewers))
+        self.assertFalse(self.roster.seed("channel", viewers))
+        self.assertEqual(self.roster.getChatters("channel"), {"mod", "viewer"})
+        self.assertEqual(self.roster.getModerators("channel"), {"mod"})
+
+
+class TestIRCRoster(unittest.TestCase):
+    def setUp(self):
+        self.irc = IRC("noauth", "testuser", roster=Roster())
+        self.roster = self.irc.getRoster()
+
+    def test_membership_events(self):
+        self.irc.onResponse(":testuser.tmi.twitch.tv 353 testuser = #channel :first second")
+        self.assertEqual(self.roster.getChatters("channel"), {"first", "second"})
+        self.irc.onResponse(":third!third@third.tmi.twitch.tv JOIN #channel")
+        self.irc.onResponse(":second!second@second.tmi.twitch.tv PART #channel")
+        self.irc.onResponse(":jtv MODE #channel +o first")
+        self.irc.onResponse(":talker!talker@talker.tmi.twitch.tv PRIVMSG #channel :hi")
+        self.assertEqual(self.roster.getChatters("channel"), {"first", "third", "talker"})
+        self.assertEqual(self.roster.getModerators("channel"), {"first"})
+
+    def test_own_part_forgets_channel(self):
+        self.irc.onResponse(":viewer!viewer@viewer.tmi.twitch.tv JOIN #channel")
+        self.irc.onResponse(":testuser!testuser@testuser.tmi.twitch.tv PART #channel")
+        self.assertEqual(self.roster.getChannels(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from tests.helpers import FakeClock
+from twitchirc.ratelimit import RateLimiter
+from twitchirc.scheduler import SendScheduler
+
+
+class TestSendScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(1000.0)
+        self.limiter = RateLimiter(20, 30, clock=self.clock)
+        self.scheduler = SendScheduler(self.limiter, clock=self.clock)
+
+    def test_round_robin_across_channels(self):
+        for i in xrange(3):
+            self.scheduler.put("busy{}".format(i), "busy")
+        self.scheduler.put("quiet", "quiet")
+        self.scheduler.put("PONG", None)
+
+        self.assertEqual(self.scheduler.get(timeout=0), "busy0")
+        self.assertEqual(self.scheduler.get(timeout=0), "quiet")
+        self.assertEqual(self.scheduler.get(timeout=0), "PONG")
+        # busy channel is limited to 1 message/sec
+        self.assertIsNone(self.scheduler.get(timeout=0))
+        self.clock.now += 1
+        self.assertEqual(self.scheduler.get(timeout=0), "busy1")
+
+    def test_moderators_are_only_globally_limited(self):
+        self.scheduler.setModerator("modded", True)
+        for i in xrange(25):
+            self.scheduler.put(str(i), "modded")
+
+        sent = [self.scheduler.get(timeout=0) for _ in xrange(20)]
+        self.assertEqual(sent, [str(i) for i in xrange(20)])
+        self.assertIsNone(self.scheduler.get(timeout=0))
+        self.assertEqual(self.scheduler.qsize("modded"), 5)
+
+        self.clock.now += 30
+        self.assertEqual(self.scheduler.get(timeout=0), "20")
+
+    def test_queue_depths(self):
+        self.scheduler.put("a", "first")
+        self.scheduler.put("b", "first")
+        self.scheduler.put("c", "second")
+        self.assertEqual(self.scheduler.getQueueDepths(), {"first": 2, "second": 1})
+        self.assertEqual(self.scheduler.qsize(), 3)
+        self.assertEqual(self.scheduler.qsize("second"), 1)
+        self.assertEqual(self.scheduler.qsize("missing"), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
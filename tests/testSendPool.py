@@ -0,0 +1,52 @@
+import unittest
+
+from twitchirc.exception import IllegalArgumentError
+from twitchirc.irc import IRC
+from twitchirc.sendpool import SendPool, CHANNEL, NONE
+
+
+class QueueOnlyIRC(IRC):
+    """
+        IRC that queues commands without being connected
+    """
+
+    def sendCommand(self, cmd, channel=None):
+        self.getSendQueue().put(cmd, channel)
+
+
+class TestSendPool(unittest.TestCase):
+    def setUp(self):
+        self.first = QueueOnlyIRC("noauth", "first")
+        self.second = QueueOnlyIRC("noauth", "second")
+
+    def test_messages_go_to_account_with_most_budget(self):
+        pool = SendPool([self.first, self.second], affinity=NONE)
+        used = [pool.sendMessage("channel{}".format(i), "hi") for i in xrange(40)]
+        self.assertEqual(used.count(self.first), 20)
+        self.assertEqual(used.count(self.second), 20)
+
+    def test_channel_affinity_keeps_order(self):
+        pool = SendPool([self.first, self.second], affinity=CHANNEL)
+        used = set(pool.sendMessage("channel", str(i)) for i in xrange(30))
+        self.assertEqual(len(used), 1)
+        self.assertEqual(used.pop().getQueueDepth("channel"), 30)
+
+    def test_blocked_accounts_are_skipped(self):
+        pool = SendPool([self.first, self.second])
+        pool.setAllowed(self.first, "channel", False)
+        for _ in xrange(5):
+            self.assertIs(pool.sendMessage("channel", "hi"), self.second)
+
+        pool.setAllowed(self.second, "channel", False)
+        self.assertRaises(IllegalArgumentError, pool.sendMessage, "channel", "hi")
+
+    def test_usage(self):
+        pool = SendPool()
+        pool.addAccount(self.first, channels=["channel"])
+        pool.sendMessage("channel", "hi")
+        self.assertEqual(pool.getUsage(), {"first": {"limit": 20, "used": 0, "remaining": 20, "queued": 1,
+                                                     "sent": 1}})
+
+
+if __name__ == '__main__':
+    unittest.main()
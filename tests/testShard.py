@@ -0,0 +1,126 @@
+import threading
+import unittest
+
+from twitchirc.asyncirc import AsyncIRC
+from twitchirc.exception import IllegalArgumentError
+from twitchirc.fakeserver import FakeTMIServer
+from twitchirc.irc import IRC
+from twitchirc.shard import ShardedIRC, COUNT, RATE
+
+
+class FakeIRC(IRC):
+    """
+        IRC that records joins, parts and messages instead of using a socket
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(FakeIRC, self).__init__(*args, **kwargs)
+        self.joined = []
+        self.sent = []
+
+    def joinChannels(self, channels):
+        self.joined.extend(channels)
+
+    def partChannels(self, channels):
+        for channel in channels:
+            self.joined.remove(channel)
+
+    def sendMessage(self, channelName, msg):
+        self.sent.append((channelName, msg))
+
+
+class Handler(object):
+    def __init__(self):
+        self.messages = []
+
+    def onMessage(self, channel, viewer, message):
+        self.messages.append((channel, viewer, message))
+
+
+def privmsg(channel):
+    return ":viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #{} :hello".format(channel)
+
+
+class TestShardedIRC(unittest.TestCase):
+    def setUp(self):
+        self.handler = Handler()
+
+    def pool(self, shards, policy=COUNT):
+        return ShardedIRC("noauth", "testuser", self.handler, shards=shards, policy=policy, ircClass=FakeIRC)
+
+    def test_channels_are_spread_by_count(self):
+        pool = self.pool(3)
+        pool.joinChannels(["channel{}".format(i) for i in xrange(7)])
+        self.assertEqual(sorted(len(shard.joined) for shard in pool.getShards()), [2, 2, 3])
+        for shard in pool.getShards():
+            self.assertEqual(sorted(shard.joined), sorted(pool.getChannels(shard)))
+
+    def test_send_is_routed_to_owner(self):
+        pool = self.pool(2)
+        pool.joinChannels(["first", "second"])
+        pool.sendMessage("second", "hi")
+        self.assertEqual(pool.getShard("second").sent, [("second", "hi")])
+        self.assertEqual(pool.getShard("first").sent, [])
+        self.assertRaises(IllegalArgumentError, pool.sendMessage, "unknown", "hi")
+
+    def test_callbacks_are_forwarded_to_handler(self):
+        pool = self.pool(2)
+        pool.joinChannels(["channel"])
+        pool.getShard("channel").onResponse(privmsg("channel"))
+        self.assertEqual(self.handler.messages, [("channel", "viewer", "hello")])
+
+    def test_rebalance_moves_channels_off_hot_shard(self):
+        pool = self.pool(2, policy=RATE)
+        pool.joinChannels(["busy", "medium", "quiet", "idle"])
+        hot = pool.getShard("busy")
+        for channel, count in (("busy", 100), ("medium", 60), ("quiet", 10)):
+            for _ in xrange(count):
+                pool.getShard(channel).onResponse(privmsg(channel))
+
+        moves = pool.rebalance()
+        loads = [sum(pool.getRates()[channel] for channel in pool.getChannels(shard)) for shard in pool.getShards()]
+        self.assertTrue(moves)
+        self.assertLessEqual(max(loads), min(loads) * 1.5 + 1e-9, loads)
+        for channel, old, new in moves:
+            self.assertIs(pool.getShard(channel), new)
+            self.assertIn(channel, new.joined)
+            self.assertNotIn(channel, old.joined)
+        self.assertIn("busy", hot.joined)
+
+    def test_async_shards_share_one_loop(self):
+        class ShutdownHandler(Handler):
+            def onMessage(self, channel, viewer, message):
+                self.messages.append(channel)
+                if len(self.messages) == 2:  # on the loop thread
+                    pool.shutdown()
+
+        server = FakeTMIServer()
+        server.start()
+        self.handler = ShutdownHandler()
+        pool = ShardedIRC("noauth", "testuser", self.handler, shards=2, ircClass=AsyncIRC)
+        try:
+            pool.connect(timeout=5, host="127.0.0.1", port=server.port)
+            pool.joinChannels(["first", "second"])
+            t = threading.Thread(target=pool.serverForever)
+            t.start()
+
+            for channel in ("first", "second"):
+                self.assertTrue(server.waitForClients(1, channel))
+                server.message(channel, "viewer", "hello")
+            t.join(5)
+            self.assertFalse(t.is_alive())
+            self.assertEqual(sorted(self.handler.messages), ["first", "second"])
+            self.assertIsNot(pool.getShard("first"), pool.getShard("second"))
+        finally:
+            pool.shutdown()
+            server.stop()
+
+    def test_invalid_arguments(self):
+        self.assertRaises(IllegalArgumentError, ShardedIRC, "noauth", "testuser", self.handler, shards=0)
+        self.assertRaises(IllegalArgumentError, ShardedIRC, "noauth", "testuser", self.handler, policy="random")
+        self.assertRaises(IllegalArgumentError, ShardedIRC, "noauth", "testuser", self.handler, ircClass=AsyncIRC,
+                          tls=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import socket
+import ssl
+import unittest
+
+from tests.helpers import waitUntil
+from twitchirc.fakeserver import FakeTMIServer
+from twitchirc.irc import IRC
+from twitchirc.tls import TLS
+from twitchirc.writer import setKeepAlive
+
+# self-signed certificate and key for localhost and 127.0.0.1
+CERTFILE = os.path.join(os.path.dirname(__file__), "fixtures", "localhost.pem")
+
+
+class MessageIRC(IRC):
+    def __init__(self, *args, **kwargs):
+        super(MessageIRC, self).__init__(*args, **kwargs)
+        self.messages = []
+
+    def onMessage(self, channel, viewer, message):
+        self.messages.append((channel, viewer, message))
+
+
+class TestTLS(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeTMIServer(certfile=CERTFILE)
+        self.server.start()
+        self.tls = TLS(cafile=CERTFILE)
+        self.bot = MessageIRC("oauth:token", "testuser", tls=self.tls, keepAlive=30)
+
+    def tearDown(self):
+        self.bot.shutdown()
+        self.server.stop()
+
+    def connect(self, bot):
+        bot.connect(timeout=5, host="localhost", port=self.server.port)
+
+    def test_connect(self):
+        self.bot.joinChannels(["channel"])
+        self.connect(self.bot)
+        self.assertTrue(self.server.waitForClients(1, "channel"))
+        self.server.message("channel", "viewer", "over tls")
+        self.assertTrue(waitUntil(lambda: self.bot.messages == [("channel", "viewer", "over tls")]))
+
+        timings = self.bot.getConnectTimings()
+        self.assertTrue(timings["tcp"] <= timings["tls"] <= timings["login"])
+        self.assertEqual(self.tls.getHandshakes(), 1)
+        self.assertEqual(self.bot.getMetrics().snapshot()["tls_handshake_seconds"]["count"], 1)
+
+    def test_untrusted_certificate(self):
+        bot = IRC("oauth:token", "testuser", tls=True)
+        self.assertRaises(ssl.SSLError, self.connect, bot)
+        bot.close()
+
+    def test_connections_share_the_context(self):
+        other = IRC("oauth:token", "otheruser", tls=self.tls)
+        try:
+            self.connect(self.bot)
+            self.connect(other)
+            self.assertTrue(self.server.waitForClients(2))
+
+            self.server.reconnect()
+            self.assertTrue(waitUntil(lambda: self.tls.getHandshakes() == 4))
+            self.assertTrue(self.server.waitForClients(2))
+        finally:
+            other.shutdown()
+
+    def test_keepalive(self):
+        conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            setKeepAlive(conn, 30)
+            self.assertTrue(conn.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                self.assertEqual(conn.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE), 30)
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
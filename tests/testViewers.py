@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+import unittest
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+from tests.helpers import FakeClock
+from twitchirc.exception import APIError
+from twitchirc.irc import IRC
+from twitchirc.viewers import ViewerCache
+
+
+class ChattersServer(ThreadingMixIn, HTTPServer):
+    """
+        Local stand-in for the TMI chatters API. Counts requests per channel and the connections made
+    """
+    daemon_threads = True
+
+    def __init__(self, delay=0):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), ChattersHandler)
+        self.delay = delay
+        self.requests = {}
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.01})
+        self.thread.daemon = True
+        self.thread.start()
+
+    def url(self):
+        return "http://127.0.0.1:{}".format(self.server_address[1])
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class ChattersHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        channel = self.path.split("/")[3]
+        with self.server.lock:
+            self.server.requests[channel] = self.server.requests.get(channel, 0) + 1
+        time.sleep(self.server.delay)
+
+        if channel == "missing":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = json.dumps({"chatter_count": 1, "chatters": {"viewers": [channel + "_viewer"]}})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestViewerCache(unittest.TestCase):
+    def setUp(self):
+        self.server = ChattersServer()
+        self.clock = FakeClock()
+        self.cache = ViewerCache(self.server.url(), ttl=60, connections=4, clock=self.clock)
+
+    def tearDown(self):
+        self.cache.close()
+        self.server.stop()
+
+    def test_results_are_cached_until_ttl(self):
+        self.assertEqual(self.cache.get("channel"), {"viewers": {"viewers": ["channel_viewer"]}, "count": 1})
+        self.cache.get("channel")
+        self.assertEqual(self.server.requests["channel"], 1)
+
+        self.clock.now = 60
+        self.cache.get("channel")
+        self.assertEqual(self.server.requests["channel"], 2)
+
+    def test_connections_are_kept_alive(self):
+        for i in xrange(5):
+            self.cache.get("channel{}".format(i))
+        self.assertEqual(self.server.connections, 1)
+
+    def test_concurrent_callers_share_one_request(self):
+        self.server.delay = 0.2
+        threads = [threading.Thread(target=self.cache.get, args=("channel",)) for _ in xrange(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.server.requests["channel"], 1)
+
+    def test_bulk_fetches_concurrently(self):
+        self.server.delay = 0.2
+        channels = ["channel{}".format(i) for i in xrange(8)] + ["missing"]
+        start = time.time()
+        results = self.cache.getBulk(channels)
+        self.assertLess(time.time() - start, 0.2 * len(channels) / 2)
+        self.assertIsNone(results.pop("missing"))
+        self.assertEqual(sorted(results), sorted(channels[:-1]))
+        self.assertLessEqual(self.server.connections, 4)
+
+    def test_errors_raise_api_error(self):
+        self.assertRaises(APIError, self.cache.get, "missing")
+        self.assertRaises(APIError, ViewerCache("http://127.0.0.1:1").get, "channel")
+
+    def test_irc_uses_cache(self):
+        irc = IRC("noauth", "testuser", viewerCache=self.cache)
+        self.assertEqual(irc.getViewers("channel")["count"], 1)
+        self.assertEqual(sorted(irc.getViewersBulk(["channel", "other"])), ["channel", "other"])
+        self.assertEqual(self.server.requests, {"channel": 1, "other": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
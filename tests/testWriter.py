@@ -0,0 +1,98 @@
+import errno
+import socket
+import threading
+import unittest
+
+from tests.helpers import FakeClock
+from twitchirc.writer import LineWriter, setNoDelay, setSendTimeout
+
+
+class ShortWriteSocket(object):
+    """
+        Socket that accepts a few bytes per send and times out every other call
+    """
+
+    def __init__(self, chunk=3):
+        self.chunk = chunk
+        self.calls = 0
+        self.data = ""
+
+    def send(self, data):
+        self.calls += 1
+        if self.calls % 2 == 0:
+            raise socket.timeout("timed out")
+        data = data[:self.chunk].tobytes()
+        self.data += data
+        return len(data)
+
+
+class StalledSocket(object):
+    def send(self, data):
+        raise socket.error(errno.EAGAIN, "Resource temporarily unavailable")
+
+
+class TestLineWriter(unittest.TestCase):
+    def test_short_writes_are_resumed(self):
+        conn = ShortWriteSocket()
+        writer = LineWriter(conn)
+        writer.writeLines(["PRIVMSG #a :hello\r\n", "PRIVMSG #b :world\r\n"])
+        self.assertEqual(conn.data, "PRIVMSG #a :hello\r\nPRIVMSG #b :world\r\n")
+        self.assertEqual(writer.getBytesWritten(), len(conn.data))
+
+    def test_lines_are_coalesced(self):
+        a, b = socket.socketpair()
+        try:
+            writer = LineWriter(a)
+            writer.writeLines(["PONG :tmi.twitch.tv\r\n"] * 10)
+            self.assertEqual(writer.getWrites(), 1)
+            self.assertEqual(b.recv(1024), "PONG :tmi.twitch.tv\r\n" * 10)
+        finally:
+            a.close()
+            b.close()
+
+    def test_stalled_write_times_out(self):
+        writer = LineWriter(StalledSocket(), timeout=5, clock=FakeClock(step=1))
+        self.assertRaises(socket.timeout, writer.write, "PING\r\n")
+
+    def test_blocking_socket_to_stalled_peer_times_out(self):
+        a, b = socket.socketpair()  # b never reads
+        try:
+            setSendTimeout(a, 0.1)
+            writer = LineWriter(a, timeout=0.5)
+            errors = []
+
+            def write():
+                try:
+                    writer.write("PRIVMSG #a :spam\r\n" * 100000)
+                except socket.error, e:
+                    errors.append(e)
+
+            thread = threading.Thread(target=write)
+            thread.daemon = True
+            thread.start()
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+            self.assertEqual(len(errors), 1)
+            self.assertIsInstance(errors[0], socket.timeout)
+        finally:
+            a.close()
+            b.close()
+
+    def test_unicode_is_encoded(self):
+        conn = ShortWriteSocket(chunk=100)
+        LineWriter(conn).write(u"PRIVMSG #a :\xe9\r\n")
+        self.assertEqual(conn.data, "PRIVMSG #a :\xc3\xa9\r\n")
+
+    def test_no_delay(self):
+        conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            setNoDelay(conn)
+            self.assertTrue(conn.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+            setNoDelay(conn, False)
+            self.assertFalse(conn.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,444 @@
+"""
+    Single threaded IRC client built on an asyncore event loop.
+
+    An IRC instance uses 3 threads and a blocking socket. AsyncIRC instead does its connect/login, receiving,
+    rate limited sending and joining from an event loop, so many connections can share one thread:
+
+        bots = [MyAsyncIRC(token, name) for token, name in accounts]
+        for bot in bots:
+            bot.connect(block=False)
+        twitchirc.asyncirc.loop()
+
+    Callbacks (onMessage, onCommand, ...), the constructor and the public API (joinChannels, sendMessage, ...) are
+    the same as IRC, so an IRC subclass ports by changing its base class. Callbacks run on the event loop thread and
+    must not block. The IRC options that need threads or a blocking socket (overrideSend, queueFactory, dispatcher,
+    tls) raise an IllegalArgumentError.
+    A lost connection is reconnected from the loop, failed attempts are retried with jittered exponential backoff.
+"""
+import asyncore
+import os
+import socket
+import sys
+from collections import deque
+
+from twitchirc.exception import IRCException, AuthenticationError, IllegalArgumentError
+from twitchirc.irc import IRC, Login, State, reconnectDelay, TWITCH_IRC_HOST, TWITCH_IRC_PORT, JOIN_LIMIT, \
+    JOIN_PERIOD, RECONNECT_TIMEOUT
+from twitchirc.joins import packLines, MAX_LINE_LENGTH
+from twitchirc.queues import threadQueue
+from twitchirc.ratelimit import RateLimiter, monotonic
+from twitchirc.reader import LineReader, DEFAULT_BUFFER_SIZE
+from twitchirc.writer import setNoDelay, setKeepAlive
+
+POLL_INTERVAL = 0.05  # max secs between checks of the rate limiters
+
+
+def loop(socketMap=None, pollInterval=POLL_INTERVAL, count=None):
+    """
+    Run the event loop shared by the AsyncIRC connections of `socketMap` until all of them are closed
+    :param dict socketMap: asyncore socket map. Defaults to the global asyncore map
+    :param float pollInterval: max secs to wait on poll() before sending rate limited commands
+    :param int count: run this many iterations. Runs until all connections are closed if `None`
+    """
+    if socketMap is None:
+        socketMap = asyncore.socket_map
+
+    while socketMap and (count is None or count > 0):
+        for conn in socketMap.values():
+            if isinstance(conn, (_Connection, _Backoff)):
+                conn.flush()
+        # poll() has no limit on the descriptors, select() stops at FD_SETSIZE (1024)
+        asyncore.loop(timeout=pollInterval, map=socketMap, use_poll=True, count=1)
+
+        if count is not None:
+            count -= 1
+
+
+class _Connection(asyncore.dispatcher):
+    """
+        asyncore dispatcher of one AsyncIRC socket. Events are handed to the callables given by the client
+    """
+
+    def __init__(self, sock, socketMap, onConnect, onLines, onClose, onFlush, byteCounts):
+        """
+        :param list byteCounts: [received, sent] bytes of the client, counted up by every connection it makes
+        """
+        asyncore.dispatcher.__init__(self, map=socketMap)
+        sock.setblocking(0)
+        self.set_socket(sock, socketMap)
+
+        self.__onConnect = onConnect
+        self.__onLines = onLines
+        self.__onClose = onClose
+        self.__onFlush = onFlush
+        self.__byteCounts = byteCounts
+        self.__reader = LineReader()
+        self.__out = []
+
+    def write(self, data):
+        self.__out.append(data)
+
+    def flush(self):
+        self.__onFlush()
+
+    def writable(self):
+        return not self.connected or len(self.__out) > 0
+
+    def handle_connect(self):
+        self.__onConnect()
+
+    def handle_read(self):
+        data = self.recv(DEFAULT_BUFFER_SIZE)
+        self.__byteCounts[0] += len(data)
+        if data and self.__reader.feed(data):
+            self.__onLines(self.__reader.popLines())
+
+    def handle_write(self):
+        data = "".join(self.__out)
+        sent = self.send(data)
+        self.__byteCounts[1] += sent
+        self.__out = [data[sent:]] if sent < len(data) else []
+
+    def handle_close(self):
+        self.close()
+        self.__onClose(None)
+
+    def handle_error(self):
+        error = sys.exc_info()[1]
+        self.close()
+        self.__onClose(error)
+
+
+class _Backoff(object):
+    """
+        Placeholder in the socket map while an AsyncIRC waits to retry a reconnect, so loop() keeps running and
+        calls it back once the delay is over. It has no socket, asyncore never polls it
+    """
+
+    def __init__(self, socketMap, delay, onDone):
+        self.__socketMap = socketMap
+        self.__key = -id(self)  # never a file descriptor
+        self.__at = monotonic() + delay
+        self.__onDone = onDone
+        socketMap[self.__key] = self
+
+    def readable(self):
+        return False
+
+    def writable(self):
+        return False
+
+    def flush(self):
+        if monotonic() >= self.__at:
+            self.close()
+            self.__onDone()
+
+    def close(self):
+        self.__socketMap.pop(self.__key, None)
+
+
+class AsyncIRC(IRC):
+    def __init__(self, oauthToken, username, overrideSend=False, modBot=False, cmdShebang="!", tags=False,
+                 queueFactory=threadQueue, joinLimiter=None, sendLimiter=None, dispatcher=None, noDelay=False,
+                 viewerCache=None, roster=None, recorder=None, profiler=None, tls=None, keepAlive=None,
+                 callbacks=None, socketMap=None):
+        """
+        Setup and initialize the AsyncIRC object with the configurations given, see IRC.__init__().
+        Call connect() after the constructor
+
+        :param socketMap: asyncore socket map of the event loop. Defaults to the global asyncore map
+        :exception IllegalArgumentError when given overrideSend, queueFactory, dispatcher or tls
+        """
+        unsupported = [name for name, given in (("overrideSend", overrideSend),
+                                                ("queueFactory", queueFactory is not threadQueue),
+                                                ("dispatcher", dispatcher is not None),
+                                                ("tls", tls)) if given]
+        if unsupported:
+            raise IllegalArgumentError("AsyncIRC doesn't support {}".format(", ".join(unsupported)))
+        super(AsyncIRC, self).__init__(oauthToken, username, modBot=modBot, cmdShebang=cmdShebang, tags=tags,
+                                       sendLimiter=sendLimiter, viewerCache=viewerCache, roster=roster,
+                                       recorder=recorder, profiler=profiler, callbacks=callbacks)
+
+        # Networks
+        self.__socketMap = asyncore.socket_map if socketMap is None else socketMap
+        self.__conn = None
+        self.__address = (TWITCH_IRC_HOST, TWITCH_IRC_PORT)
+        self.__noDelay = noDelay
+        self.__keepAlive = keepAlive
+        self.__state = State.DISCONNECTED
+        self.__login = None  # Login of the current connection
+        self.__connectStart = None
+        self.__connectTimings = {}
+        self.__error = None
+        self.__shutdown = False
+        self.__failures = 0  # failed attempts of the current reconnect
+        self.__backoff = None  # _Backoff of the next reconnect attempt
+        self.__loginDeadline = None  # monotonic time the login of a reconnect attempt must be done by
+        self.__byteCounts = [0, 0]  # received, sent by every connection
+
+        # the bytes are counted by the connections, the LineReader/LineWriter of IRC are unused
+        metrics = self.getMetrics()
+        metrics.get("bytes_received_total").func = lambda: self.__byteCounts[0]
+        metrics.get("bytes_sent_total").func = lambda: self.__byteCounts[1]
+        metrics.get("join_queue_depth").func = lambda: len(self.__joinQueue)
+
+        # Queues
+        self.__scheduler = self.getSendQueue()
+        self.__joinQueue = deque()  # channels waiting to be joined
+        self.__joinTracker = self.getJoinTracker()
+        self.__joinLimiter = joinLimiter or RateLimiter(JOIN_LIMIT, JOIN_PERIOD)
+
+        # Twitch Info
+        self.__oauthToken = oauthToken
+        self.__tags = tags
+        self.__channels = set()
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                         Socket Functions
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def connect(self, timeout=60, host=TWITCH_IRC_HOST, port=TWITCH_IRC_PORT, block=True):
+        """
+        Connect and log in like IRC.connect(), the connect and login run on the event loop
+        :param timeout: max secs to wait for the login when blocking
+        :param block: run the event loop until logged in. If False, the login finishes while the loop runs
+        """
+        self.__address = (host, port)
+        self.__login = None
+        self.__connectStart = monotonic()
+        self.__error = None
+
+        self.__conn = _Connection(self.createSocket(), self.__socketMap, self.__handleConnect, self.__handleLines,
+                                  self.__handleClose, self.__flush, self.__byteCounts)
+        try:
+            self.__conn.connect((host, port))
+        except socket.error, e:
+            self.__conn.close()
+            print >> sys.stderr, 'Cannot connect to Twitch IRC server ({}:{}).'.format(host, port)
+            print >> sys.stderr, '\tErrno:\t\t{errno}{newline}' \
+                                 '\tMsg:\t\t{msg}{newline}'.format(errno=e[0], newline=os.linesep, msg=e[1])
+            raise
+
+        if not block:
+            return
+
+        deadline = monotonic() + timeout
+        while self.__state != State.CONNECTED and self.__error is None:
+            if monotonic() > deadline:
+                self.close()
+                raise IRCException("Unable to receive authentication response from the Twitch IRC server")
+            loop(self.__socketMap, count=1)
+
+        if self.__error is not None:
+            raise self.__error
+
+    def isConnected(self):
+        return self.__state == State.CONNECTED
+
+    def getConnectTimings(self):
+        return dict(self.__connectTimings)
+
+    def onReconnect(self):
+        """
+        Reconnect like IRC.onReconnect(), the new connection is made from the event loop
+        """
+        if self.__state != State.CONNECTED or self.__shutdown:
+            return
+        self.getMetrics().get("reconnects_total").inc()
+        self.__state = State.RECONNECTING
+        self.__conn.close()
+        self.__failures = 0
+        self.__reconnect()
+
+    def __reconnect(self):
+        """
+        Start a reconnect attempt. The connect finishes on the event loop
+        """
+        self.__backoff = None
+        self.__loginDeadline = monotonic() + RECONNECT_TIMEOUT
+        try:
+            self.connect(host=self.__address[0], port=self.__address[1], block=False)
+        except socket.error:
+            self.__retry()
+
+    def __retry(self):
+        """
+        Schedule the next reconnect attempt after a failed one
+        """
+        self.getMetrics().get("reconnect_failures_total").inc()
+        delay = reconnectDelay(self.__failures)
+        self.__failures += 1
+        self.__backoff = _Backoff(self.__socketMap, delay, self.__reconnect)
+
+    def close(self):
+        self.__state = State.DISCONNECTED
+        if self.__backoff is not None:
+            self.__backoff.close()
+            self.__backoff = None
+        if self.__conn is not None:
+            self.__conn.close()
+
+    def serverForever(self, pollInterval=POLL_INTERVAL):
+        """
+        Run the shared event loop until this connection is shut down
+        """
+        while not self.__shutdown and self.__socketMap:
+            loop(self.__socketMap, pollInterval, count=1)
+
+    def shutdown(self):
+        self.__shutdown = True
+        self.close()
+        if self.getRecorder() is not None:
+            self.getRecorder().close()
+
+    def __handleConnect(self):
+        timings = {"tcp": monotonic() - self.__connectStart}
+        self.getMetrics().get("connect_seconds").observe(timings["tcp"])
+        if self.__noDelay:
+            setNoDelay(self.__conn.socket)
+        if self.__keepAlive is not None:
+            setKeepAlive(self.__conn.socket, self.__keepAlive)
+
+        self.__login = Login(self.__oauthToken, self.getUsername(), self.__tags, self.__connectStart, timings)
+        self.__conn.write("".join(self.__login.lines()))
+
+    def __handleClose(self, error):
+        if self.__state == State.CONNECTED:  # connection lost
+            if error is not None:
+                print >> sys.stderr, "Connection to Twitch IRC server failed.\n\t", error
+            self.onReconnect()
+            return
+        if self.__state == State.RECONNECTING:  # the attempt failed to connect or log in
+            print >> sys.stderr, "Reconnect to Twitch IRC server failed, retrying.\n\t", error
+            self.__retry()
+            return
+
+        if self.__error is None:
+            if error is None:
+                error = IRCException("Unable to receive authentication response from the Twitch IRC server")
+            self.__error = error
+        elif error is not None:
+            print >> sys.stderr, "Connection to Twitch IRC server failed.\n\t", error
+        self.__state = State.DISCONNECTED
+
+    def __handleLines(self, lines):
+        recorder = self.getRecorder()
+        for line in lines:
+            if recorder is not None:
+                recorder.record(line)
+
+            if self.__state != State.CONNECTED:
+                self.__feedLogin(line)
+            elif 'PING :tmi.twitch.tv' == line:  # check for ping-pong
+                self.onPing()
+            elif 'RECONNECT :tmi.twitch.tv' == line:  # reconnects
+                self.onReconnect()
+            else:
+                self.onResponse(line)
+
+    def __feedLogin(self, line):
+        if self.__login is None:  # the login failed, the rest of the lines are dropped
+            return
+        try:
+            reply = self.__login.feed(line)
+        except AuthenticationError, e:
+            self.__login = None
+            self.__error = e
+            if self.__state == State.RECONNECTING:  # nobody waits on connect(), retrying won't help
+                print >> sys.stderr, "Reconnect to Twitch IRC server failed.\n\t", e
+            self.close()
+            return
+        if reply is not None:
+            self.__conn.write(reply)
+
+        if self.__login.done():
+            timings = self.__login.timings
+            self.__connectTimings = timings
+            self.getMetrics().get("login_seconds").observe(timings["total"] - timings["tcp"])
+            self.__state = State.CONNECTED
+            self.__joinQueue.clear()
+            self.__joinTracker.clear()
+            self.__queueJoins(self.__channels)
+
+    def __flush(self):
+        """
+        Move the commands the rate limiters allow from the queues to the socket
+        """
+        if self.__state != State.CONNECTED:
+            if self.__state == State.RECONNECTING and monotonic() > self.__loginDeadline:
+                print >> sys.stderr, "Reconnect to Twitch IRC server failed, retrying.\n\t" \
+                                     "No authentication response from the Twitch IRC server"
+                self.__conn.close()
+                self.__retry()
+            return
+
+        self.__joinQueue.extend(self.__joinTracker.expired())
+        while self.__joinQueue and self.__joinLimiter.tryAcquire():
+            # pack every channel the limiter allows into one line
+            channels = [self.__joinQueue.popleft()]
+            length = len("JOIN #\r\n") + len(channels[0])
+            while self.__joinQueue and length + len(self.__joinQueue[0]) + 2 <= MAX_LINE_LENGTH and \
+                    self.__joinLimiter.tryAcquire():
+                channels.append(self.__joinQueue.popleft())
+                length += len(channels[-1]) + 2
+
+            self.__conn.write("JOIN {}\r\n".format(",".join("#" + c for c in channels)))
+            for channel in channels:
+                self.__joinTracker.sent(channel)
+
+        command = self.__scheduler.get(timeout=0)
+        while command is not None:
+            self.__conn.write(command)
+            command = self.__scheduler.get(timeout=0)
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                         Channel Functions
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def joinChannels(self, channels):
+        if type(channels) != list:
+            raise TypeError("Channels must be type list")
+
+        self.__channels.update(channels)
+        request = self.__joinTracker.add(channels)
+        if self.__state == State.CONNECTED:
+            self.__queueJoins(channels)
+        return request
+
+    def partChannels(self, channels):
+        if type(channels) != list:
+            raise TypeError("Channels must be type list")
+
+        for channel in channels:
+            self.__channels.remove(channel)
+            self.__joinTracker.cancel(channel)
+        parted = set(channels)
+        self.__joinQueue = deque(channel for channel in self.__joinQueue if channel not in parted)
+        if self.__state == State.CONNECTED:
+            for line, packed in packLines(IRC.PART, channels):
+                self.__conn.write(line)
+
+    def __queueJoins(self, channels):
+        self.__joinQueue.extend(channels)
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                       Communication Functions
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def onPing(self):
+        self.__conn.write('PONG :tmi.twitch.tv\r\n')
+
+    def sendCommand(self, cmd, channel=None):
+        """
+        Queue a raw command like IRC.sendCommand(), it is sent while the event loop runs
+        """
+        if self.__state == State.DISCONNECTED:
+            raise IRCException("Disconnected from Twitch IRC server.")
+
+        self.__scheduler.put(cmd, channel)
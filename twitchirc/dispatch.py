@@ -0,0 +1,150 @@
+"""
+    Run IRC callbacks off the recv thread.
+
+    By default callbacks run on the recv thread, so a slow onMessage stalls socket reads for every channel.
+    Give the IRC a CallbackDispatcher and the recv thread only parses lines and queues the callbacks:
+
+        irc = MyIRC("oauth:abcdefghijklmnopqrstuvwxyz", "username", dispatcher=CallbackDispatcher(workers=8))
+
+    Callbacks of the same channel always run on the same worker, in the order the lines were received.
+    Callbacks of different channels run in parallel.
+"""
+import Queue
+import sys
+import threading
+import traceback
+
+# what submit() does when the queue of a worker is full
+BLOCK = "block"  # wait for room. Slows down the recv thread
+DROP_NEWEST = "drop_newest"  # drop the callback being submitted
+DROP_OLDEST = "drop_oldest"  # drop the oldest queued callback of the worker
+
+_STOP = object()
+
+
+class CallbackDispatcher(object):
+    def __init__(self, workers=4, maxsize=10000, policy=BLOCK):
+        """
+        :param int workers: amount of worker threads
+        :param int maxsize: max amount of queued callbacks per worker
+        :param policy: BLOCK, DROP_NEWEST or DROP_OLDEST. What happens when a worker queue is full
+        """
+        if workers < 1:
+            raise ValueError("At least 1 worker is needed")
+        if policy not in (BLOCK, DROP_NEWEST, DROP_OLDEST):
+            raise ValueError("Unknown queue full policy: {}".format(policy))
+
+        self.__policy = policy
+        self.__queues = [Queue.Queue(maxsize) for _ in xrange(workers)]
+        self.__workers = []
+        self.__dropped = 0
+        self.__lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the workers. Called by the first submit() if not called before
+        """
+        with self.__lock:
+            if self.__workers:
+                return
+
+            for q in self.__queues:
+                t = threading.Thread(target=self.__work, args=(q,))
+                t.daemon = True
+                t.start()
+                self.__workers.append(t)
+
+    def stop(self, wait=True):
+        """
+        Stop the workers after the callbacks queued so far have run
+        :param bool wait: block until the workers have stopped
+        """
+        with self.__lock:
+            workers, self.__workers = self.__workers, []
+        if not workers:
+            return
+
+        for q in self.__queues:
+            q.put(_STOP)
+        if wait:
+            for t in workers:
+                t.join()
+
+    def isRunning(self):
+        return len(self.__workers) > 0
+
+    def submit(self, key, callback, *args, **kwargs):
+        """
+        Queue a callback
+        :param key: ordering key, usually the channel. Callbacks with the same key run in submission order
+        :param callback: callable to run on a worker
+        :return: False if the callback (DROP_NEWEST) or an older one (DROP_OLDEST) was dropped
+        """
+        if not self.__workers:
+            self.start()
+
+        q = self.__queues[hash(key) % len(self.__queues)]
+        item = (callback, args, kwargs)
+
+        if self.__policy == BLOCK:
+            q.put(item)
+            return True
+
+        if self.__policy == DROP_NEWEST:
+            try:
+                q.put_nowait(item)
+                return True
+            except Queue.Full:
+                self.__drop()
+                return False
+
+        dropped = False
+        while True:
+            try:
+                q.put_nowait(item)
+                return not dropped
+            except Queue.Full:
+                try:
+                    q.get_nowait()
+                    q.task_done()
+                    self.__drop()
+                    dropped = True
+                except Queue.Empty:
+                    pass
+
+    def __drop(self):
+        with self.__lock:
+            self.__dropped += 1
+
+    def getDropped(self):
+        """
+        :return: amount of callbacks dropped because a worker queue was full
+        """
+        return self.__dropped
+
+    def qsize(self):
+        """
+        :return: amount of queued callbacks across all workers
+        """
+        return sum(q.qsize() for q in self.__queues)
+
+    def join(self):
+        """
+        Block until every queued callback has run
+        """
+        for q in self.__queues:
+            q.join()
+
+    def __work(self, q):
+        while True:
+            item = q.get()
+            try:
+                if item is _STOP:
+                    return
+
+                callback, args, kwargs = item
+                callback(*args, **kwargs)
+            except Exception:
+                print >> sys.stderr, "Exception in callback.\n\t", traceback.format_exc()
+            finally:
+                q.task_done()
@@ -0,0 +1,208 @@
+"""
+    Event objects of the IRC callbacks.
+
+    An IRC whose subclass overrides onEvent(event) gets one event per handled line besides the usual callback.
+    Events carry the raw line, the receive time, the lazy Tags and the parsed fields of the callback in
+    `__slots__`, so pipelines can queue, batch and pickle them without a dict per line:
+
+        class Bot(IRC):
+            def onEvent(self, event):
+                if isinstance(event, Message):
+                    queue.put(event)  # event.channel, event.viewer, event.message, event.tags["display-name"]
+
+    Events are only built when onEvent is overridden.
+"""
+from twitchirc.parser import Tags, EMPTY_TAGS
+
+
+class Event(object):
+    __slots__ = ("line", "time", "tags", "channel")
+    callback = None  # name of the IRC callback the event belongs to
+    fields = ()  # parsed fields besides the channel, in callback argument order
+
+    def __getstate__(self):
+        # tags are pickled as their raw string and parsed lazily again
+        return (self.line, self.time, self.tags.raw, self.channel) + tuple(getattr(self, f) for f in self.fields)
+
+    def __setstate__(self, state):
+        self.line, self.time, raw, self.channel = state[:4]
+        self.tags = Tags(raw) if raw else EMPTY_TAGS
+        for field, value in zip(self.fields, state[4:]):
+            setattr(self, field, value)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.__getstate__() == other.__getstate__()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(field, getattr(self, field)) for field in ("channel",) + self.fields))
+
+
+class Message(Event):
+    __slots__ = ("viewer", "message")
+    callback = "onMessage"
+    fields = __slots__
+
+    def __init__(self, line, time, tags, channel, viewer, message):
+        self.line = line
+        self.time = time
+        self.tags = tags
+        self.channel = channel
+        self.viewer = viewer
+        self.message = message
+
+
+class Command(Event):
+    __slots__ = ("viewer", "command", "value")
+    callback = "onCommand"
+    fields = __slots__
+
+    def __init__(self, line, time, tags, channel, viewer, command, value):
+        self.line = line
+        self.time = time
+        self.tags = tags
+        self.channel = channel
+        self.viewer = viewer
+        self.command = command
+        self.value = value
+
+
+class JoinPart(Event):
+    __slots__ = ("viewer", "state")
+    callback = "onJoinPart"
+    fields = __slots__
+
+    def __init__(self, line, time, tags, channel, viewer, state):
+        """
+        :param string state: IRC.JOIN or IRC.PART
+        """
+        self.line = line
+        self.time = time
+        self.tags = tags
+        self.channel = channel
+        self.viewer = viewer
+        self.state = state
+
+
+class Mode(Event):
+    __slots__ = ("viewer", "opcode")
+    callback = "onMode"
+    fields = __slots__
+
+    def __init__(self, line, time, tags, channel, viewer, opcode):
+        """
+        :param string opcode: IRC.OP or IRC.DEOP
+        """
+        self.line = line
+        self.time = time
+        self.tags = tags
+        self.channel = channel
+        self.viewer = viewer
+        self.opcode = opcode
+
+
+class Notice(Event):
+    __slots__ = ("msgid", "message")
+    callback = "onNotice"
+    fields = __slots__
+
+    def __init__(self, line, time, tags, channel, msgid, message):
+        self.line = line
+        self.time = time
+        self.tags = tags
+        self.channel = channel
+        self.msgid = msgid
+        self.message = message
+
+
+class HostTarget(Event):
+    __slots__ = ("target", "amount")
+    callback = "onHostTarget"
+    fields = __slots__
+
+    def __init__(self, line, time, tags, channel, target, amount):
+        """
+        :param string channel: hosting channel
+        :param string target: hosted channel, `None` when hosting stopped
+        """
+        self.line = line
+        self.time = time
+        self.tags = tags
+        self.channel = channel
+        self.target = target
+        self.amount = amount
+
+
+class ClearChat(Event):
+    __slots__ = ("viewer",)
+    callback = "onClearChat"
+    fields = __slots__
+
+    def __init__(self, line, time, tags, channel, viewer):
+        """
+        :param string viewer: timed out or banned viewer, `None` when the whole chat was cleared
+        """
+        self.line = line
+        self.time = time
+        self.tags = tags
+        self.channel = channel
+        self.viewer = viewer
+
+
+class UserNotice(Event):
+    __slots__ = ("message",)
+    callback = "onUserNotice"
+    fields = __slots__
+
+    def __init__(self, line, time, tags, channel, message):
+        self.line = line
+        self.time = time
+        self.tags = tags
+        self.channel = channel
+        self.message = message
+
+
+class UserState(Event):
+    __slots__ = ()
+    callback = "onUserState"
+
+    def __init__(self, line, time, tags, channel):
+        self.line = line
+        self.time = time
+        self.tags = tags
+        self.channel = channel
+
+
+class RoomState(Event):
+    __slots__ = ()
+    callback = "onRoomState"
+
+    def __init__(self, line, time, tags, channel):
+        self.line = line
+        self.time = time
+        self.tags = tags
+        self.channel = channel
+
+
+class IRCInfo(Event):
+    __slots__ = ("info",)
+    callback = "onIRCInfo"
+    fields = __slots__
+
+    def __init__(self, line, time, tags, info):
+        """
+        :param string info: the line after `:username.tmi.twitch.tv NNN username`. Has no channel
+        """
+        self.line = line
+        self.time = time
+        self.tags = tags
+        self.channel = None
+        self.info = info
+
+
+# callback name -> event class
+EVENTS = dict((cls.callback, cls) for cls in (Message, Command, JoinPart, Mode, Notice, HostTarget, ClearChat,
+                                               UserNotice, UserState, RoomState, IRCInfo))
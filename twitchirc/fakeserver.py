@@ -0,0 +1,370 @@
+"""
+    Local stand-in for the Twitch IRC server, for integration and load tests.
+
+    Handles PASS/NICK login, CAP REQ, JOIN/PART echo with NAMES and ROOMSTATE, PRIVMSG fan-out to the other
+    clients of a channel and PING/PONG. The test drives it to send PINGs, RECONNECTs or a flood of messages at a
+    given rate, and it records every command it receives so the send rate of the clients can be checked against
+    the Twitch limits:
+
+        server = FakeTMIServer()
+        server.start()
+        bot.connect(host="127.0.0.1", port=server.port)
+        server.flood("channel", rate=1000, count=10000)
+        ...
+        assert not server.getViolations()
+        server.stop()
+
+    With a certificate it speaks TLS, ex: FakeTMIServer(certfile="tests/fixtures/localhost.pem").
+"""
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+
+from twitchirc.irc import JOIN_LIMIT, JOIN_PERIOD, COMMAND_LIMIT, MOD_COMMAND_LIMIT, COMMAND_PERIOD
+from twitchirc.parser import tokenize, splitParams
+from twitchirc.ratelimit import monotonic
+from twitchirc.reader import LineReader
+
+AUTH_FAILED = ":tmi.twitch.tv NOTICE * :Login authentication failed\r\n"
+WELCOME = (":tmi.twitch.tv 001 {nick} :Welcome, GLHF!\r\n"
+           ":tmi.twitch.tv 002 {nick} :Your host is tmi.twitch.tv\r\n"
+           ":tmi.twitch.tv 003 {nick} :This server is rather new\r\n"
+           ":tmi.twitch.tv 004 {nick} :-\r\n"
+           ":tmi.twitch.tv 375 {nick} :-\r\n"
+           ":tmi.twitch.tv 372 {nick} :You are in a maze of twisty passages, all alike.\r\n"
+           ":tmi.twitch.tv 376 {nick} :>\r\n")
+
+
+class Violation(object):
+    """
+        A client sent more commands or joins than the limit allows within the period
+    """
+    __slots__ = ("nick", "kind", "count", "limit", "period")
+
+    def __init__(self, nick, kind, count, limit, period):
+        self.nick = nick
+        self.kind = kind  # "command" or "join"
+        self.count = count
+        self.limit = limit
+        self.period = period
+
+    def __repr__(self):
+        return "Violation({}: {} {}s in {} secs, limit {})".format(self.nick, self.count, self.kind, self.period,
+                                                                   self.limit)
+
+
+class _Client(object):
+    def __init__(self, conn, address):
+        self.conn = conn
+        self.address = address
+        self.password = None
+        self.nick = None
+        self.loggedIn = False
+        self.caps = set()
+        self.channels = set()
+        self.received = []  # every line received from the client
+        self.commands = deque()  # times of the PRIVMSGs within the command period
+        self.joins = deque()  # times of the joined channels within the join period
+        self.pongs = 0
+        self.lock = threading.Lock()
+
+    def send(self, data):
+        with self.lock:
+            try:
+                self.conn.sendall(data)
+            except socket.error:
+                pass  # the client is gone, its recv loop cleans up
+
+
+class FakeTMIServer(object):
+    def __init__(self, host="127.0.0.1", port=0, tokens=None, moderators=(), clock=monotonic, certfile=None):
+        """
+        :param host: interface to listen on
+        :param int port: port to listen on. 0 picks a free port, see `port` after start()
+        :param tokens: dict of nick -> oauth token that is accepted. Any token is accepted if `None`
+        :param moderators: nicks that are checked against the mod bot command limit
+        :param string certfile: PEM file with the certificate and private key to accept TLS connections with
+        """
+        self.__address = (host, port)
+        self.__context = None
+        if certfile is not None:
+            self.__context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+            self.__context.load_cert_chain(certfile)
+        self.__tokens = tokens
+        self.__moderators = set(moderators)
+        self.__clock = clock
+        self.__sock = None
+        self.__clients = []
+        self.__violations = []
+        self.__running = False
+        self.__lock = threading.Lock()
+        self.__threads = []
+        self.port = None
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                         Server Functions
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def start(self):
+        """
+        Listen and accept clients on a background thread
+        :return: port the server listens on
+        """
+        self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__sock.bind(self.__address)
+        self.__sock.listen(128)
+        self.__sock.settimeout(0.1)
+        self.port = self.__sock.getsockname()[1]
+        self.__running = True
+        self.__spawn(self.__accept)
+        return self.port
+
+    def stop(self):
+        """
+        Close every client connection and stop listening
+        """
+        self.__running = False
+        for client in self.getClients():
+            self.__close(client)
+        for t in list(self.__threads):
+            if t is not threading.current_thread():
+                t.join()
+        self.__sock.close()
+
+    def __spawn(self, target, *args):
+        t = threading.Thread(target=target, args=args)
+        t.daemon = True
+        with self.__lock:
+            self.__threads = [thread for thread in self.__threads if thread.is_alive()]
+            self.__threads.append(t)
+        t.start()
+        return t
+
+    def __accept(self):
+        while self.__running:
+            try:
+                conn, address = self.__sock.accept()
+            except socket.timeout:
+                continue
+            except socket.error:
+                return
+
+            conn.settimeout(None)
+            client = _Client(conn, address)
+            with self.__lock:
+                self.__clients.append(client)
+            self.__spawn(self.__serve, client)
+
+    def __close(self, client):
+        with self.__lock:
+            if client in self.__clients:
+                self.__clients.remove(client)
+        try:
+            client.conn.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        client.conn.close()
+
+    def __serve(self, client):
+        try:
+            if self.__context is not None:
+                with client.lock:  # no sends until the handshake is done
+                    client.conn = self.__context.wrap_socket(client.conn, server_side=True)
+            reader = LineReader(client.conn)
+            for line in reader:
+                if not self.__running:
+                    break
+                client.received.append(line)
+                if not self.__handle(client, line):
+                    break
+        except socket.error:
+            pass
+        self.__close(client)
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                         Client Commands
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def __handle(self, client, line):
+        """
+        :return: False to drop the client
+        """
+        tags, prefix, command, params = tokenize(line)
+        if command == "PASS":
+            client.password = params
+        elif command == "NICK":
+            return self.__login(client, params.lower())
+        elif command == "CAP":
+            caps = splitParams(params)
+            if len(caps) == 2 and caps[0] == "REQ":
+                client.caps.update(caps[1].split())
+                client.send(":tmi.twitch.tv CAP * ACK :{}\r\n".format(caps[1]))
+        elif not client.loggedIn:
+            return True  # ignored until logged in, like Twitch
+        elif command == "JOIN":
+            self.__join(client, params)
+        elif command == "PART":
+            for channel in params.split(","):
+                client.channels.discard(channel[1:])
+                client.send(":{0}!{0}@{0}.tmi.twitch.tv PART {1}\r\n".format(client.nick, channel))
+        elif command == "PRIVMSG":
+            self.__privmsg(client, params)
+        elif command == "PONG":
+            client.pongs += 1
+        elif command == "PING":
+            client.send(":tmi.twitch.tv PONG tmi.twitch.tv :{}\r\n".format(params.lstrip(":")))
+        return True
+
+    def __login(self, client, nick):
+        client.nick = nick
+        if self.__tokens is not None and self.__tokens.get(nick) != client.password:
+            client.send(AUTH_FAILED)
+            return False
+
+        client.loggedIn = True
+        client.send(WELCOME.format(nick=nick))
+        return True
+
+    def __join(self, client, params):
+        now = self.__clock()
+        lines = []
+        for channel in params.split(","):
+            channel = channel[1:]
+            self.__count(client, client.joins, now, "join", JOIN_LIMIT, JOIN_PERIOD)
+            client.channels.add(channel)
+            if "twitch.tv/membership" in client.caps:
+                lines.append(":{0}!{0}@{0}.tmi.twitch.tv JOIN #{1}\r\n".format(client.nick, channel))
+                lines.append(":{0}.tmi.twitch.tv 353 {0} = #{1} :{0}\r\n".format(client.nick, channel))
+                lines.append(":{0}.tmi.twitch.tv 366 {0} #{1} :End of /NAMES list\r\n".format(client.nick, channel))
+            if "twitch.tv/commands" in client.caps:
+                lines.append("{}:tmi.twitch.tv USERSTATE #{}\r\n".format(
+                    "@mod=0 " if "twitch.tv/tags" in client.caps else "", channel))
+                lines.append("{}:tmi.twitch.tv ROOMSTATE #{}\r\n".format(
+                    "@slow=0;subs-only=0 " if "twitch.tv/tags" in client.caps else "", channel))
+        client.send("".join(lines))
+
+    def __privmsg(self, client, params):
+        limit = MOD_COMMAND_LIMIT if client.nick in self.__moderators else COMMAND_LIMIT
+        self.__count(client, client.commands, self.__clock(), "command", limit, COMMAND_PERIOD)
+
+        target = splitParams(params)[0]
+        line = ":{0}!{0}@{0}.tmi.twitch.tv PRIVMSG {1}\r\n".format(client.nick, params)
+        for other in self.getClients(target[1:]):
+            if other is not client:
+                other.send(line)
+
+    def __count(self, client, times, now, kind, limit, period):
+        """
+        Record a rate limited command and a Violation if the client went over the limit
+        """
+        times.append(now)
+        while times and times[0] <= now - period:
+            times.popleft()
+        if len(times) > limit:
+            with self.__lock:
+                self.__violations.append(Violation(client.nick, kind, len(times), limit, period))
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                         Test Controls
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def getClients(self, channel=None):
+        """
+        :param channel: only the clients that joined this channel
+        :return: list of the connected clients
+        """
+        with self.__lock:
+            return [client for client in self.__clients if channel is None or channel in client.channels]
+
+    def waitForClients(self, amount, channel=None, timeout=5):
+        """
+        Block until `amount` clients are logged in (and joined `channel` if given)
+        :return: True if the clients showed up in time
+        """
+        deadline = monotonic() + timeout
+        while monotonic() < deadline:
+            if len([c for c in self.getClients(channel) if c.loggedIn]) >= amount:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def getReceived(self, nick=None):
+        """
+        :return: every line received from the clients, or from one client
+        """
+        return [line for client in self.getClients() if nick is None or client.nick == nick
+                for line in client.received]
+
+    def getPongs(self):
+        return sum(client.pongs for client in self.getClients())
+
+    def getViolations(self):
+        """
+        :return: list of Violation of the Twitch rate limits by the clients
+        """
+        with self.__lock:
+            return list(self.__violations)
+
+    def sendRaw(self, line, channel=None):
+        """
+        Send a raw line to every client (of a channel)
+        :param line: raw IRC line including the trailing `\\r\\n`
+        """
+        for client in self.getClients(channel):
+            client.send(line)
+
+    def ping(self):
+        self.sendRaw("PING :tmi.twitch.tv\r\n")
+
+    def reconnect(self):
+        """
+        Ask every client to reconnect, then close their connections like Twitch does when restarting
+        """
+        clients = self.getClients()  # clients that reconnect right away are kept
+        for client in clients:
+            client.send("RECONNECT :tmi.twitch.tv\r\n")
+        for client in clients:
+            self.__close(client)
+
+    def message(self, channel, viewer, message, tags=None):
+        """
+        Send a PRIVMSG from a viewer to the clients of a channel
+        :param string tags: raw tags without the leading `@`, only sent to clients that requested tags
+        """
+        line = ":{0}!{0}@{0}.tmi.twitch.tv PRIVMSG #{1} :{2}\r\n".format(viewer, channel, message)
+        for client in self.getClients(channel):
+            client.send("@{} {}".format(tags, line) if tags and "twitch.tv/tags" in client.caps else line)
+
+    def flood(self, channel, rate, count, viewer="viewer", block=False):
+        """
+        Send `count` messages to the clients of a channel at `rate` messages/sec. Messages that are due at the same
+        time are sent with one write, so high rates aren't capped by the amount of syscalls
+        :param float rate: messages per sec
+        :param bool block: wait until every message was sent
+        :return: the flooding thread
+        """
+        def run():
+            start = monotonic()
+            sent = 0
+            while sent < count and self.__running:
+                due = min(count, int((monotonic() - start) * rate) + 1)
+                data = "".join(":{0}!{0}@{0}.tmi.twitch.tv PRIVMSG #{1} :message {2}\r\n".format(viewer, channel, i)
+                               for i in xrange(sent, due))
+                self.sendRaw(data, channel)
+                sent = due
+                if sent < count:
+                    time.sleep(max(0, start + float(sent) / rate - monotonic()))
+
+        t = self.__spawn(run)
+        if block:
+            t.join()
+        return t
@@ -1,23 +1,54 @@
-import multiprocessing
+import Queue
+import inspect
 import os
+import random
 import re
 import socket
 import sys
 import threading
 import time
-from json import loads
-from urllib2 import urlopen
 
 from enum import Enum
 
-from twitchirc.exception import APIError, IRCException, AuthenticationError
-
-TWITCH_CHAT_VIEWER_URL = 'http://tmi.twitch.tv/group/user/{channel}/chatters'
+from twitchirc.events import EVENTS
+from twitchirc.exception import IRCException, AuthenticationError, IllegalArgumentError
+from twitchirc.joins import JoinTracker, packLines, MAX_LINE_LENGTH
+from twitchirc.metrics import Metrics, timer, SAMPLE_EVERY
+from twitchirc.parser import tokenize, splitParams, nick, Tags, EMPTY_TAGS
+from twitchirc.queues import threadQueue
+from twitchirc.ratelimit import RateLimiter, monotonic
+from twitchirc.reader import LineReader
+from twitchirc.scheduler import SendScheduler
+from twitchirc.tls import TLS, CertificateError
+from twitchirc.viewers import ViewerCache
+from twitchirc.writer import LineWriter, setNoDelay, setKeepAlive, setSendTimeout
+
+TWITCH_CHAT_VIEWER_URL = 'http://tmi.twitch.tv/group/user/{channel}/chatters'  # see twitchirc.viewers
 TWITCH_IRC_HOST = "irc.chat.twitch.tv"
 TWITCH_IRC_PORT = 6667
+TWITCH_IRC_TLS_PORT = 6697
+
+# https://help.twitch.tv/customer/portal/articles/1302780-twitch-irc
+JOIN_LIMIT = 50  # JOINs per JOIN_PERIOD secs
+JOIN_PERIOD = 15
+COMMAND_LIMIT = 20  # commands/messages per COMMAND_PERIOD secs
+MOD_COMMAND_LIMIT = 100  # commands/messages per COMMAND_PERIOD secs for mod bots
+COMMAND_PERIOD = 30
+
+POLL_INTERVAL = 0.5  # max secs a worker blocks before checking the connection state
+
+# reconnect attempts after the first one wait a random time up to RECONNECT_DELAY * 2^(failed attempts) secs
+RECONNECT_DELAY = 1
+RECONNECT_MAX_DELAY = 120
+RECONNECT_TIMEOUT = 30  # max secs to log in on each reconnect attempt
+
+# requested on every login. twitch.tv/tags is added with IRC(tags=True)
+CAPABILITIES = ("twitch.tv/membership", "twitch.tv/commands")
 
 State = Enum("CONNECTED", "DISCONNECTED", "RECONNECTING")
 
+# Regexs of the lines handled by the IRC callbacks. The IRC tokenizes lines instead of matching these,
+# they are kept for bots that parse lines themselves in an overridden onResponse()
 REGEXS = {"onMessage": r"^:(\w+)!\1@\1\.tmi\.twitch\.tv\s+PRIVMSG\s+#(\w+)\s+:(.*)$",
           "onCommand": r"^:(\b\w+)!\1@\1.tmi.twitch.tv PRIVMSG #(\b\w+) :{shebang}(\w*)\s?(.*)$",
           "onJoin": r"^:(\b\w+)!\1@\1.tmi.twitch.tv JOIN #(\b\w+)$",
@@ -33,6 +64,118 @@ REGEXS = {"onMessage": r"^:(\w+)!\1@\1\.tmi\.twitch\.tv\s+PRIVMSG\s+#(\w+)\s+:(.
           "onIRCInfo": r"^:{username}\.tmi\.twitch\.tv\s+\d+\s+{username}\s+(.*)"
           }
 
+# callbacks that can receive the line's tags
+CALLBACKS = ("onMessage", "onCommand", "onJoinPart", "onMode", "onNotice", "onHostTarget", "onClearChat",
+             "onUserNotice", "onUserState", "onRoomState", "onIRCInfo")
+
+# commands only the callbacks need. Their lines are dropped unparsed when none of their callbacks is called
+COMMAND_CALLBACKS = {"PRIVMSG": ("onMessage", "onCommand"),
+                     "JOIN": ("onJoinPart",),
+                     "PART": ("onJoinPart",),
+                     "HOSTTARGET": ("onHostTarget",),
+                     "CLEARCHAT": ("onClearChat",),
+                     "USERNOTICE": ("onUserNotice",)}
+# commands the roster needs whether their callbacks are called or not
+ROSTER_COMMANDS = ("PRIVMSG", "JOIN", "PART")
+
+
+def acceptsTags(callback):
+    """
+    :param callback: bound callback method
+    :return: True if the callback takes a `tags` argument
+    """
+    try:
+        spec = inspect.getargspec(callback)
+    except TypeError:  # not a python function
+        return False
+    return "tags" in spec.args or spec.keywords is not None
+
+
+def overriddenCallbacks(cls):
+    """
+    :param cls: IRC subclass
+    :return: set of the CALLBACKS the class overrides
+    """
+    return set(name for name in CALLBACKS if getattr(cls, name).__func__ is not getattr(IRC, name).__func__)
+
+
+def reconnectDelay(failures):
+    """
+    :param int failures: failed attempts of the current reconnect
+    :return: secs to wait before the next attempt
+    """
+    # full jitter, so bots restarted by the same server outage don't reconnect in lockstep
+    return random.uniform(0, min(RECONNECT_MAX_DELAY, RECONNECT_DELAY * 2 ** failures))
+
+
+class Login(object):
+    """
+        Login of one connection, shared by IRC and AsyncIRC.
+
+        PASS, NICK and the CAP REQs are pipelined in one write and the replies are fed in as they arrive, so logging
+        in takes one round trip after the TCP handshake. The login is done once the MOTD ended and every capability
+        was acknowledged or refused.
+    """
+
+    def __init__(self, oauthToken, username, tags, start, timings):
+        """
+        :param tags: request twitch.tv/tags as well
+        :param float start: monotonic time the connect started, the timings are secs since then
+        :param dict timings: phases done before the login ('tcp', 'tls'). The login phases are added to it
+        """
+        # membership: receive membership state events (NAMES, JOIN, PART, or MODE)
+        # commands: enables custom raw commands
+        caps = CAPABILITIES + (("twitch.tv/tags",) if tags else ())
+        self.__lines = ['PASS {}\r\n'.format(oauthToken), 'NICK {}\r\n'.format(username)] + \
+                       ['CAP REQ :{}\r\n'.format(cap) for cap in caps]
+        self.__caps = set(caps)  # waiting on an ACK/NAK
+        self.__welcomed = False
+        self.__start = start
+        self.timings = timings
+
+    def lines(self):
+        """
+        :return: list of the lines to send once connected
+        """
+        return self.__lines
+
+    def done(self):
+        return self.__welcomed and not self.__caps
+
+    def feed(self, line):
+        """
+        :param line: line received while logging in
+        :return: line to answer with, `None` if there is nothing to answer
+        :exception AuthenticationError when the server refused the login
+        """
+        if line == ":tmi.twitch.tv NOTICE * :Login authentication failed":
+            raise AuthenticationError("Login authentication failed")
+
+        tags, prefix, command, params = tokenize(line)
+        if command == "PING":
+            return 'PONG :tmi.twitch.tv\r\n'
+        elif prefix != "tmi.twitch.tv":
+            return None
+        elif command == "001":
+            self.timings["welcome"] = monotonic() - self.__start
+        elif command == "376":  # end of the MOTD
+            self.timings["login"] = monotonic() - self.__start
+            self.__welcomed = True
+        elif command == "CAP":
+            # CAP * ACK :twitch.tv/membership
+            reply = splitParams(params)
+            if len(reply) == 3 and reply[1] in ("ACK", "NAK"):
+                for cap in reply[2].split():
+                    self.__caps.discard(cap)
+                    if reply[1] == "NAK":
+                        print >> sys.stderr, "Twitch IRC server refused capability", cap
+                if not self.__caps:
+                    self.timings["caps"] = monotonic() - self.__start
+
+        if self.done():
+            self.timings["total"] = monotonic() - self.__start
+        return None
+
 
 class IRC(object):
     ID_SUBS_ON = "subs_on"
@@ -65,12 +208,31 @@ class IRC(object):
     JOIN = "JOIN"
     PART = "PART"
 
-    def __init__(self, oauthToken, username, overrideSend=False, modBot=False, cmdShebang="!"):
+    def __init__(self, oauthToken, username, overrideSend=False, modBot=False, cmdShebang="!", tags=False,
+                 queueFactory=threadQueue, joinLimiter=None, sendLimiter=None, dispatcher=None, noDelay=False,
+                 viewerCache=None, roster=None, recorder=None, profiler=None, tls=None, keepAlive=None,
+                 callbacks=None):
         """
         Setup and initialize the IRC object with the configurations given. Call connect() after the constructor
 
         :param oauthToken: twitch oauth token include the `oauth:` prefix
         :param username: twitch.tv username associated with the ouath token
+        :param tags: request IRCv3 tags from the server. Callbacks that accept a `tags` argument receive them
+        :param queueFactory: callable that returns the queue of channels waiting to be joined, see twitchirc.queues
+        :param joinLimiter: RateLimiter for JOINs. Give connections of the same account the same limiter
+        :param sendLimiter: RateLimiter for commands/messages. Give connections of the same account the same limiter
+        :param dispatcher: CallbackDispatcher that runs the callbacks off the recv thread. `None` to run them inline
+        :param noDelay: set TCP_NODELAY so small writes aren't delayed waiting on ACKs
+        :param viewerCache: ViewerCache used by getViewers(). Give connections that poll viewers the same cache
+        :param roster: Roster to keep the chatters of the joined channels in. `None` to not track chatters
+        :param recorder: Recorder that logs every received line, see twitchirc.recorder.replay()
+        :param profiler: CallbackProfiler that times every callback per name and channel. `None` to not profile
+        :param tls: True or a twitchirc.tls.TLS to connect with TLS. Give connections the same TLS to share its
+                    context
+        :param keepAlive: secs the connection may be idle before TCP keepalive probes are sent. `None` for no probes
+        :param callbacks: names of the callbacks to call, e.g. ("onMessage", "onCommand"). `None` for the ones the
+                          subclass overrides, or all of them if it overrides onEvent. Lines that only other
+                          callbacks need are dropped after their command word, without being parsed
         """
         if not oauthToken or (type(oauthToken) != str and type(oauthToken) != unicode):
             raise TypeError("Invalid Oauth token")
@@ -78,17 +240,32 @@ class IRC(object):
             raise TypeError("Invalid username")
 
         # Networks
-        self.__conn = self.createSocket()
+        self.__conn = None  # created by connect(), a new one for every reconnect
+        self.__address = (TWITCH_IRC_HOST, TWITCH_IRC_PORT)
+        self.__reader = LineReader()
+        self.__writer = LineWriter()
+        self.__noDelay = noDelay
+        self.__keepAlive = keepAlive
+        self.__tls = TLS() if tls is True else tls or None
         self.__state = State.DISCONNECTED
+        self.__online = threading.Event()  # set while connected, the workers wait on it while reconnecting
+        self.__connectTimings = {}
+        self.__reconnectLock = threading.Lock()
 
-        self.cmdShebang = cmdShebang
         self.__overrideSend = overrideSend
+        self.__recorder = recorder
+        self.__profiler = profiler
 
         # Threads
         self.__shutdown = False
-        manager = multiprocessing.Manager()
-        self.__joinQueue = manager.Queue()
-        self.__sendQueue = manager.Queue()
+        self.__stopped = threading.Event()  # set by shutdown(), interrupts the reconnect backoff
+        self.__joinQueue = queueFactory()
+        self.__joinLimiter = joinLimiter or RateLimiter(JOIN_LIMIT, JOIN_PERIOD)
+        self.__joinTracker = JoinTracker()
+        self.__sendLimiter = sendLimiter or RateLimiter(MOD_COMMAND_LIMIT if modBot else COMMAND_LIMIT, COMMAND_PERIOD)
+        self.__metrics = Metrics()
+        self.__sendWait = self.__metrics.histogram("send_wait_seconds", "Secs commands waited in the send queue")
+        self.__scheduler = SendScheduler(self.__sendLimiter, onSend=self.__sendWait.observe)
         self.__workers = []  # 0 = recv thread
         # 1 = join thread
         # 2 = send thread
@@ -98,6 +275,79 @@ class IRC(object):
         self.__username = username.lower()  # usernames are lowercase
         self.__modBot = modBot
         self.__channels = set()
+        self.__tags = tags
+        self.__viewerCache = viewerCache
+        self.__roster = roster
+
+        # Callbacks
+        self.__dispatcher = dispatcher
+        self.__handlers = {"PRIVMSG": self.__handlePrivmsg,
+                           "JOIN": self.__handleJoin,
+                           "PART": self.__handlePart,
+                           "MODE": self.__handleMode,
+                           "NOTICE": self.__handleNotice,
+                           "HOSTTARGET": self.__handleHostTarget,
+                           "CLEARCHAT": self.__handleClearChat,
+                           "USERNOTICE": self.__handleUserNotice,
+                           "USERSTATE": self.__handleUserState,
+                           "ROOMSTATE": self.__handleRoomState,
+                           "353": self.__handleNames}
+        self.cmdShebang = cmdShebang
+        self.__tagCallbacks = set(name for name in CALLBACKS if acceptsTags(getattr(self, name)))
+        # events are only built for subclasses that override onEvent
+        self.__events = EVENTS if type(self).onEvent.__func__ is not IRC.onEvent.__func__ else None
+        self.__line = None  # line being handled and its receive time, kept for the events
+        self.__receivedAt = None
+        if callbacks is None:
+            callbacks = CALLBACKS if self.__events is not None else overriddenCallbacks(type(self))
+        elif not set(callbacks).issubset(CALLBACKS):
+            unknown = sorted(set(callbacks) - set(CALLBACKS))
+            raise IllegalArgumentError("Unknown callbacks: {}".format(", ".join(unknown)))
+        self.__callbacks = frozenset(callbacks)
+        self.__joinPrefix = ":" + self.__username + "!"  # prefix of our own JOINs
+        self.__skipped = frozenset(command for command, names in COMMAND_CALLBACKS.iteritems()
+                                   if self.__callbacks.isdisjoint(names)
+                                   and (roster is None or command not in ROSTER_COMMANDS)) or None
+
+        self.__registerMetrics()
+
+    def __registerMetrics(self):
+        metrics = self.__metrics
+        self.__lineCounts = metrics.counter("lines_received_total", "Lines received per command", "command").values
+        self.__unknownLines = metrics.counter("unknown_lines_total", "Lines no handler could handle")
+        self.__parseTime = metrics.histogram("parse_seconds", "Secs to tokenize a line, sampled")
+        self.__callbackTime = metrics.histogram("callback_seconds", "Secs spent in a callback, sampled",
+                                                lock=threading.Lock() if self.__dispatcher is not None else None)
+        self.__joinWait = metrics.histogram("join_wait_seconds", "Secs channels waited in the join queue")
+        self.__commandsSent = metrics.counter("commands_sent_total", "Commands/messages sent by the send worker")
+        self.__joinsSent = metrics.counter("joins_sent_total", "Channels joined by the join worker")
+        self.__reconnects = metrics.counter("reconnects_total",
+                                            "Reconnects asked for by the server or after a lost connection")
+        self.__connectTime = metrics.histogram("connect_seconds", "Secs to open the TCP connection")
+        self.__handshakeTime = metrics.histogram("tls_handshake_seconds", "Secs of the TLS handshake")
+        self.__loginTime = metrics.histogram("login_seconds",
+                                             "Secs from the TCP/TLS connection until logged in with every capability")
+        self.__reconnectFailures = metrics.counter("reconnect_failures_total", "Failed reconnect attempts")
+        self.__reconnectTime = metrics.histogram("reconnect_seconds",
+                                                 "Secs from losing the connection until logged in again")
+        self.__rejoinTime = metrics.histogram("rejoin_seconds",
+                                              "Secs from losing the connection until every channel was joined again")
+        self.__joinThrottled = 0.0
+        self.__sampleCountdown = SAMPLE_EVERY  # lines until the next one whose parse and callbacks are timed
+        self.__timing = False
+        metrics.counterFunc("throttle_seconds_total", "Secs the workers waited on the rate limiters",
+                            lambda: {"join": self.__joinThrottled, "send": self.__scheduler.getThrottledTime()},
+                            "limiter")
+        metrics.gauge("send_queue_depth", "Commands waiting in the send queue", self.__scheduler.qsize)
+        metrics.gauge("join_queue_depth", "Channels waiting in the join queue", self.__joinQueue.qsize)
+        metrics.counterFunc("bytes_received_total", "Bytes received", lambda: self.__reader.getBytesRead())
+        metrics.counterFunc("bytes_sent_total", "Bytes sent", lambda: self.__writer.getBytesWritten())
+
+    def getMetrics(self):
+        """
+        :return: Metrics of this connection. See twitchirc.metrics
+        """
+        return self.__metrics
 
     """
     -----------------------------------------------------------------------------------------------
@@ -105,110 +355,198 @@ class IRC(object):
     -----------------------------------------------------------------------------------------------
     """
 
-    def connect(self, timeout=60, host=TWITCH_IRC_HOST, port=TWITCH_IRC_PORT):
+    def connect(self, timeout=60, host=TWITCH_IRC_HOST, port=None):
         """
         Connect and Log into the Twitch IRC server
         :param timeout:
         :param host:
-        :param port:
+        :param port: defaults to 6697 with TLS, 6667 without
         :exception socket.error when unable to connect to Twitch IRC server
         :exception IRCException when unable to receive authentication response
         :exception AuthenticationError when failed to login
         """
+        if self.__state != State.DISCONNECTED:
+            self.close()
+        self.__stopWorkers()
+        self.__stopped.clear()
+        if port is None:
+            port = TWITCH_IRC_TLS_PORT if self.__tls is not None else TWITCH_IRC_PORT
+        self.__login(timeout, host, port)
+        self.__startThreads()
+        self.__queueJoins(list(self.__channels))
+        print "connected"
+
+    def __login(self, timeout, host, port):
+        """
+        Log in with a new socket. The send and join queues are kept
+        """
+        self.__address = (host, port)
+        self.__conn = self.createSocket()
+        self.__reader.reset(self.__conn)
+        self.__writer.reset(self.__conn)
+
+        start = monotonic()
+        deadline = start + timeout
         self.__conn.settimeout(timeout)
-        start = time.time()
         try:
             self.__conn.connect((host, port))
-            timeout -= (time.time() - start)  # check how long it took to connect and subtract
+            # the socket blocks after login, a send that can't make progress must still return to the writer
+            setSendTimeout(self.__conn)
+            if self.__noDelay:
+                setNoDelay(self.__conn)
+            if self.__keepAlive is not None:
+                setKeepAlive(self.__conn, self.__keepAlive)
         except socket.error, e:
             print >> sys.stderr, 'Cannot connect to Twitch IRC server ({}:{}).'.format(host, port)
             print >> sys.stderr, '\tErrno:\t\t{errno}{newline}' \
                                  '\tMsg:\t\t{msg}{newline}'.format(errno=e[0], newline=os.linesep, msg=e[1])
             raise
-
-        self.__conn.send('PASS {}\r\n'.format(self.__oauthToken))
-        self.__conn.send('NICK {}\r\n'.format(self.__username))
-
-        self.__conn.settimeout(timeout)  # set the timeout based on the amount of time connect() took
-        start = time.time()
-        data = ""
+        timings = {"tcp": monotonic() - start}
+
+        if self.__tls is not None:
+            self.__conn.settimeout(max(deadline - monotonic(), 0.001))
+            self.__conn = self.__tls.wrap(self.__conn, host)
+            self.__reader.reset(self.__conn)
+            self.__writer.reset(self.__conn)
+            timings["tls"] = monotonic() - start
+            self.__handshakeTime.observe(timings["tls"] - timings["tcp"])
+
+        login = Login(self.__oauthToken, self.__username, self.__tags, start, timings)
+        self.__writer.writeLines(login.lines())
+        while not login.done():
+            reply = login.feed(self.__readLoginLine(deadline))
+            if reply is not None:
+                self.__writer.write(reply)
+
+        self.__connectTimings = timings
+        self.__connectTime.observe(timings["tcp"])
+        self.__loginTime.observe(timings["total"] - timings.get("tls", timings["tcp"]))
+
+        self.__conn.settimeout(None)  # the recv thread blocks until a line arrives or the socket is closed
+        self.__state = State.CONNECTED
+        self.__online.set()
+
+    def __readLoginLine(self, deadline):
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            raise IRCException("Unable to receive authentication response from the Twitch IRC server")
+        self.__conn.settimeout(remaining)
         try:
-            data += self.__conn.recv(1024)
-            timeout -= (time.time() - start)  # check how long it took to connect and subtract
+            line = self.__reader.readline()
         except socket.timeout:
             raise IRCException("Unable to receive authentication response from the Twitch IRC server")
+        if line is None:
+            raise IRCException("Twitch IRC server closed the connection while logging in")
+        return line
 
-        start = time.time()
-        while timeout > 0:
-            if ":tmi.twitch.tv NOTICE * :Login authentication failed" in data:
-                raise AuthenticationError("Login authentication failed")
-
-            if ":tmi.twitch.tv 001 " + self.__username in data and ":tmi.twitch.tv 376 " + self.__username in data:
-                # logged in
-                self.__state = State.CONNECTED
-
-                # receive membership state events (NAMES, JOIN, PART, or MODE)
-                self.__conn.send('CAP REQ :twitch.tv/membership\r\n')
-                data = self.__conn.recv(1024)
-
-                # Enables custom raw commands
-                self.__conn.send('CAP REQ :twitch.tv/commands\r\n')
-                time.sleep(.25)
-                data = self.__conn.recv(1024)
-
-                # Enables tags
-                # self.__conn.send('CAP REQ :twitch.tv/tags\r\n')
-                # data = self.__conn.recv(1024)
-
-                self.__startThreads()
-
-                self.joinChannels(list(self.__channels))
-                print "connected"
-                return
-
-            try:
-                self.__conn.settimeout(timeout)  # set the timeout based on the amount of time recv() took
-                data += self.__conn.recv(1024)
-                timeout -= (time.time() - start)  # check how long it took to recv and subtract
-            except socket.timeout:
-                raise IRCException("Unable to receive authentication response from the Twitch IRC server")
-
-        # if we get here, we didn't get a response from the server within the timeout limit
-        raise IRCException("Unable to receive authentication response from the Twitch IRC server")
+    def getConnectTimings(self):
+        """
+        :return: dict of secs since the start of the last connect until the phase finished: 'tcp' (connected),
+                 'tls' (handshake done, with TLS only), 'welcome' (001), 'login' (376), 'caps' (every capability
+                 acknowledged) and 'total'
+        """
+        return dict(self.__connectTimings)
 
     def createSocket(self):
         return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
     def onReconnect(self):
-        self.__state = State.RECONNECTING
-        self.close()
-        self.connect()
-
-    def __readline(self):
-        line = []
-        while self.__state == State.CONNECTED:
-            c = None
+        """
+        Reconnect with a new socket. Called when the server asks for a reconnect or the connection is lost.
+        Queued commands and joins are kept and every channel is joined again once logged in
+        """
+        with self.__reconnectLock:
+            if self.__state != State.CONNECTED or self.__shutdown:
+                return
+            self.__state = State.RECONNECTING
+            self.__online.clear()
+        self.__reconnects.inc()
+
+        # never block the recv thread that read the RECONNECT
+        t = threading.Thread(target=self.__reconnect, args=(monotonic(),))
+        t.daemon = True
+        t.start()
+
+    def __reconnect(self, lostAt):
+        self.__closeSocket()
+        recv = self.__workers[0] if self.__workers else None
+        if recv is not None and recv is not threading.current_thread():
+            recv.join()  # the old recv thread must not read from the new socket
+
+        failures = 0
+        while not self.__shutdown:
             try:
-                c = self.__conn.recv(1)
-            except StopIteration:  # fake the type of request when running tests
-                self.__state = State.DISCONNECTED
-                line = list("PING :tmi.twitch.tv")
+                self.__login(RECONNECT_TIMEOUT, *self.__address)
                 break
+            except (AuthenticationError, CertificateError), e:
+                print >> sys.stderr, "Reconnect to Twitch IRC server failed.\n\t", e
+                self.close()
+                return
+            except (socket.error, IRCException), e:
+                print >> sys.stderr, "Reconnect to Twitch IRC server failed, retrying.\n\t", e
+                self.__closeSocket()
+                self.__reconnectFailures.inc()
+                self.__stopped.wait(reconnectDelay(failures))
+                failures += 1
+        else:
+            return
 
-            if c == '\n':
+        self.__reconnectTime.observe(monotonic() - lostAt)
+        recv = threading.Thread(target=self.__recvWorker)
+        self.__workers[0] = recv
+        recv.start()
+        self.__rejoin(lostAt)
+
+    def __rejoin(self, lostAt):
+        """
+        Queue every channel to be joined again. The join worker packs them into as few lines as the join limit,
+        whose state carries over from the old connection, allows
+        """
+        # channels still queued from before the reconnect are joined with the rest, so each is joined once.
+        # Queued channels that were parted since are dropped
+        while True:
+            try:
+                self.__joinQueue.get_nowait()
+            except Queue.Empty:
                 break
-            else:
-                line.append(c)
+            self.__joinQueue.task_done()
+        channels = list(self.__channels)
 
-        size = len(line) - 1
+        self.__joinTracker.clear()
+        request = self.__joinTracker.add(channels)
+        request.addCallback(lambda done: self.__rejoinTime.observe(monotonic() - lostAt))
+        self.__queueJoins(channels)
 
-        if size > 0 and line[size] == '\r':  # IRC newlines are \r\n
-            del line[size]
+    def __readline(self):
+        try:
+            line = self.__reader.readline()
+        except StopIteration:  # fake the type of request when running tests
+            self.__state = State.DISCONNECTED
+            return "PING :tmi.twitch.tv"
+        except socket.error:
+            if self.__state == State.CONNECTED:  # connection lost
+                self.onReconnect()
+            return ""  # or the socket was closed while waiting on recv
 
-        return ''.join(line)
+        if line is None:  # server closed the connection
+            if self.__state == State.CONNECTED:
+                self.onReconnect()
+            return ""
+
+        return line
 
     def close(self):
         self.__state = State.DISCONNECTED  # should also close recv thread
+        self.__online.clear()
+        self.__closeSocket()
+
+    def __closeSocket(self):
+        if self.__conn is None:
+            return
+        try:
+            self.__conn.shutdown(socket.SHUT_RDWR)  # wakes up a recv blocked on the socket
+        except socket.error:  # not connected
+            pass
         self.__conn.close()
 
     def serverForever(self, pollInterval=0.5):
@@ -217,7 +555,12 @@ class IRC(object):
 
     def shutdown(self):
         self.__shutdown = True
+        self.__stopped.set()
         self.close()
+        if self.__recorder is not None:
+            self.__recorder.close()
+        if self.__dispatcher is not None:
+            self.__dispatcher.stop(wait=False)
 
     """
     -----------------------------------------------------------------------------------------------
@@ -232,46 +575,121 @@ class IRC(object):
         self.partChannels([channel])
 
     def joinChannels(self, channels):
+        """
+        Join channels. Channels are packed into as few JOIN lines as the join rate limit allows.
+        Channels given before connect() are joined once connected
+        :param channels: list of channels
+        :return: JoinRequest done once the server confirmed (or gave up on) every channel
+        """
         if type(channels) != list:
             raise TypeError("Channels must be type list")
 
-        for channel in channels:
-            cmd = "JOIN #{channel}\r\n".format(channel=channel)
-            self.__channels.add(channel)
-            if self.__overrideSend:
-                self.__conn.send(cmd)
-            else:
-                self.__joinQueue.put(cmd)
+        self.__channels.update(channels)
+        request = self.__joinTracker.add(channels)
+        if self.__state == State.CONNECTED:
+            self.__queueJoins(channels)
+        return request
 
     def partChannels(self, channels):
+        """
+        Part channels. While not connected the channels are only forgotten, a new connection doesn't join them
+        :param channels: list of channels
+        """
         if type(channels) != list:
             raise TypeError("Channels must be type list")
 
         for channel in channels:
-            cmd = "PART #{channel}\r\n".format(channel=channel)
             self.__channels.remove(channel)
-            self.__conn.send(cmd)
+            # the join worker drops the channel if it is still queued
+            self.__joinTracker.cancel(channel)
+        if self.__state != State.CONNECTED:
+            return
+
+        try:
+            self.__writer.writeLines([line for line, packed in packLines(IRC.PART, channels)])
+        except socket.error:  # connection lost, the reconnect doesn't join the parted channels
+            self.onReconnect()
+
+    def getJoinTracker(self):
+        """
+        :return: JoinTracker of the joins waiting on a confirmation from the server
+        """
+        return self.__joinTracker
+
+    def __queueJoins(self, channels):
+        if self.__overrideSend:
+            lines = packLines(IRC.JOIN, channels)
+            self.__writer.writeLines([line for line, packed in lines])
+            for line, packed in lines:
+                for channel in packed:
+                    self.__joinTracker.sent(channel)
+        else:
+            queuedAt = monotonic()
+            for channel in channels:
+                self.__joinQueue.put((channel, queuedAt))
 
     def getViewers(self, channel):
         """
 
         Note: If there are greater than 1000 chatters in a room, NAMES will only return the list of OPs currently
         in the room. So we use the chatters API instead
+        Results are cached for the TTL of the ViewerCache and must not be modified
         :param channel:
-        :return:
+        :return: dict with 'viewers' (dict of group -> list of usernames) and 'count'
+        :exception APIError when the Twitch API can't be reached or returned an error
         """
-        try:
-            data = urlopen(TWITCH_CHAT_VIEWER_URL.format(channel=channel)).read().decode('utf-8')
-        except:
-            raise APIError('Unable to connect Twitch API')
+        return self.getViewerCache().get(channel)
 
-        data = loads(data)
-        ret = {'viewers': data.pop('chatters'), 'count': data['chatter_count']}
-        return ret
+    def getViewersBulk(self, channels):
+        """
+        Get the viewers of many channels. Channels missing from the cache are fetched concurrently
+        :param channels: list of channels
+        :return: dict of channel -> getViewers() result, or `None` for channels that couldn't be fetched
+        """
+        return self.getViewerCache().getBulk(channels)
+
+    def getRoster(self):
+        """
+        :return: Roster of the chatters of the joined channels, `None` if the IRC was created without one
+        """
+        return self.__roster
+
+    def seedRoster(self, channel):
+        """
+        Add the chatters of a channel from getViewers() to the roster, once per channel. Useful for channels with
+        more than 1000 chatters, where Twitch doesn't send JOINs
+        :return: False if the channel was already seeded
+        :exception APIError when the Twitch API can't be reached or returned an error
+        """
+        if self.__roster is None:
+            raise IRCException("IRC was created without a roster")
+        if self.__roster.isSeeded(channel):
+            return False
+        return self.__roster.seed(channel, self.getViewers(channel))
+
+    def getRecorder(self):
+        return self.__recorder
+
+    def getProfiler(self):
+        return self.__profiler
+
+    def getViewerCache(self):
+        if self.__viewerCache is None:
+            self.__viewerCache = ViewerCache()
+        return self.__viewerCache
 
     def getUsername(self):
         return self.__username
 
+    @property
+    def cmdShebang(self):
+        return self.__cmdShebang
+
+    @cmdShebang.setter
+    def cmdShebang(self, shebang):
+        self.__cmdShebang = shebang
+        self.__matchCommand = re.compile(re.escape(shebang) + r"(\w*)\s?(.*)$", re.DOTALL).match
+
     """
     -----------------------------------------------------------------------------------------------
                                        Communication Functions
@@ -279,10 +697,45 @@ class IRC(object):
     """
 
     def onPing(self):
-        self.__conn.sendall('PONG :tmi.twitch.tv\r\n')
+        self.__writer.write('PONG :tmi.twitch.tv\r\n')
 
     def getSendQueue(self):
-        pass
+        """
+        :return: SendScheduler that queues the commands given to sendMessage()/sendCommand()
+        """
+        return self.__scheduler
+
+    def getSendLimiter(self):
+        """
+        :return: RateLimiter of the commands/messages sent by this user
+        """
+        return self.__sendLimiter
+
+    def getSendBudget(self):
+        """
+        :return: amount of commands that can still be sent in the current rate window after the queued ones
+        """
+        return self.__sendLimiter.remaining() - self.__scheduler.qsize()
+
+    def getQueueDepth(self, channel=None):
+        """
+        :param string channel: only count the messages queued for this channel
+        :return: amount of commands waiting to be sent
+        """
+        return self.__scheduler.qsize(channel)
+
+    def getQueueDepths(self):
+        """
+        :return: dict of channel -> amount of queued messages. Commands without a channel are under `None`
+        """
+        return self.__scheduler.getQueueDepths()
+
+    def isModerator(self, channel):
+        """
+        :param string channel:
+        :return: True if this user is known to be a moderator (or the broadcaster) of the channel
+        """
+        return self.__scheduler.isModerator(channel)
 
     def sendMessage(self, channelName, msg):
         """
@@ -294,42 +747,58 @@ class IRC(object):
             msg += "\r\n"
 
         formattedMsg = 'PRIVMSG #{channelName} :{msg}'.format(channelName=channelName, msg=msg)
-        self.sendCommand(formattedMsg)
+        self.sendCommand(formattedMsg, channelName)
 
-    def sendCommand(self, cmd):
+    def sendCommand(self, cmd, channel=None):
+        """
+        Queue a raw command. Commands are sent round-robin across channels within the rate limits
+        :param cmd: raw IRC command including the trailing `\r\n`
+        :param channel: channel the command is sent to, so it is limited and queued with that channel
+        """
         if self.__state == State.DISCONNECTED:
             raise IRCException("Disconnected from Twitch IRC server.")
-        elif self.__state == State.RECONNECTING:
-            print "Reconnecting to Twitch server",
-            self.onReconnect()
-            # connected or disconnected..
-            if self.__state != State.CONNECTED:
-                raise IRCException("Disconnected from Twitch IRC server.")
 
         if self.__overrideSend:
-            self.__conn.send(cmd)
+            if self.__state == State.RECONNECTING:
+                raise IRCException("Reconnecting to Twitch IRC server.")
+            self.__writer.write(cmd)
         else:
-            self.__sendQueue.put(cmd)
+            # commands queued while reconnecting are sent once logged in again
+            self.__scheduler.put(cmd, channel)
 
     def __startThreads(self):
-        # start recv'ing messages from IRC
-        self.__workers.append(threading.Thread(target=self.__recvWorker))
+        # start recv'ing messages from IRC. Replaced by a new thread on every reconnect
+        self.__workers = [threading.Thread(target=self.__recvWorker)]
 
         if not self.__overrideSend:
             # start the join queue timer thread. 50 reqs per 15 secs
-            self.__workers.append(threading.Thread(target=self.__ircCommandWorker, args=(self.__joinQueue, 15, 50)))
-
-            # start the send queue timer thread. 20 commands per 30 secs
-            commands = 100 if self.__modBot else 20
             self.__workers.append(
-                threading.Thread(target=self.__ircCommandWorker, args=(self.__sendQueue, 30, commands)))
+                threading.Thread(target=self.__joinWorker, args=(self.__joinQueue, self.__joinLimiter)))
+
+            # start the send scheduler thread. 20 commands per 30 secs (100 for mod bots)
+            self.__workers.append(threading.Thread(target=self.__sendWorker))
 
         for t in self.__workers:
             t.start()
 
+        if self.__dispatcher is not None:
+            self.__dispatcher.start()
+
+    def __stopWorkers(self):
+        # workers of a closed connection stop within POLL_INTERVAL
+        for t in self.__workers:
+            if t is not threading.current_thread():
+                t.join()
+        self.__workers = []
+
     def __recvWorker(self):
         while self.__state == State.CONNECTED:
             data = self.__readline()
+            if not data:
+                continue
+
+            if self.__recorder is not None:
+                self.__recorder.record(data)
 
             if 'PING :tmi.twitch.tv' == data:  # check for ping-pong
                 self.onPing()
@@ -338,34 +807,317 @@ class IRC(object):
             else:
                 self.onResponse(data)
 
-    def __ircCommandWorker(self, q, timeLimit, commandLimit):
-        """ Join channels given in the worker queue.
-            This function executes joins as given in queue. If the max rate is reached, it will sleep
-            until the new rate window is reached. Instead of strictly executing commands at .3 sec intervals
+    def __joinWorker(self, q, limiter):
+        """ Join the channels given in the worker queue.
+            Channels are joined as soon as the limiter has budget, and every channel that is ready is packed into
+            the same `JOIN #a,#b,...` line. Each channel still counts as one join against the limit.
+            If the max rate is reached, the worker sleeps exactly until the oldest join leaves the rate window.
             The limit is 50 JOINs per 15 seconds. https://help.twitch.tv/customer/portal/articles/1302780-twitch-irc
-            Ex: send 47 joins back to back: .7 secs total
-                request to join 6 channels: joins 3 channels (.3 secs total) and sleeps for 14 secs.
-                    then joins the other 3 channels
+            Ex: join 47 channels: all 47 are sent immediately in one line
+                request to join 6 more channels: joins 3 channels immediately, the other 3 are each sent
+                    15 secs after the 1st, 2nd and 3rd joins were sent
+            Joins the server doesn't confirm in time are queued again. Channels parted while queued are dropped.
+            While reconnecting the worker waits, the channels are joined again once logged in.
         """
-        timeTrack = time.time()
-        commandsExecd = 0
-        while self.__state == State.CONNECTED:
-            command = q.get()
-            print '__ircCommandWorker:', command
-            secsPassed = time.time() - timeTrack
-            if secsPassed > timeLimit:
-                timeTrack = time.time()
-                commandsExecd = 0
-            elif secsPassed <= timeLimit and commandsExecd >= commandLimit:
-                time.sleep(timeLimit - secsPassed)
-                timeTrack = time.time()
-                commandsExecd = 0
+        item = None  # (channel, time queued) taken from the queue that didn't fit the last line
+        while self.__state != State.DISCONNECTED:
+            if self.__state != State.CONNECTED:
+                if item is not None:  # queued again with the channels joined after the reconnect
+                    q.put(item)
+                    q.task_done()
+                    item = None
+                self.__online.wait(POLL_INTERVAL)
+                continue
+
+            if item is None:
+                try:
+                    item = q.get(timeout=POLL_INTERVAL)  # wake up to check the state
+                except Queue.Empty:
+                    queuedAt = monotonic()
+                    for expired in self.__joinTracker.expired():
+                        q.put((expired, queuedAt))
+                    continue
+            if item[0] not in self.__channels:  # parted while queued
+                q.task_done()
+                item = None
+                continue
+
+            if not limiter.tryAcquire():
+                start = monotonic()
+                while not limiter.acquire(timeout=POLL_INTERVAL) and self.__state == State.CONNECTED:
+                    pass
+                self.__joinThrottled += monotonic() - start
+                if self.__state != State.CONNECTED:
+                    continue
+                if item[0] not in self.__channels:  # parted while waiting on the limiter
+                    q.task_done()
+                    item = None
+                    continue
+
+            items = [item]
+            length = len("JOIN #\r\n") + len(item[0])
+            item = None
+            while True:
+                try:
+                    item = q.get_nowait()
+                except Queue.Empty:
+                    item = None
+                    break
+                if item[0] not in self.__channels:
+                    q.task_done()
+                    item = None
+                    continue
+                if length + len(item[0]) + 2 > MAX_LINE_LENGTH or not limiter.tryAcquire():
+                    break
+                items.append(item)
+                length += len(item[0]) + 2
+                item = None
 
-            if self.__state == State.CONNECTED:
-                self.__conn.send(command)
-            q.task_done()
-            commandsExecd += 1
-            time.sleep(.5)
+            try:
+                self.__writer.write("JOIN {}\r\n".format(",".join("#" + channel for channel, queuedAt in items)))
+            except socket.error:
+                for lost in items:
+                    q.put(lost)
+                    q.task_done()
+                self.onReconnect()
+                continue
+
+            now = monotonic()
+            for channel, queuedAt in items:
+                self.__joinWait.observe(now - queuedAt)
+                self.__joinTracker.sent(channel)
+                q.task_done()
+            self.__joinsSent.inc(len(items))
+
+    def __sendWorker(self):
+        """ Send the commands given to the send scheduler.
+            The scheduler picks channels round-robin and only hands out commands that fit the global
+            rate limit and, for channels this user isn't a moderator of, the 1 message/sec channel limit.
+            Every command that is ready at the same time is written with one buffered write.
+            Commands that couldn't be written because the connection was lost are written after the reconnect.
+        """
+        commands = []  # commands taken from the scheduler that weren't written before the connection was lost
+        while self.__state != State.DISCONNECTED:
+            if self.__state != State.CONNECTED:
+                self.__online.wait(POLL_INTERVAL)
+                continue
+
+            if not commands:
+                command = self.__scheduler.get(timeout=POLL_INTERVAL)  # wake up to check the state
+                while command is not None:
+                    commands.append(command)
+                    command = self.__scheduler.get(timeout=0)
+                if not commands:
+                    continue
+
+            try:
+                self.__writer.writeLines(commands)
+            except socket.error:
+                self.onReconnect()  # the commands are written once logged in again
+                continue
+            self.__commandsSent.inc(len(commands))
+            commands = []
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                            Command Handlers
+        Each handler gets the tokenized line and returns False if the line can't be handled
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def __handlePrivmsg(self, tags, prefix, params):
+        viewer = nick(prefix)
+        params = splitParams(params)
+        if not viewer or len(params) != 2 or params[0][:1] != "#":
+            return False
+
+        channel, message = params[0][1:], params[1]
+        if self.__roster is not None:
+            self.__roster.seen(channel, viewer)
+
+        match = self.__matchCommand(message)
+        if match:
+            # channel, viewer, command, value
+            self.__invoke("onCommand", tags, channel, viewer, match.group(1), match.group(2))
+        else:
+            # channel, viewer, message
+            self.__invoke("onMessage", tags, channel, viewer, message)
+
+    def __handleJoin(self, tags, prefix, params):
+        viewer = nick(prefix)
+        if not viewer or params[:1] != "#":
+            return False
+
+        if viewer == self.__username:
+            self.__joinTracker.confirm(params[1:])
+        if self.__roster is not None:
+            self.__roster.join(params[1:], viewer)
+
+        # channel, viewer, state
+        self.__invoke("onJoinPart", tags, params[1:], viewer, IRC.JOIN)
+
+    def __handlePart(self, tags, prefix, params):
+        viewer = nick(prefix)
+        if not viewer or params[:1] != "#":
+            return False
+
+        if self.__roster is not None:
+            if viewer == self.__username:
+                self.__roster.removeChannel(params[1:])
+            else:
+                self.__roster.part(params[1:], viewer)
+
+        # channel, viewer, state
+        self.__invoke("onJoinPart", tags, params[1:], viewer, IRC.PART)
+
+    def __handleMode(self, tags, prefix, params):
+        params = splitParams(params)
+        if len(params) != 3 or params[0][:1] != "#" or params[1] not in ("+o", "-o"):
+            return False
+
+        if params[2] == self.__username:
+            self.__scheduler.setModerator(params[0][1:], params[1] == "+o")
+        if self.__roster is not None:
+            self.__roster.setModerator(params[0][1:], params[2], params[1] == "+o")
+
+        # channel, viewer, state
+        # opcode = [-+]
+        self.__invoke("onMode", tags, params[0][1:], params[2], params[1][0])
+
+    def __handleNotice(self, tags, prefix, params):
+        params = splitParams(params)
+        if len(params) != 2 or params[0][:1] != "#":
+            return False
+
+        if tags.get("msg-id") == IRC.ID_MSG_CHANNEL_SUSPENDED:
+            self.__joinTracker.fail(params[0][1:])
+
+        # channel, msg-id, msg
+        self.__invoke("onNotice", tags, params[0][1:], tags.get("msg-id"), params[1])
+
+    def __handleHostTarget(self, tags, prefix, params):
+        params = splitParams(params)
+        if len(params) != 2 or params[0][:1] != "#":
+            return False
+
+        target, sep, amount = params[1].partition(" ")
+        if not amount.isdigit():
+            return False
+
+        # hosting_channel, target_channel, amount
+        # target_channel = None when hosting stops
+        self.__invoke("onHostTarget", tags, params[0][1:], None if target == "-" else target, int(amount))
+
+    def __handleClearChat(self, tags, prefix, params):
+        params = splitParams(params)
+        if not params or params[0][:1] != "#":
+            return False
+
+        # channel, viewer
+        # username may be None if it was a channel clear
+        self.__invoke("onClearChat", tags, params[0][1:], params[1] if len(params) > 1 else None)
+
+    def __handleUserNotice(self, tags, prefix, params):
+        params = splitParams(params)
+        if not params or params[0][:1] != "#":
+            return False
+
+        # channel, message
+        # message may be None if the user didn't add a message
+        self.__invoke("onUserNotice", tags, params[0][1:], params[1] if len(params) > 1 else None)
+
+    def __handleUserState(self, tags, prefix, params):
+        if params[:1] != "#":
+            return False
+
+        channel = params[1:]
+        if tags:
+            self.__scheduler.setModerator(channel, tags.get("mod") == "1" or "broadcaster" in tags.getBadges())
+        elif channel == self.__username:
+            self.__scheduler.setModerator(channel, True)
+
+        # channel
+        self.__invoke("onUserState", tags, channel)
+
+    def __handleRoomState(self, tags, prefix, params):
+        if params[:1] != "#":
+            return False
+
+        self.__joinTracker.confirm(params[1:])
+
+        # channel
+        self.__invoke("onRoomState", tags, params[1:])
+
+    def __handleNumeric(self, tags, prefix, params):
+        username = self.__username
+        if prefix != username + ".tmi.twitch.tv" or params[:len(username) + 1] != username + " ":
+            return False
+
+        # line
+        self.__invoke("onIRCInfo", tags, params[len(username) + 1:])
+
+    def __handleNames(self, tags, prefix, params):
+        if self.__roster is not None and prefix == self.__username + ".tmi.twitch.tv":
+            # username = #channel :name1 name2 ...
+            names = splitParams(params)
+            if len(names) == 4 and names[2][:1] == "#":
+                self.__roster.names(names[2][1:], names[3].split())
+        return self.__handleNumeric(tags, prefix, params)
+
+    def __invoke(self, name, tags, *args):
+        """
+        Call the named callback, passing the line's tags to callbacks that accept a `tags` argument.
+        With a dispatcher the callback is queued to run on a dispatcher worker instead of the recv thread.
+        If onEvent is overridden it gets the event of the callback afterwards
+        """
+        if name not in self.__callbacks:
+            return
+
+        callback = getattr(self, name)
+        kwargs = {"tags": tags} if name in self.__tagCallbacks else {}
+
+        if self.__profiler is not None or self.__dispatcher is not None:
+            # callbacks take the channel as the first argument. onIRCInfo lines have none, with a dispatcher they
+            # all run in order on one worker
+            self.__dispatch(name, None if name == "onIRCInfo" else args[0], callback, args, kwargs)
+        elif self.__timing:
+            self.__timedCall(callback, args, kwargs)
+        else:
+            callback(*args, **kwargs)
+
+        if self.__events is not None:
+            event = self.__events[name](self.__line, self.__receivedAt, tags, *args)
+            if self.__profiler is not None or self.__dispatcher is not None:
+                self.__dispatch("onEvent", event.channel, self.onEvent, (event,), {})
+            elif self.__timing:
+                self.__timedCall(self.onEvent, (event,), {})
+            else:
+                self.onEvent(event)
+
+    def __dispatch(self, name, channel, callback, args, kwargs):
+        """
+        Run a callback through the profiler and/or queue it on the dispatcher worker of its channel
+        """
+        if self.__profiler is not None:
+            args = (name, channel, callback) + args
+            callback = self.__profiler.call
+
+        if self.__dispatcher is None:
+            if self.__timing:
+                self.__timedCall(callback, args, kwargs)
+            else:
+                callback(*args, **kwargs)
+        elif self.__timing:
+            self.__dispatcher.submit(channel, self.__timedCall, callback, args, kwargs)
+        else:
+            self.__dispatcher.submit(channel, callback, *args, **kwargs)
+
+    def __timedCall(self, callback, args, kwargs):
+        start = timer()
+        try:
+            callback(*args, **kwargs)
+        finally:
+            self.__callbackTime.time(start)
 
     """
     -----------------------------------------------------------------------------------------------
@@ -379,85 +1131,48 @@ class IRC(object):
         :param line:
         :return:
         """
-        # print line
-        for key in sorted(REGEXS.iterkeys()):  # sort because onMessage replaces onCommand
-            regex = REGEXS[key]
-            if key == "onCommand":
-                # TODO fix shebangs that create regex errors (^, \\, etc)
-                regex = re.compile(regex.format(shebang=self.cmdShebang))
-            elif key == "onIRCInfo":
-                regex = re.compile(regex.format(username=self.__username))
-            else:
-                regex = re.compile(regex)
-
-            match = regex.search(line)
-            if match:
-                if key == "onMessage":
-                    # channel, viewer, message
-                    self.onMessage(match.group(2), match.group(1), match.group(3))
-                elif key == "onCommand":
-                    # channel, viewer, command, value
-                    # value may be None
-                    self.onCommand(match.group(2), match.group(1), match.group(3), match.group(4))
-                elif key == "onJoin":
-                    # channel, viewer, state
-                    self.onJoinPart(match.group(2), match.group(1), IRC.JOIN)
-                elif key == "onPart":
-                    # channel, viewer, state
-                    self.onJoinPart(match.group(2), match.group(1), IRC.PART)
-                elif key == "onMode":
-                    # channel, viewer, state
-                    # opcode = [-+]
-                    self.onMode(match.group(1), match.group(3), match.group(2))
-                elif key == "onNotice":
-                    # channel, msg-id, msg
-                    self.onNotice(match.group(2), match.group(1), match.group(3))
-                elif key == "onHostTarget":
-                    # hosting_channel, target_channel, amount
-                    # target_channel = None when hosting stops
-                    amount = int(match.group(3))
-                    self.onHostTarget(match.group(1), match.group(2), amount)
-                elif key == "onHostTargetStop":
-                    # hosting_channel, target_channel, amount
-                    # target_channel = None when hosting stops
-                    amount = int(match.group(2))
-                    self.onHostTarget(match.group(1), None, amount)
-                elif key == "onClearChat":
-                    # channel, viewer
-                    # username may be None if it was a channel clear
-                    viewer = None
-                    if match.lastindex == 2:
-                        viewer = match.group(3)
-                    self.onClearChat(match.group(1), viewer)
-                elif key == "onUserNotice":
-                    # channel, message
-                    self.onUserNotice(match.group(1), match.group(2))
-                elif key == "onUserState":
-                    # channel
-                    self.onUserState(match.group(1))
-                elif key == "onRoomState":
-                    # channel
-                    self.onRoomState(match.group(1))
-                elif key == "onIRCInfo":
-                    # channel
-                    self.onIRCInfo(match.group(1))
-                else:
-                    # TODO got a match, but didn't handle callback
-                    print "Didn't handle matched callback", key, regex
+        self.__sampleCountdown -= 1
+        if self.__sampleCountdown:
+            self.__timing = False
+            tags, prefix, command, params = tokenize(line, self.__skipped)
+        else:
+            self.__sampleCountdown = SAMPLE_EVERY
+            self.__timing = True
+            start = timer()
+            tags, prefix, command, params = tokenize(line, self.__skipped)
+            self.__parseTime.time(start)
+        lines = self.__lineCounts  # inlined Counter.inc(), this runs for every line
+        lines[command] = lines.get(command, 0) + 1
+        if params is None:
+            # none of the callbacks of the command is called. Only our own JOINs, which confirm the joins, are parsed
+            if command != IRC.JOIN or line[:len(self.__joinPrefix)] != self.__joinPrefix:
                 return
-        print >> sys.stderr, "Unknown response type.\n\t", line
+            tags, prefix, command, params = tokenize(line)
+        if self.__events is not None:
+            self.__line = line
+            self.__receivedAt = timer()  # wall clock, events carry an absolute receive time
+
+        handler = self.__handlers.get(command)
+        if handler is None and command.isdigit():
+            handler = self.__handleNumeric
 
-    def onMessage(self, channel, viewer, message):
+        tags = Tags(tags) if tags else EMPTY_TAGS
+
+        if handler is None or handler(tags, prefix, params) is False:
+            self.__unknownLines.inc()
+
+    def onMessage(self, channel, viewer, message, tags=None):
         """
         receive a user message from a channel
         :param string channel:
         :param string viewer:
         :param string message:
+        :param Tags tags: tags of the line. Empty unless tags are requested with `IRC(tags=True)`
         :return: None
         """
         return
 
-    def onCommand(self, channel, viewer, command, value):
+    def onCommand(self, channel, viewer, command, value, tags=None):
         """
         receive a bot command by a user from a channel
 
@@ -466,31 +1181,34 @@ class IRC(object):
         :param string viewer:
         :param string command:
         :param string value: May be `None` type
+        :param Tags tags: tags of the line. Empty unless tags are requested with `IRC(tags=True)`
         :return: None
         """
         return
 
-    def onJoinPart(self, channel, viewer, state):
+    def onJoinPart(self, channel, viewer, state, tags=None):
         """
         get notified when a viewer enters/leaves a channel irc
         :param string channel:
         :param string viewer:
         :param string state: (IRC.JOIN|IRC.PART)
+        :param Tags tags: tags of the line. Empty unless tags are requested with `IRC(tags=True)`
         :return: None
         """
         return
 
-    def onMode(self, channel, viewer, state):
+    def onMode(self, channel, viewer, state, tags=None):
         """
         get notified when a viewer gets opped/deopped (moderator status) in a channel irc
         :param string channel:
         :param string viewer:
         :param string state: (IRC.OP|IRC.DEOP)
+        :param Tags tags: tags of the line. Empty unless tags are requested with `IRC(tags=True)`
         :return: None
         """
         return
 
-    def onNotice(self, channel, msgID, message):
+    def onNotice(self, channel, msgID, message, tags=None):
         """
         general notices from the server (state change, feeback, etc)
 
@@ -499,58 +1217,75 @@ class IRC(object):
         :param string channel:
         :param string msgID: MessageIDs can be accessed by IRC.ID_*
         :param string message:
+        :param Tags tags: tags of the line. Empty unless tags are requested with `IRC(tags=True)`
         :return: None
         """
         return
 
-    def onHostTarget(self, hostingChannel, targetChannel, amount):
+    def onHostTarget(self, hostingChannel, targetChannel, amount, tags=None):
         """
         notification when a channel starts/stops hosting another channel
         :param string hostingChannel:
         :param string targetChannel: may be `None` type if the command is a host stop command
         :param integer amount:
+        :param Tags tags: tags of the line. Empty unless tags are requested with `IRC(tags=True)`
         :return: None
         """
         return
 
-    def onClearChat(self, channel, viewer):
+    def onClearChat(self, channel, viewer, tags=None):
         """
         notification when a channel's/viewer's chat has been cleared
         :param string channel:
         :param string viewer: may be `None` type if the channel chat has been cleared
+        :param Tags tags: tags of the line. Empty unless tags are requested with `IRC(tags=True)`
         :return: None
         """
         return
 
-    def onUserNotice(self, channel, message):
+    def onUserNotice(self, channel, message, tags=None):
         """
         notice from a user currently only used for re-subscription messages
         :param string channel:
-        :param string message:
+        :param string message: may be `None` type if the user didn't add a message
+        :param Tags tags: tags of the line. Empty unless tags are requested with `IRC(tags=True)`
         :return: None
         """
         return
 
-    def onUserState(self, channel):
+    def onUserState(self, channel, tags=None):
         """
         state of this user in channel
         :param string channel:
+        :param Tags tags: tags of the line. Empty unless tags are requested with `IRC(tags=True)`
         :return: None
         """
         return
 
-    def onRoomState(self, channel):
+    def onRoomState(self, channel, tags=None):
         """
         roomstate of channel
         :param string channel:
+        :param Tags tags: tags of the line. Empty unless tags are requested with `IRC(tags=True)`
         :return: None
         """
         return
 
-    def onIRCInfo(self, line):
+    def onIRCInfo(self, line, tags=None):
         """
         info from irc socket
         :param string line:
+        :param Tags tags: tags of the line. Empty unless tags are requested with `IRC(tags=True)`
+        :return: None
+        """
+        return
+
+    def onEvent(self, event):
+        """
+        receive the event of every callback, after the callback. See twitchirc.events
+        Events are only built if this is overridden
+        :param Event event: Message, Command, JoinPart, Mode, Notice, HostTarget, ClearChat, UserNotice, UserState,
+                            RoomState or IRCInfo
         :return: None
         """
         return
@@ -0,0 +1,199 @@
+"""
+    Packed JOIN/PART lines and join acknowledgement tracking.
+
+    Channels are packed into comma separated `JOIN #a,#b,...` lines within the 512 byte IRC line limit.
+    Every channel still counts as one join against the 50 JOINs per 15 secs limit.
+    A join is confirmed when the server echoes our JOIN or sends the ROOMSTATE of the channel. Joins that aren't
+    confirmed in time are retried, and joinChannels() returns a JoinRequest to wait on.
+"""
+import sys
+import threading
+import traceback
+
+from twitchirc.ratelimit import monotonic
+
+MAX_LINE_LENGTH = 512  # including the trailing \r\n
+JOIN_TIMEOUT = 10  # secs to wait for the server to confirm a join before retrying
+JOIN_RETRIES = 3  # times a join is retried before giving up on the channel
+
+
+def packLines(command, channels, maxLength=MAX_LINE_LENGTH):
+    """
+    Pack channels into as few `COMMAND #a,#b,...\\r\\n` lines as the IRC line limit allows
+    :param string command: JOIN or PART
+    :param channels: list of channels
+    :param int maxLength: max line length including the trailing \\r\\n
+    :return: list of (line, channels in the line)
+    """
+    lines = []
+    packed = []
+    length = len(command) + 3  # space and \r\n
+    for channel in channels:
+        size = len(channel) + 2  # #channel and the comma
+        if packed and length + size - 1 > maxLength:
+            lines.append(("{} {}\r\n".format(command, ",".join("#" + c for c in packed)), packed))
+            packed = []
+            length = len(command) + 3
+        packed.append(channel)
+        length += size
+
+    if packed:
+        lines.append(("{} {}\r\n".format(command, ",".join("#" + c for c in packed)), packed))
+    return lines
+
+
+class JoinRequest(object):
+    """
+        Completion handle of a joinChannels() call. Done when every channel was confirmed or gave up on
+    """
+
+    def __init__(self, channels):
+        self.__pending = set(channels)
+        self.__joined = set()
+        self.__failed = set()
+        self.__event = threading.Event()
+        self.__callbacks = []
+        self.__lock = threading.Lock()
+        if not self.__pending:
+            self.__event.set()
+
+    def wait(self, timeout=None):
+        """
+        Block until the request is done
+        :param float timeout: max secs to wait. Waits forever if `None`
+        :return: True if every channel was joined
+        """
+        self.__event.wait(timeout)
+        return self.done() and not self.__failed
+
+    def done(self):
+        return self.__event.is_set()
+
+    def addCallback(self, callback):
+        """
+        :param callback: called with this request once it is done. Called immediately if it is already done
+        """
+        with self.__lock:
+            if not self.__event.is_set():
+                self.__callbacks.append(callback)
+                return
+        callback(self)
+
+    def getJoined(self):
+        return set(self.__joined)
+
+    def getFailed(self):
+        return set(self.__failed)
+
+    def getPending(self):
+        return set(self.__pending)
+
+    def _resolve(self, channel, joined):
+        with self.__lock:
+            if channel not in self.__pending:
+                return
+            self.__pending.discard(channel)
+            (self.__joined if joined else self.__failed).add(channel)
+            if self.__pending:
+                return
+            self.__event.set()
+            callbacks, self.__callbacks = self.__callbacks, []
+
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                print >> sys.stderr, "Exception in join callback.\n\t", traceback.format_exc()
+
+
+class JoinTracker(object):
+    """
+        Tracks the joins of a connection from request until the server confirms them
+    """
+
+    def __init__(self, timeout=JOIN_TIMEOUT, retries=JOIN_RETRIES, clock=monotonic):
+        self.__timeout = timeout
+        self.__retries = retries
+        self.__clock = clock
+        self.__requests = {}  # channel -> list of JoinRequest waiting on it
+        self.__sent = {}  # channel -> (time of the last JOIN, attempts)
+        self.__lock = threading.Lock()
+
+    def add(self, channels):
+        """
+        Start tracking channels that are about to be joined
+        :return: JoinRequest done when all channels are confirmed or failed
+        """
+        request = JoinRequest(channels)
+        with self.__lock:
+            for channel in channels:
+                self.__requests.setdefault(channel, []).append(request)
+        return request
+
+    def sent(self, channel):
+        """
+        Record that a JOIN for the channel was sent
+        """
+        with self.__lock:
+            attempts = self.__sent.get(channel, (0, 0))[1]
+            self.__sent[channel] = (self.__clock(), attempts + 1)
+
+    def confirm(self, channel):
+        """
+        The server confirmed the join of a channel
+        """
+        self.__resolve(channel, True)
+
+    def fail(self, channel):
+        """
+        Give up on the join of a channel. Ex: the channel is suspended
+        """
+        self.__resolve(channel, False)
+
+    def cancel(self, channel):
+        """
+        Stop tracking the join of a parted channel so it isn't retried. Requests waiting on it count it as failed
+        """
+        self.__resolve(channel, False)
+
+    def __resolve(self, channel, joined):
+        with self.__lock:
+            self.__sent.pop(channel, None)
+            requests = self.__requests.pop(channel, [])
+        for request in requests:
+            request._resolve(channel, joined)
+
+    def expired(self):
+        """
+        Find joins the server didn't confirm in time. Channels out of retries are failed
+        :return: list of channels to send a JOIN for again
+        """
+        retry = []
+        failed = []
+        with self.__lock:
+            horizon = self.__clock() - self.__timeout
+            for channel, (sentAt, attempts) in self.__sent.items():
+                if sentAt > horizon:
+                    continue
+                if attempts > self.__retries:
+                    failed.append(channel)
+                else:
+                    retry.append(channel)
+                    self.__sent[channel] = (float("inf"), attempts)  # not expired again until resent
+
+        for channel in failed:
+            self.fail(channel)
+        return retry
+
+    def getPending(self):
+        """
+        :return: set of channels waiting on a confirmation
+        """
+        return set(self.__requests)
+
+    def clear(self):
+        """
+        Forget every sent join, they have to be sent again. Ex: after a reconnect
+        """
+        with self.__lock:
+            self.__sent.clear()
@@ -0,0 +1,185 @@
+"""
+    Counters, gauges and latency histograms of a connection.
+
+    Every IRC keeps a Metrics registry that is cheap enough to leave on: counters and histograms are plain
+    increments without locks, since each metric is only written by one IRC thread, per line latencies are sampled,
+    and gauges such as queue depths or bytes in/out are only read when a snapshot is taken:
+
+        metrics = irc.getMetrics()
+        metrics.snapshot()["lines_received_total"]  # {'PRIVMSG': 1234, 'JOIN': 56, ...}
+        metrics.toPrometheus()  # text exposition format, ex: for a /metrics endpoint
+"""
+import time
+from bisect import bisect_left
+
+# sampled latencies are short, so the cheap wall clock is used instead of the monotonic one.
+# Deadlines and longer durations use twitchirc.ratelimit.monotonic, a wall clock jump would break them
+timer = time.time
+
+# the parse and callback latencies of 1 in SAMPLE_EVERY lines are observed, timing every line costs more than
+# tokenizing it
+SAMPLE_EVERY = 16
+
+# upper bounds in secs, from 10 us (parsing a line) to 30 secs (a command waiting for the rate limit)
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+
+
+class Counter(object):
+    __slots__ = ("name", "help", "label", "values")
+    type = "counter"
+
+    def __init__(self, name, help, label=None):
+        """
+        :param string label: name of the label that splits the counter. Ex: "command"
+        """
+        self.name = name
+        self.help = help
+        self.label = label
+        self.values = {}
+
+    def inc(self, amount=1, label=None):
+        values = self.values
+        values[label] = values.get(label, 0) + amount
+
+    def get(self, label=None):
+        return self.values.get(label, 0)
+
+    def snapshot(self):
+        return dict(self.values) if self.label else self.values.get(None, 0)
+
+
+class Gauge(object):
+    __slots__ = ("name", "help", "label", "func")
+    type = "gauge"
+
+    def __init__(self, name, help, func, label=None):
+        """
+        :param func: called on every snapshot. Returns a number, or a dict of label value -> number if labeled
+        """
+        self.name = name
+        self.help = help
+        self.label = label
+        self.func = func
+
+    def snapshot(self):
+        return self.func()
+
+
+class CounterFunc(Gauge):
+    """
+        Counter whose value is kept by someone else. Ex: the bytes read by a LineReader
+    """
+    __slots__ = ()
+    type = "counter"
+
+
+class Histogram(object):
+    __slots__ = ("name", "help", "label", "buckets", "counts", "sum", "count", "lock")
+    type = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS, lock=None):
+        """
+        :param lock: lock taken by observe(). Only needed if several threads observe the histogram
+        """
+        self.name = name
+        self.help = help
+        self.label = None
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = lock
+
+    def observe(self, value):
+        if self.lock is not None:
+            with self.lock:
+                self.__observe(value)
+        else:
+            self.__observe(value)
+
+    def __observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self, start):
+        """
+        Observe the secs since `start`
+        :param float start: timer() value
+        """
+        self.observe(timer() - start)
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class Metrics(object):
+    def __init__(self, prefix="twitchirc_"):
+        """
+        :param string prefix: prepended to every metric name in the Prometheus output
+        """
+        self.__prefix = prefix
+        self.__metrics = {}  # name -> metric
+        self.__order = []  # metrics in registration order, for the output
+
+    def __register(self, metric):
+        if metric.name in self.__metrics:
+            raise ValueError("Metric already registered: {}".format(metric.name))
+        self.__metrics[metric.name] = metric
+        self.__order.append(metric)
+        return metric
+
+    def counter(self, name, help, label=None):
+        return self.__register(Counter(name, help, label))
+
+    def gauge(self, name, help, func, label=None):
+        return self.__register(Gauge(name, help, func, label))
+
+    def counterFunc(self, name, help, func, label=None):
+        return self.__register(CounterFunc(name, help, func, label))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, lock=None):
+        return self.__register(Histogram(name, help, buckets, lock))
+
+    def get(self, name):
+        return self.__metrics[name]
+
+    def snapshot(self):
+        """
+        :return: dict of metric name -> value. Labeled metrics are dicts of label value -> value, histograms are
+                 dicts with 'count', 'sum' and cumulative 'buckets' as (upper bound, count) pairs
+        """
+        return dict((metric.name, metric.snapshot()) for metric in self.__order)
+
+    def toPrometheus(self):
+        """
+        :return: the metrics in the Prometheus text exposition format
+        """
+        lines = []
+        for metric in self.__order:
+            name = self.__prefix + metric.name
+            lines.append("# HELP {} {}".format(name, metric.help))
+            lines.append("# TYPE {} {}".format(name, metric.type))
+
+            value = metric.snapshot()
+            if metric.type == "histogram":
+                for bound, count in value["buckets"]:
+                    lines.append('{}_bucket{{le="{}"}} {}'.format(name, "+Inf" if bound == float("inf") else
+                                                                 repr(bound), count))
+                lines.append("{}_sum {}".format(name, repr(value["sum"])))
+                lines.append("{}_count {}".format(name, value["count"]))
+            elif metric.label:
+                for label, labelValue in sorted(value.iteritems()):
+                    lines.append('{}{{{}="{}"}} {}'.format(name, metric.label, _escape(label), labelValue))
+            else:
+                lines.append("{} {}".format(name, value))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
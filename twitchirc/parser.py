@@ -0,0 +1,192 @@
+"""
+    Single pass IRC line tokenizer.
+
+    A line is split once into its tags, prefix, command and params:
+        [@tags] [:prefix] COMMAND [params] [:trailing]
+"""
+
+TAG_ESCAPES = {":": ";", "s": " ", "\\": "\\", "r": "\r", "n": "\n"}
+
+
+def tokenize(line, skip=None):
+    """
+    Split an IRC line into tags, prefix, command and the (unsplit) params.
+    The params are left as a string so handlers only pay for splitting them when needed
+
+    :param string line: IRC line without the trailing newline
+    :param skip: commands whose lines aren't split any further than the command. Their params are `None`
+    :return: (tags, prefix, command, params) tuple. `tags` and `prefix` are `None` when absent
+    """
+    tagsEnd = 0
+    prefixEnd = 0
+    pos = 0
+
+    if line[:1] == "@":
+        tagsEnd = line.find(" ")
+        if tagsEnd < 0:
+            return line[1:], None, "", ""
+        pos = tagsEnd + 1
+
+    prefixStart = pos
+    if line[pos:pos + 1] == ":":
+        prefixEnd = line.find(" ", pos)
+        if prefixEnd < 0:
+            return line[1:tagsEnd] if tagsEnd else None, line[pos + 1:], "", ""
+        pos = prefixEnd + 1
+
+    end = line.find(" ", pos)
+    command = line[pos:] if end < 0 else line[pos:end]
+    if skip is not None and command in skip:
+        return None, None, command, None
+
+    # tags and prefix are only sliced once the command is known to be wanted
+    tags = line[1:tagsEnd] if tagsEnd else None
+    prefix = line[prefixStart + 1:prefixEnd] if prefixEnd else None
+    return tags, prefix, command, "" if end < 0 else line[end + 1:]
+
+
+def splitParams(params):
+    """
+    Split the params of a tokenized line. The trailing param (prefixed with `:`) is kept whole
+    :param string params:
+    :return: list of params
+    """
+    if params[:1] == ":":
+        return [params[1:]]
+
+    trailing = params.find(" :")
+    if trailing < 0:
+        return params.split()
+
+    ret = params[:trailing].split()
+    ret.append(params[trailing + 2:])
+    return ret
+
+
+def nick(prefix):
+    """
+    Get the nickname from a `nick!user@host` prefix
+    :param string prefix:
+    :return: nickname or `None` if the prefix isn't a user prefix
+    """
+    if not prefix:
+        return None
+
+    end = prefix.find("!")
+    if end <= 0:
+        return None
+    return prefix[:end]
+
+
+def parseTags(tags):
+    """
+    Split and unescape an IRCv3 tag string into a dict
+    :param string tags: raw tags without the leading `@`
+    :return: dict of tag name -> value
+    """
+    ret = {}
+    if not tags:
+        return ret
+
+    for tag in tags.split(";"):
+        key, sep, value = tag.partition("=")
+        if "\\" in value:
+            value = unescapeTag(value)
+        ret[key] = value
+    return ret
+
+
+def unescapeTag(value):
+    """
+    Unescape an IRCv3 tag value
+    :param string value:
+    :return: unescaped value
+    """
+    chars = []
+    i = 0
+    size = len(value)
+    while i < size:
+        c = value[i]
+        if c == "\\":
+            i += 1
+            if i < size:
+                chars.append(TAG_ESCAPES.get(value[i], value[i]))
+        else:
+            chars.append(c)
+        i += 1
+    return "".join(chars)
+
+
+class Tags(object):
+    """
+        IRCv3 tags of a line. The raw tag string is only split and unescaped into a dict
+        the first time a tag is read, so ignoring tags costs nothing more than creating this object.
+    """
+    __slots__ = ("raw", "__tags")
+
+    def __init__(self, raw=None):
+        """
+        :param string raw: raw tags without the leading `@`. May be `None` type
+        """
+        self.raw = raw
+        self.__tags = None
+
+    def __parsed(self):
+        tags = self.__tags
+        if tags is None:
+            tags = self.__tags = parseTags(self.raw)
+        return tags
+
+    def __getitem__(self, key):
+        return self.__parsed()[key]
+
+    def __contains__(self, key):
+        return key in self.__parsed()
+
+    def __iter__(self):
+        return iter(self.__parsed())
+
+    def __len__(self):
+        return len(self.__parsed())
+
+    def __nonzero__(self):
+        return bool(self.raw)
+
+    def __eq__(self, other):
+        if isinstance(other, Tags):
+            other = other.toDict()
+        return self.__parsed() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "Tags({!r})".format(self.raw)
+
+    def get(self, key, default=None):
+        return self.__parsed().get(key, default)
+
+    def keys(self):
+        return self.__parsed().keys()
+
+    def items(self):
+        return self.__parsed().items()
+
+    def toDict(self):
+        """
+        :return: copy of the parsed tags
+        """
+        return dict(self.__parsed())
+
+    def getBadges(self):
+        """
+        Split the `badges` tag. Ex: `moderator/1,subscriber/12` -> {'moderator': '1', 'subscriber': '12'}
+        :return: dict of badge -> version
+        """
+        badges = self.get("badges")
+        if not badges:
+            return {}
+        return dict(badge.partition("/")[::2] for badge in badges.split(","))
+
+
+EMPTY_TAGS = Tags()
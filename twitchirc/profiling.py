@@ -0,0 +1,226 @@
+"""
+    Opt-in profiling of the IRC callbacks.
+
+    Give the IRC a CallbackProfiler and every callback is timed per callback name and per channel. A watchdog
+    thread samples the stack of callbacks that run longer than the slow threshold, so the line a slow onMessage
+    is stuck on shows up even before it returns. A cProfile of the callbacks can be recorded for a time window:
+
+        profiler = CallbackProfiler(slowThreshold=0.05)
+        irc = MyIRC("oauth:abcdefghijklmnopqrstuvwxyz", "username", profiler=profiler)
+        ...
+        profiler.getStats()["callbacks"]["onMessage"]  # {'count': 120, 'total': 0.8, 'max': 0.3}
+        profiler.profileFor(60, "callbacks.prof")  # open with pstats, snakeviz, gprof2dot, ...
+        profiler.dumpSlowStacks("slow.folded")  # flamegraph.pl slow.folded > slow.svg
+
+    Without a profiler the IRC only checks `profiler is None` per callback.
+"""
+import cProfile
+import pstats
+import sys
+import thread
+import threading
+import traceback
+from collections import deque
+
+from twitchirc.ratelimit import monotonic
+
+SLOW_THRESHOLD = 0.1  # secs after which a running callback is slow and its stack is sampled
+MAX_SAMPLES = 1000  # slow stack samples kept, the oldest are dropped first
+
+
+class CallbackProfiler(object):
+    def __init__(self, slowThreshold=SLOW_THRESHOLD, maxSamples=MAX_SAMPLES, sampleInterval=None):
+        """
+        :param float slowThreshold: secs after which a running callback is sampled. `None` to not sample stacks
+        :param int maxSamples: max slow stack samples kept
+        :param float sampleInterval: secs between watchdog checks. Defaults to half the threshold
+        """
+        self.__slowThreshold = slowThreshold
+        self.__sampleInterval = sampleInterval or (slowThreshold / 2.0 if slowThreshold else None)
+        self.__lock = threading.Lock()
+        self.__callbacks = {}  # name -> [count, total secs, max secs]
+        self.__channels = {}  # channel -> [count, total secs]
+        self.__slow = 0
+        self.__running = {}  # thread id -> (name, channel, start)
+        self.__samples = deque(maxlen=maxSamples)
+        self.__watchdog = None
+        self.__stopped = threading.Event()
+        self.__profiles = None  # thread id -> cProfile.Profile while a cProfile window is open
+
+    def call(self, name, channel, callback, *args, **kwargs):
+        """
+        Run a callback and record its time
+        :param string name: callback name. Ex: onMessage
+        :param string channel: channel of the callback, `None` if it has none
+        """
+        if self.__slowThreshold is not None and self.__watchdog is None:
+            self.__startWatchdog()
+
+        ident = thread.get_ident()
+        profiles = self.__profiles
+        start = monotonic()
+        self.__running[ident] = (name, channel, start)
+        try:
+            if profiles is not None:
+                profile = profiles.get(ident)
+                if profile is None:
+                    profile = profiles[ident] = cProfile.Profile()
+                return profile.runcall(callback, *args, **kwargs)
+            return callback(*args, **kwargs)
+        finally:
+            del self.__running[ident]
+            self.__record(name, channel, monotonic() - start)
+
+    def __record(self, name, channel, secs):
+        with self.__lock:
+            stats = self.__callbacks.get(name)
+            if stats is None:
+                stats = self.__callbacks[name] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += secs
+            if secs > stats[2]:
+                stats[2] = secs
+
+            stats = self.__channels.get(channel)
+            if stats is None:
+                stats = self.__channels[channel] = [0, 0.0]
+            stats[0] += 1
+            stats[1] += secs
+
+            if self.__slowThreshold is not None and secs >= self.__slowThreshold:
+                self.__slow += 1
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                         Slow Stack Sampling
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def __startWatchdog(self):
+        with self.__lock:
+            if self.__watchdog is not None:
+                return
+            self.__watchdog = threading.Thread(target=self.__watch)
+            self.__watchdog.daemon = True
+            self.__watchdog.start()
+
+    def __watch(self):
+        while not self.__stopped.wait(self.__sampleInterval):
+            now = monotonic()
+            frames = None
+            for ident, (name, channel, start) in self.__running.items():
+                elapsed = now - start
+                if elapsed < self.__slowThreshold:
+                    continue
+                if frames is None:
+                    frames = sys._current_frames()
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = tuple("{} ({}:{})".format(func, filename, line)
+                              for filename, line, func, text in traceback.extract_stack(frame))
+                self.__samples.append({"callback": name, "channel": channel, "elapsed": elapsed, "stack": stack})
+
+    def stop(self):
+        """
+        Stop the watchdog thread
+        """
+        self.__stopped.set()
+
+    def getSlowSamples(self):
+        """
+        :return: list of {'callback', 'channel', 'elapsed', 'stack'} samples of slow callbacks, oldest first.
+                 The stack is a tuple of frames, outermost first
+        """
+        return list(self.__samples)
+
+    def dumpSlowStacks(self, path):
+        """
+        Write the slow stack samples in the folded format of flamegraph.pl/speedscope. Every sample counts once,
+        so a callback that stays slow for longer gets a wider flame
+        """
+        folded = {}
+        for sample in self.getSlowSamples():
+            key = ";".join((sample["callback"],) + sample["stack"])
+            folded[key] = folded.get(key, 0) + 1
+        with open(path, "w") as f:
+            for key, count in sorted(folded.iteritems()):
+                f.write("{} {}\n".format(key, count))
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                         cProfile Windows
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def startProfile(self):
+        """
+        Start recording a cProfile of every callback. Callbacks on different threads get their own profile and
+        are merged when the profile stops
+        """
+        if self.__profiles is None:
+            self.__profiles = {}
+
+    def stopProfile(self, path=None):
+        """
+        :param string path: write the profile to this file in the pstats format
+        :return: pstats.Stats of the callbacks since startProfile(), `None` if no callback ran
+        """
+        profiles, self.__profiles = self.__profiles, None
+        if not profiles:
+            return None
+
+        stats = None
+        for profile in profiles.values():
+            profile.create_stats()
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        if path is not None:
+            stats.dump_stats(path)
+        return stats
+
+    def profileFor(self, secs, path):
+        """
+        Record a cProfile of the callbacks for `secs` secs and write it to `path`
+        :return: the timer thread that stops the profile
+        """
+        self.startProfile()
+        t = threading.Timer(secs, self.stopProfile, args=(path,))
+        t.daemon = True
+        t.start()
+        return t
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                         Stats
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def getStats(self):
+        """
+        :return: dict with 'callbacks' (name -> {'count', 'total', 'max'} secs), 'channels'
+                 (channel -> {'count', 'total'} secs) and 'slow' (amount of callbacks over the threshold)
+        """
+        with self.__lock:
+            return {"callbacks": dict((name, {"count": count, "total": total, "max": longest})
+                                      for name, (count, total, longest) in self.__callbacks.iteritems()),
+                    "channels": dict((channel, {"count": count, "total": total})
+                                     for channel, (count, total) in self.__channels.iteritems()),
+                    "slow": self.__slow}
+
+    def getSlowestChannels(self, amount=10):
+        """
+        :return: list of (channel, total secs) of the channels with the most callback time
+        """
+        with self.__lock:
+            totals = [(channel, total) for channel, (count, total) in self.__channels.iteritems()]
+        return sorted(totals, key=lambda item: item[1], reverse=True)[:amount]
+
+    def reset(self):
+        with self.__lock:
+            self.__callbacks.clear()
+            self.__channels.clear()
+            self.__slow = 0
+            self.__samples.clear()
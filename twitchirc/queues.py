@@ -0,0 +1,16 @@
+"""
+    Queue backends for the IRC join pipeline.
+
+    A queue factory is a callable that takes no arguments and returns a new queue with the `Queue.Queue` interface.
+    Give one to the IRC constructor with `queueFactory=`. The queue holds the IRC's own bookkeeping of queued
+    channels, it is not a way for other code or processes to queue commands.
+"""
+import Queue
+
+
+def threadQueue():
+    """
+    In-process queue. Default backend, commands never leave the process
+    :return: Queue.Queue
+    """
+    return Queue.Queue()
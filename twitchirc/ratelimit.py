@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import deque
+
+try:
+    from time import monotonic
+except ImportError:  # python 2
+    from monotonic import monotonic
+
+
+class RateLimiter(object):
+    """
+        Sliding log rate limiter. Allows at most `limit` commands in any `period` second window.
+
+        Unlike a fixed window, there is no burst at the edge of a window: a command's slot frees up exactly
+        `period` seconds after it was sent. Commands are sent immediately while budget is available,
+        otherwise acquire() sleeps exactly until the oldest command leaves the window.
+    """
+
+    def __init__(self, limit, period, clock=monotonic, sleep=time.sleep):
+        """
+        :param int limit: max amount of commands per window
+        :param float period: length of the window in seconds
+        :param clock: monotonic clock returning seconds
+        :param sleep: sleep function used while waiting for budget
+        """
+        if limit < 1 or period <= 0:
+            raise ValueError("limit must be at least 1 and period greater than 0")
+
+        self.limit = limit
+        self.period = period
+        self.__clock = clock
+        self.__sleep = sleep
+        self.__log = deque()
+        self.__lock = threading.Lock()
+
+    def __expire(self, now):
+        log = self.__log
+        horizon = now - self.period
+        while log and log[0] <= horizon:
+            log.popleft()
+
+    def delay(self):
+        """
+        :return: seconds until the next command may be sent. 0 if it can be sent now
+        """
+        with self.__lock:
+            now = self.__clock()
+            self.__expire(now)
+            if len(self.__log) < self.limit:
+                return 0
+            return self.__log[0] + self.period - now
+
+    def remaining(self):
+        """
+        :return: amount of commands that can be sent right now
+        """
+        with self.__lock:
+            self.__expire(self.__clock())
+            return self.limit - len(self.__log)
+
+    def tryAcquire(self):
+        """
+        Use one command of the budget if available
+        :return: True if the command may be sent
+        """
+        with self.__lock:
+            now = self.__clock()
+            self.__expire(now)
+            if len(self.__log) < self.limit:
+                self.__log.append(now)
+                return True
+            return False
+
+    def acquire(self, timeout=None):
+        """
+        Block until one command of the budget is available and use it
+        :param float timeout: max seconds to wait. Waits forever if `None`
+        :return: True if the command may be sent, False if the timeout expired first
+        """
+        deadline = None if timeout is None else self.__clock() + timeout
+        while not self.tryAcquire():
+            wait = self.delay()
+            if deadline is not None:
+                left = deadline - self.__clock()
+                if left <= 0:
+                    return False
+                wait = min(wait, left)
+            if wait > 0:
+                self.__sleep(wait)
+        return True
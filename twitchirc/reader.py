@@ -0,0 +1,106 @@
+from collections import deque
+
+DEFAULT_BUFFER_SIZE = 16384
+
+
+class LineReader(object):
+    """
+        Buffered line reader for IRC sockets.
+
+        Data is received in large chunks into a reusable buffer and split on IRC newlines.
+        Incomplete lines are kept until the rest of the line arrives with a later read.
+    """
+
+    def __init__(self, conn=None, bufferSize=DEFAULT_BUFFER_SIZE):
+        """
+        :param socket conn: connected socket to read from. May be `None` if data is given with feed()
+        :param int bufferSize: max amount of bytes to receive per recv call
+        """
+        self.__conn = conn
+        self.__buffer = bytearray(bufferSize)
+        self.__view = memoryview(self.__buffer)
+        self.__partial = ""
+        self.__lines = deque()
+        self.__bytes = 0
+
+    def readline(self):
+        """
+        Get the next line received from the socket, without the trailing newline
+
+        :return: the next line or `None` if the connection has been closed
+        :exception socket.error when the socket fails to receive
+        """
+        lines = self.__lines
+        while not lines:
+            if not self.__fill():
+                return None
+
+        return lines.popleft()
+
+    def __iter__(self):
+        """
+        Yield whole lines until the connection is closed
+        """
+        while True:
+            line = self.readline()
+            if line is None:
+                return
+            yield line
+
+    def pending(self):
+        """
+        :return: True if whole lines are buffered and can be read without calling recv
+        """
+        return len(self.__lines) > 0
+
+    def reset(self, conn=None):
+        """
+        Drop all buffered data. Optionally start reading from a new socket
+        :param socket conn: new socket to read from
+        """
+        if conn is not None:
+            self.__conn = conn
+        self.__partial = ""
+        self.__lines.clear()
+
+    def __fill(self):
+        size = self.__conn.recv_into(self.__buffer)
+        if not size:
+            return False
+
+        self.feed(self.__view[:size].tobytes())
+        return True
+
+    def feed(self, data):
+        """
+        Split received data into lines. Used directly by event loops that do their own recv calls
+        :param string data: data received from the socket
+        :return: amount of whole lines buffered
+        """
+        self.__bytes += len(data)
+        if self.__partial:
+            data = self.__partial + data
+
+        lines = data.split("\n")
+        self.__partial = lines.pop()  # incomplete line (or empty string) to finish on the next read
+
+        for line in lines:
+            if line[-1:] == "\r":  # IRC newlines are \r\n
+                line = line[:-1]
+            self.__lines.append(line)
+        return len(self.__lines)
+
+    def popLines(self):
+        """
+        Take all buffered whole lines
+        :return: list of lines
+        """
+        lines = list(self.__lines)
+        self.__lines.clear()
+        return lines
+
+    def getBytesRead(self):
+        """
+        :return: amount of bytes received
+        """
+        return self.__bytes
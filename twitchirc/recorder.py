@@ -0,0 +1,208 @@
+"""
+    Record the raw lines of a connection and replay them without a network.
+
+    Give the IRC a Recorder and every line the recv thread reads is written with its receive time to a gzip log
+    that rotates once it gets large. A log left by an earlier process is rotated away, never appended to, and the
+    flushed lines of a log whose process died before close() can still be read:
+
+        irc = MyIRC("oauth:abcdefghijklmnopqrstuvwxyz", "username", recorder=Recorder("logs/chat.log.gz"))
+
+    replay() feeds a log back through onResponse() of any IRC, at the recorded pace, N times faster or as fast as
+    possible, so callbacks can be debugged and profiled on real traffic:
+
+        replay(MyIRC("oauth:abcdefghijklmnopqrstuvwxyz", "username"), logFiles("logs/chat.log.gz"), speed=10)
+"""
+import gzip
+import os
+import threading
+import time
+import zlib
+
+from twitchirc.ratelimit import monotonic
+
+MAX_BYTES = 64 * 1024 * 1024  # uncompressed bytes per log file before it is rotated
+BACKUP_COUNT = 5  # rotated log files kept
+FLUSH_INTERVAL = 5  # max secs a recorded line stays in memory before it is flushed to the file
+READ_SIZE = 64 * 1024  # compressed bytes read from a log at a time
+GZIP_WBITS = 16 + zlib.MAX_WBITS  # zlib window bits that decode one gzip member
+
+REALTIME = 1.0
+FASTEST = None
+
+# lines answered by the recv thread itself, never given to onResponse()
+CONNECTION_LINES = ("PING :tmi.twitch.tv", "RECONNECT :tmi.twitch.tv")
+
+
+class Recorder(object):
+    def __init__(self, path, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, flushInterval=FLUSH_INTERVAL,
+                 clock=time.time):
+        """
+        :param string path: gzip log file. Rotated files are named path.1 (newest) to path.<backupCount>
+        :param int maxBytes: uncompressed bytes written to a file before it is rotated. 0 to never rotate
+        :param int backupCount: rotated files to keep
+        :param float flushInterval: max secs between flushes of the compressed data to the file
+        :param clock: wall clock of the recorded timestamps
+        """
+        self.__path = path
+        self.__maxBytes = maxBytes
+        self.__backupCount = backupCount
+        self.__flushInterval = flushInterval
+        self.__clock = clock
+        self.__lock = threading.Lock()
+        self.__file = None
+        self.__closed = False
+        self.__written = 0
+        self.__flushedAt = monotonic()
+
+    def record(self, line):
+        """
+        Append a received line with the current time. Lines recorded after close() are ignored
+        :param string line: raw line without the trailing newline
+        """
+        entry = "{:.6f}\t{}\n".format(self.__clock(), line)
+        with self.__lock:
+            if self.__closed:
+                return
+            if self.__file is None:
+                self.__open()
+            elif self.__maxBytes and self.__written + len(entry) > self.__maxBytes:
+                self.__rotate()
+
+            self.__file.write(entry)
+            self.__written += len(entry)
+
+            now = monotonic()
+            if now - self.__flushedAt >= self.__flushInterval:
+                self.__file.flush()
+                self.__flushedAt = now
+
+    def flush(self):
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.flush()
+
+    def close(self):
+        with self.__lock:
+            self.__closed = True
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
+
+    def __open(self):
+        directory = os.path.dirname(self.__path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        # the log of an earlier process may lack its gzip trailer, lines appended after it would be unreadable
+        if os.path.exists(self.__path):
+            self.__shift()
+        self.__file = gzip.open(self.__path, "wb")
+        self.__written = 0
+
+    def __rotate(self):
+        self.__file.close()
+        self.__shift()
+        self.__open()
+
+    def __shift(self):
+        """
+        Move the log to path.1 and the older logs one number up, dropping the oldest
+        """
+        if self.__backupCount > 0:
+            for i in xrange(self.__backupCount - 1, 0, -1):
+                older = "{}.{}".format(self.__path, i)
+                if os.path.exists(older):
+                    os.rename(older, "{}.{}".format(self.__path, i + 1))
+            os.rename(self.__path, self.__path + ".1")
+        else:
+            os.remove(self.__path)
+
+
+def logFiles(path):
+    """
+    :param string path: log file given to the Recorder
+    :return: the existing log files of the recorder, oldest first
+    """
+    rotated = []
+    i = 1
+    while os.path.exists("{}.{}".format(path, i)):
+        rotated.append("{}.{}".format(path, i))
+        i += 1
+    files = list(reversed(rotated))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def readLog(paths):
+    """
+    Read recorded lines
+    :param paths: log file or list of log files, oldest first
+    :return: generator of (timestamp, line)
+    """
+    if isinstance(paths, basestring):
+        paths = [paths]
+
+    for path in paths:
+        for entry in _readLines(path):
+            timestamp, sep, line = entry.partition("\t")
+            if sep:
+                yield float(timestamp), line
+
+
+def _readLines(path):
+    """
+    Decompress the gzip members of a log line by line. Unlike gzip.open() this doesn't raise on a last member
+    without a trailer, the log of a process that died before close() ends after its last flushed line
+    :return: generator of lines without the newline
+    """
+    with open(path, "rb") as f:
+        decompressor = zlib.decompressobj(GZIP_WBITS)
+        pending = ""
+        while True:
+            data = f.read(READ_SIZE)
+            if not data:
+                return  # a partial last line was never completely flushed
+
+            while data:
+                try:
+                    pending += decompressor.decompress(data)
+                except zlib.error:
+                    return  # corrupt data, nothing after it can be read
+                data = decompressor.unused_data
+                if data:  # the next member starts
+                    decompressor = zlib.decompressobj(GZIP_WBITS)
+
+            lines = pending.split("\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line
+
+
+def replay(irc, paths, speed=REALTIME, sleep=time.sleep, clock=monotonic):
+    """
+    Feed recorded lines to irc.onResponse() without connecting
+    :param IRC irc: IRC whose callbacks get the lines
+    :param paths: log file or list of log files, oldest first. See logFiles()
+    :param float speed: 1 for the recorded pace, N for N times faster, FASTEST (`None`) for no waiting
+    :return: amount of lines replayed
+    """
+    if speed is not None and speed <= 0:
+        raise ValueError("speed must be greater than 0")
+
+    count = 0
+    first = None
+    start = clock()
+    for timestamp, line in readLog(paths):
+        if line in CONNECTION_LINES:
+            continue
+
+        if speed is not None:
+            if first is None:
+                first = timestamp
+            delay = start + (timestamp - first) / speed - clock()
+            if delay > 0:
+                sleep(delay)
+
+        irc.onResponse(line)
+        count += 1
+    return count
@@ -0,0 +1,180 @@
+"""
+    Live chatters of the joined channels, kept from membership events.
+
+    The IRC updates the roster from JOIN, PART, MODE, NAMES (353) and the messages of each channel, so questions
+    like "is viewer X in channel Y" or "who are the mods here" don't need the chatters API:
+
+        irc = MyIRC("oauth:abcdefghijklmnopqrstuvwxyz", "username", roster=Roster())
+        irc.getRoster().contains("channel", "viewer")
+
+    Note: Twitch only sends JOIN/PART for channels with less than 1000 chatters and batches them every few secs.
+    Seed large channels once from the chatters API with IRC.seedRoster().
+"""
+import heapq
+import threading
+
+from twitchirc.ratelimit import monotonic
+
+MAX_CHATTERS = 50000  # max chatters kept per channel. The least recently seen are evicted first
+EVICT_RATIO = 0.1  # part of the chatters evicted at once when a channel is full, so eviction is amortized O(1)
+
+
+class _Channel(object):
+    __slots__ = ("seen", "mods", "seeded")
+
+    def __init__(self):
+        self.seen = {}  # name -> last seen time
+        self.mods = set()
+        self.seeded = False
+
+
+class Roster(object):
+    def __init__(self, maxChatters=MAX_CHATTERS, clock=monotonic):
+        """
+        :param int maxChatters: max chatters kept per channel
+        """
+        if maxChatters < 1:
+            raise ValueError("maxChatters must be at least 1")
+
+        self.__maxChatters = maxChatters
+        self.__clock = clock
+        self.__channels = {}  # channel -> _Channel
+        self.__lock = threading.Lock()
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                         Updates
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def join(self, channel, name):
+        """
+        A chatter joined a channel
+        """
+        with self.__lock:
+            self.__add(self.__channel(channel), name, self.__clock())
+
+    def seen(self, channel, name):
+        """
+        A chatter sent a message to a channel
+        """
+        self.join(channel, name)
+
+    def part(self, channel, name):
+        with self.__lock:
+            room = self.__channels.get(channel)
+            if room is not None:
+                room.seen.pop(name, None)
+                room.mods.discard(name)
+
+    def names(self, channel, names):
+        """
+        Chatters listed by a NAMES (353) reply
+        :param names: list of names
+        """
+        with self.__lock:
+            room = self.__channel(channel)
+            now = self.__clock()
+            for name in names:
+                self.__add(room, name, now)
+
+    def setModerator(self, channel, name, isModerator):
+        with self.__lock:
+            room = self.__channel(channel)
+            if isModerator:
+                self.__add(room, name, self.__clock())
+                room.mods.add(intern(name))
+            else:
+                room.mods.discard(name)
+
+    def seed(self, channel, viewers):
+        """
+        Add the chatters of a getViewers() result. A channel is only seeded once
+        :param dict viewers: getViewers() result
+        :return: False if the channel was already seeded
+        """
+        with self.__lock:
+            room = self.__channel(channel)
+            if room.seeded:
+                return False
+            room.seeded = True
+
+            now = self.__clock()
+            for group, names in viewers['viewers'].iteritems():
+                for name in names:
+                    name = name.encode("utf-8") if isinstance(name, unicode) else name
+                    if name not in room.seen:
+                        self.__add(room, name, now)
+                    if group in ("moderators", "broadcaster"):
+                        room.mods.add(intern(name))
+            return True
+
+    def removeChannel(self, channel):
+        """
+        Forget a channel. Ex: after parting it
+        """
+        with self.__lock:
+            self.__channels.pop(channel, None)
+
+    def __channel(self, channel):
+        room = self.__channels.get(channel)
+        if room is None:
+            room = self.__channels[channel] = _Channel()
+        return room
+
+    def __add(self, room, name, now):
+        seen = room.seen
+        if name not in seen and len(seen) >= self.__maxChatters:
+            self.__evict(room)
+        seen[intern(name)] = now
+
+    def __evict(self, room):
+        amount = max(1, int(self.__maxChatters * EVICT_RATIO))
+        for name in heapq.nsmallest(amount, room.seen, key=room.seen.get):
+            del room.seen[name]
+            room.mods.discard(name)
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                         Lookups
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def contains(self, channel, name):
+        room = self.__channels.get(channel)
+        return room is not None and name in room.seen
+
+    def isModerator(self, channel, name):
+        room = self.__channels.get(channel)
+        return room is not None and name in room.mods
+
+    def getLastSeen(self, channel, name):
+        """
+        :return: clock time the chatter last joined or spoke in the channel, `None` if not in the channel
+        """
+        room = self.__channels.get(channel)
+        return None if room is None else room.seen.get(name)
+
+    def getChatters(self, channel):
+        """
+        :return: set of chatters of the channel
+        """
+        with self.__lock:
+            room = self.__channels.get(channel)
+            return set() if room is None else set(room.seen)
+
+    def getModerators(self, channel):
+        with self.__lock:
+            room = self.__channels.get(channel)
+            return set() if room is None else set(room.mods)
+
+    def count(self, channel):
+        room = self.__channels.get(channel)
+        return 0 if room is None else len(room.seen)
+
+    def isSeeded(self, channel):
+        room = self.__channels.get(channel)
+        return room is not None and room.seeded
+
+    def getChannels(self):
+        return list(self.__channels)
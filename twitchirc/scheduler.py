@@ -0,0 +1,178 @@
+import threading
+from collections import deque
+
+from twitchirc.ratelimit import RateLimiter, monotonic
+
+# https://help.twitch.tv/customer/portal/articles/1302780-twitch-irc
+CHANNEL_LIMIT = 1  # messages per CHANNEL_PERIOD secs in a channel the account isn't a moderator of
+CHANNEL_PERIOD = 1
+
+
+class SendScheduler(object):
+    """
+        Send queue that keeps one queue per channel and round-robins across the channels with pending commands.
+
+        Every command uses the global (account) rate limiter. Commands for a channel the account isn't a
+        moderator of also use that channel's own limiter, so a burst of replies to one busy channel can't
+        starve the other channels. Commands not tied to a channel go to their own queue with only the
+        global limit.
+    """
+
+    def __init__(self, limiter, channelLimit=CHANNEL_LIMIT, channelPeriod=CHANNEL_PERIOD, clock=monotonic,
+                 onSend=None):
+        """
+        :param RateLimiter limiter: global rate limiter of the account
+        :param int channelLimit: max messages per `channelPeriod` secs in channels the account doesn't moderate
+        :param float channelPeriod:
+        :param clock: monotonic clock returning seconds
+        :param onSend: called with the secs a command was queued for every command handed out by get()
+        """
+        self.__limiter = limiter
+        self.__channelLimit = channelLimit
+        self.__channelPeriod = channelPeriod
+        self.__clock = clock
+        self.__onSend = onSend
+
+        self.__queues = {}  # channel -> deque of (time queued, command)
+        self.__ready = deque()  # channels with pending commands, in round-robin order
+        self.__channelLimiters = {}
+        self.__mods = set()
+        self.__size = 0
+        self.__throttled = 0.0  # secs get() waited on the limiters while commands were queued
+        self.__cond = threading.Condition(threading.Lock())
+
+    def put(self, command, channel=None):
+        """
+        Queue a command
+        :param string command: raw IRC command
+        :param string channel: channel the command is sent to. `None` if it isn't tied to a channel
+        """
+        with self.__cond:
+            q = self.__queues.get(channel)
+            if q is None:
+                q = self.__queues[channel] = deque()
+            if not q:
+                self.__ready.append(channel)
+            q.append((self.__clock(), command))
+            self.__size += 1
+            self.__cond.notify()
+
+    def get(self, timeout=None):
+        """
+        Block until a command can be sent without breaking the global or channel rate limits
+        :param float timeout: max secs to wait. Waits forever if `None`
+        :return: the command or `None` if the timeout expired first
+        """
+        deadline = None if timeout is None else self.__clock() + timeout
+        with self.__cond:
+            while True:
+                wait = None
+                if self.__ready:
+                    wait = self.__limiter.delay()
+                    if wait <= 0:
+                        found, channel, wait = self.__nextChannel()
+                        if found:
+                            if self.__limiter.tryAcquire():
+                                return self.__pop(channel)
+                            wait = self.__limiter.delay()  # global budget used by someone else
+
+                if deadline is not None:
+                    left = deadline - self.__clock()
+                    if left <= 0:
+                        return None
+                    wait = left if wait is None else min(wait, left)
+
+                if self.__ready:
+                    start = self.__clock()
+                    self.__cond.wait(wait)
+                    self.__throttled += self.__clock() - start
+                else:
+                    self.__cond.wait(wait)
+
+    def __nextChannel(self):
+        """
+        Find the next channel in round-robin order whose own limit allows sending
+        :return: (True, channel, None) or (False, None, secs until a channel may send)
+        """
+        ready = self.__ready
+        wait = None
+        for _ in xrange(len(ready)):
+            channel = ready[0]
+            limiter = self.__channelLimiter(channel)
+            if limiter is None:
+                return True, channel, None
+
+            delay = limiter.delay()
+            if delay <= 0:
+                return True, channel, None
+            wait = delay if wait is None else min(wait, delay)
+            ready.rotate(-1)
+        return False, None, wait
+
+    def __pop(self, channel):
+        limiter = self.__channelLimiter(channel)
+        if limiter is not None:
+            limiter.tryAcquire()
+
+        q = self.__queues[channel]
+        queuedAt, command = q.popleft()
+        self.__size -= 1
+        if self.__onSend is not None:
+            self.__onSend(self.__clock() - queuedAt)
+
+        self.__ready.popleft()
+        if q:
+            self.__ready.append(channel)  # back of the line
+        else:
+            del self.__queues[channel]
+        return command
+
+    def __channelLimiter(self, channel):
+        if channel is None or channel in self.__mods:
+            return None
+
+        limiter = self.__channelLimiters.get(channel)
+        if limiter is None:
+            limiter = self.__channelLimiters[channel] = RateLimiter(self.__channelLimit, self.__channelPeriod,
+                                                                    clock=self.__clock)
+        return limiter
+
+    def setModerator(self, channel, isModerator):
+        """
+        Moderators aren't limited per channel, only by the global limit
+        :param string channel:
+        :param bool isModerator: True if the account is a moderator (or the broadcaster) of the channel
+        """
+        with self.__cond:
+            if isModerator:
+                self.__mods.add(channel)
+            else:
+                self.__mods.discard(channel)
+            self.__cond.notify()
+
+    def isModerator(self, channel):
+        return channel in self.__mods
+
+    def qsize(self, channel=None):
+        """
+        :param string channel: only count the commands of this channel
+        :return: amount of queued commands
+        """
+        if channel is None:
+            return self.__size
+
+        q = self.__queues.get(channel)
+        return len(q) if q else 0
+
+    def getThrottledTime(self):
+        """
+        :return: total secs get() waited on the rate limiters while commands were queued
+        """
+        return self.__throttled
+
+    def getQueueDepths(self):
+        """
+        :return: dict of channel -> amount of queued commands. Commands without a channel are under `None`
+        """
+        with self.__cond:
+            return dict((channel, len(q)) for channel, q in self.__queues.iteritems())
@@ -0,0 +1,139 @@
+"""
+    Aggregate the outbound rate budget of several accounts.
+
+    Each account can only send 20 (100 for mod bots) commands per 30 secs. SendPool holds several connected
+    IRC instances, one per account, and sends each message through the account with the most budget left
+    that is allowed in the channel:
+
+        pool = SendPool([botA, botB, botC])
+        pool.sendMessage("channel", "hello")
+        print pool.getUsage()
+"""
+import threading
+
+from twitchirc.exception import IllegalArgumentError
+
+# affinity options
+CHANNEL = "channel"  # a channel sticks to one account while it has queued messages, keeping their order
+NONE = "none"  # every message goes to the account with the most budget. Messages of a channel may be reordered
+
+
+class SendPool(object):
+    def __init__(self, accounts=None, affinity=CHANNEL):
+        """
+        :param accounts: list of connected IRC instances, one per account
+        :param affinity: CHANNEL or NONE
+        """
+        if affinity not in (CHANNEL, NONE):
+            raise IllegalArgumentError("Unknown affinity: {}".format(affinity))
+
+        self.__affinity = affinity
+        self.__accounts = []
+        self.__allowed = {}  # account -> set of channels or None for all channels
+        self.__blocked = {}  # account -> set of channels
+        self.__sticky = {}  # channel -> account
+        self.__sent = {}  # account -> amount of commands routed through it
+        self.__lock = threading.Lock()
+
+        for account in accounts or []:
+            self.addAccount(account)
+
+    def addAccount(self, account, channels=None):
+        """
+        :param IRC account: connected IRC instance
+        :param channels: channels this account may send to. `None` for every channel
+        """
+        with self.__lock:
+            self.__accounts.append(account)
+            self.__allowed[account] = None if channels is None else set(channels)
+            self.__blocked[account] = set()
+            self.__sent[account] = 0
+
+    def removeAccount(self, account):
+        with self.__lock:
+            self.__accounts.remove(account)
+            for table in (self.__allowed, self.__blocked, self.__sent):
+                del table[account]
+            for channel, sticky in self.__sticky.items():
+                if sticky is account:
+                    del self.__sticky[channel]
+
+    def setAllowed(self, account, channel, allowed):
+        """
+        Allow or block an account in a channel. Ex: block an account from onNotice() after it got banned
+        :param IRC account:
+        :param string channel:
+        :param bool allowed:
+        """
+        with self.__lock:
+            if allowed:
+                self.__blocked[account].discard(channel)
+            else:
+                self.__blocked[account].add(channel)
+
+    def isAllowed(self, account, channel):
+        allowed = self.__allowed[account]
+        return channel not in self.__blocked[account] and (allowed is None or channel in allowed)
+
+    def getAccounts(self):
+        return list(self.__accounts)
+
+    def getUsage(self):
+        """
+        :return: dict of username -> {'limit', 'used', 'remaining', 'queued', 'sent'} budget usage
+        """
+        usage = {}
+        with self.__lock:
+            for account in self.__accounts:
+                limiter = account.getSendLimiter()
+                remaining = limiter.remaining()
+                usage[account.getUsername()] = {'limit': limiter.limit,
+                                                'used': limiter.limit - remaining,
+                                                'remaining': remaining,
+                                                'queued': account.getQueueDepth(),
+                                                'sent': self.__sent[account]}
+        return usage
+
+    def sendMessage(self, channelName, msg):
+        """
+        Send a message through the account with the most budget left that is allowed in the channel
+        :param channelName: channel to send the message to
+        :param msg: message to send
+        :return: the IRC the message was given to
+        :exception IllegalArgumentError when no account is allowed in the channel
+        """
+        account = self.__pick(channelName)
+        account.sendMessage(channelName, msg)
+        return account
+
+    def sendCommand(self, cmd, channel=None):
+        """
+        Send a raw command through the account with the most budget left
+        :return: the IRC the command was given to
+        """
+        account = self.__pick(channel)
+        account.sendCommand(cmd, channel)
+        return account
+
+    def __pick(self, channel):
+        with self.__lock:
+            if self.__affinity == CHANNEL and channel is not None:
+                account = self.__sticky.get(channel)
+                # stay on the account while it still has messages queued for the channel, so order is kept
+                if account is not None and self.isAllowed(account, channel) and \
+                        (account.getQueueDepth(channel) > 0 or account.getSendBudget() > 0):
+                    self.__sent[account] += 1
+                    return account
+
+            candidates = [account for account in self.__accounts if channel is None or
+                          self.isAllowed(account, channel)]
+            if not candidates:
+                raise IllegalArgumentError("No account is allowed to send to {}".format(channel))
+
+            # most budget first, then accounts that aren't limited per channel
+            account = max(candidates, key=lambda a: (a.getSendBudget(), channel is not None and
+                                                     a.isModerator(channel)))
+            if self.__affinity == CHANNEL and channel is not None:
+                self.__sticky[channel] = account
+            self.__sent[account] += 1
+            return account
@@ -0,0 +1,365 @@
+"""
+    Spread one channel list across a pool of IRC connections.
+
+    A single socket and recv thread can only read so much chat. ShardedIRC opens `shards` connections for one
+    account, gives each connection a share of the channels and forwards every callback to one handler object:
+
+        class Handler(object):
+            def onMessage(self, channel, viewer, message):
+                pool.sendMessage(channel, "hi {}".format(viewer))  # sent by the connection that owns the channel
+
+        pool = ShardedIRC("oauth:abcdefghijklmnopqrstuvwxyz", "username", Handler(), shards=4, policy=RATE)
+        pool.connect()
+        pool.joinChannels(channels)
+        pool.serverForever()
+
+    With `ircClass=AsyncIRC` the shards share one event loop, which connect() and serverForever() run. Callbacks
+    and the automatic rebalancing then run on the thread that called serverForever().
+"""
+import threading
+import time
+
+from twitchirc.asyncirc import AsyncIRC, POLL_INTERVAL, loop
+from twitchirc.exception import IllegalArgumentError
+from twitchirc.irc import IRC, CALLBACKS, acceptsTags, JOIN_LIMIT, JOIN_PERIOD, COMMAND_LIMIT, MOD_COMMAND_LIMIT, \
+    COMMAND_PERIOD
+from twitchirc.ratelimit import RateLimiter, monotonic
+from twitchirc.tls import TLS
+
+# channel placement policies
+COUNT = "count"  # give new channels to the shard with the fewest channels
+RATE = "rate"  # give new channels to the shard with the lowest observed message rate
+
+REBALANCE_RATIO = 1.5  # rebalance when the hottest shard has this many times the load of the coldest one
+
+
+class _ShardCallbacks(object):
+    """
+        Mixin for the IRC class of the shards. Counts messages per channel and forwards callbacks to the handler
+    """
+
+    def __init__(self, handler, *args, **kwargs):
+        super(_ShardCallbacks, self).__init__(*args, **kwargs)
+        self.__handler = handler
+        self.__tagCallbacks = set(name for name in CALLBACKS if acceptsTags(getattr(handler, name, None)))
+        self.__counts = {}
+
+    def takeCounts(self):
+        """
+        :return: dict of channel -> messages received since the last call
+        """
+        counts, self.__counts = self.__counts, {}
+        return counts
+
+    def __forward(self, name, tags, *args):
+        callback = getattr(self.__handler, name, None)
+        if callback is None:
+            return
+
+        if name in self.__tagCallbacks:
+            callback(*args, tags=tags)
+        else:
+            callback(*args)
+
+    def onMessage(self, channel, viewer, message, tags=None):
+        self.__counts[channel] = self.__counts.get(channel, 0) + 1
+        self.__forward("onMessage", tags, channel, viewer, message)
+
+    def onCommand(self, channel, viewer, command, value, tags=None):
+        self.__counts[channel] = self.__counts.get(channel, 0) + 1
+        self.__forward("onCommand", tags, channel, viewer, command, value)
+
+    def onJoinPart(self, channel, viewer, state, tags=None):
+        self.__forward("onJoinPart", tags, channel, viewer, state)
+
+    def onMode(self, channel, viewer, state, tags=None):
+        self.__forward("onMode", tags, channel, viewer, state)
+
+    def onNotice(self, channel, msgID, message, tags=None):
+        self.__forward("onNotice", tags, channel, msgID, message)
+
+    def onHostTarget(self, hostingChannel, targetChannel, amount, tags=None):
+        self.__forward("onHostTarget", tags, hostingChannel, targetChannel, amount)
+
+    def onClearChat(self, channel, viewer, tags=None):
+        self.__forward("onClearChat", tags, channel, viewer)
+
+    def onUserNotice(self, channel, message, tags=None):
+        self.__forward("onUserNotice", tags, channel, message)
+
+    def onUserState(self, channel, tags=None):
+        self.__forward("onUserState", tags, channel)
+
+    def onRoomState(self, channel, tags=None):
+        self.__forward("onRoomState", tags, channel)
+
+    def onIRCInfo(self, line, tags=None):
+        self.__forward("onIRCInfo", tags, line)
+
+    def forwardEvent(self, event):
+        self.__handler.onEvent(event)
+
+
+class ShardedIRC(object):
+    def __init__(self, oauthToken, username, handler, shards=2, policy=COUNT, ircClass=IRC, modBot=False,
+                 rebalanceInterval=None, **ircArgs):
+        """
+        :param oauthToken: twitch oauth token include the `oauth:` prefix
+        :param username: twitch.tv username associated with the ouath token
+        :param handler: object with the IRC callbacks (onMessage, onCommand, ...) to forward events to.
+                        Callbacks the handler doesn't define are ignored
+        :param shards: amount of connections
+        :param policy: COUNT or RATE. How new channels are placed
+        :param ircClass: IRC or AsyncIRC (or a subclass) used for the connections
+        :param rebalanceInterval: secs between automatic rebalance() calls. `None` to only rebalance manually
+        :param ircArgs: extra arguments for the ircClass constructor
+        :exception IllegalArgumentError when ircClass doesn't support one of the ircArgs
+        """
+        if shards < 1:
+            raise IllegalArgumentError("At least 1 shard is needed")
+        if policy not in (COUNT, RATE):
+            raise IllegalArgumentError("Unknown shard policy: {}".format(policy))
+
+        # every connection shares one TLS context, or one event loop
+        self.__socketMap = None
+        if issubclass(ircClass, AsyncIRC):
+            self.__socketMap = ircArgs.setdefault("socketMap", {})
+        elif ircArgs.get("tls") is True:
+            ircArgs["tls"] = TLS()
+        # the rate limits are per account, so every connection uses the same limiters
+        ircArgs["joinLimiter"] = RateLimiter(JOIN_LIMIT, JOIN_PERIOD)
+        ircArgs["sendLimiter"] = RateLimiter(MOD_COMMAND_LIMIT if modBot else COMMAND_LIMIT, COMMAND_PERIOD)
+        # the shards call the callbacks the handler defines, and count messages for the rebalancing
+        if "callbacks" not in ircArgs and not hasattr(handler, "onEvent"):
+            callbacks = set(name for name in CALLBACKS if hasattr(handler, name))
+            ircArgs["callbacks"] = callbacks | {"onMessage", "onCommand"}
+        # events are only built if the handler takes them
+        members = {"onEvent": _ShardCallbacks.forwardEvent.__func__} if hasattr(handler, "onEvent") else {}
+        shardClass = type("Shard" + ircClass.__name__, (_ShardCallbacks, ircClass), members)
+        self.__shards = [shardClass(handler, oauthToken, username, modBot=modBot, **ircArgs) for _ in xrange(shards)]
+
+        self.__policy = policy
+        self.__owners = {}  # channel -> shard index
+        self.__rates = {}  # channel -> messages/sec seen at the last rebalance
+        self.__lastRebalance = monotonic()
+        self.__lock = threading.RLock()
+
+        self.__rebalanceInterval = rebalanceInterval
+        self.__shutdown = False
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                         Socket Functions
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def connect(self, **kwargs):
+        """
+        Connect and log in every shard. Takes the arguments of IRC.connect().
+        AsyncIRC shards run the event loop until they are logged in
+        """
+        for shard in self.__shards:
+            shard.connect(**kwargs)
+
+        # AsyncIRC shards aren't thread safe, serverForever() rebalances them on the loop
+        if self.__rebalanceInterval and self.__socketMap is None:
+            t = threading.Thread(target=self.__rebalanceWorker)
+            t.daemon = True
+            t.start()
+
+    def serverForever(self, pollInterval=None):
+        """
+        Block until shutdown. Runs the event loop of AsyncIRC shards
+        :param pollInterval: max secs between checks for a shutdown. For AsyncIRC shards the poll interval of the
+                             event loop, see twitchirc.asyncirc.loop()
+        """
+        if self.__socketMap is None:
+            while not self.__shutdown:
+                time.sleep(pollInterval or 0.5)
+            return
+
+        nextRebalance = monotonic() + (self.__rebalanceInterval or 0)
+        while not self.__shutdown and self.__socketMap:
+            loop(self.__socketMap, pollInterval or POLL_INTERVAL, count=1)
+            if self.__rebalanceInterval and monotonic() >= nextRebalance and not self.__shutdown:
+                self.rebalance()
+                nextRebalance = monotonic() + self.__rebalanceInterval
+
+    def shutdown(self):
+        self.__shutdown = True
+        for shard in self.__shards:
+            shard.shutdown()
+
+    def getShards(self):
+        return list(self.__shards)
+
+    def getShard(self, channel):
+        """
+        :param string channel:
+        :return: connection that owns the channel or `None`
+        """
+        index = self.__owners.get(channel)
+        return None if index is None else self.__shards[index]
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                         Channel Functions
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def joinChannel(self, channel):
+        self.joinChannels([channel])
+
+    def partChannel(self, channel):
+        self.partChannels([channel])
+
+    def joinChannels(self, channels):
+        if type(channels) != list:
+            raise TypeError("Channels must be type list")
+
+        with self.__lock:
+            joins = {}
+            for channel in channels:
+                if channel in self.__owners:
+                    continue
+                index = self.__place()
+                self.__owners[channel] = index
+                joins.setdefault(index, []).append(channel)
+
+        for index, shardChannels in joins.iteritems():
+            self.__shards[index].joinChannels(shardChannels)
+
+    def partChannels(self, channels):
+        if type(channels) != list:
+            raise TypeError("Channels must be type list")
+
+        with self.__lock:
+            parts = {}
+            for channel in channels:
+                index = self.__owners.pop(channel)
+                self.__rates.pop(channel, None)
+                parts.setdefault(index, []).append(channel)
+
+        for index, shardChannels in parts.iteritems():
+            self.__shards[index].partChannels(shardChannels)
+
+    def getChannels(self, shard=None):
+        """
+        :param shard: only return the channels of this connection
+        :return: list of channels
+        """
+        return [channel for channel, index in self.__owners.items()
+                if shard is None or self.__shards[index] is shard]
+
+    def __place(self):
+        """
+        :return: index of the shard a new channel should go to
+        """
+        channels = [0] * len(self.__shards)
+        for index in self.__owners.itervalues():
+            channels[index] += 1
+
+        if self.__policy == RATE:
+            loads = self.__loads()
+            return min(xrange(len(self.__shards)), key=lambda i: (loads[i], channels[i]))
+        return min(xrange(len(self.__shards)), key=lambda i: channels[i])
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                            Rebalancing
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def getRates(self):
+        """
+        :return: dict of channel -> messages/sec measured at the last rebalance()
+        """
+        return dict(self.__rates)
+
+    def __loads(self):
+        loads = [0.0] * len(self.__shards)
+        for channel, index in self.__owners.iteritems():
+            loads[index] += self.__rates.get(channel, 0.0)
+        return loads
+
+    def __measure(self):
+        now = monotonic()
+        elapsed = max(now - self.__lastRebalance, 1e-6)
+        self.__lastRebalance = now
+
+        for shard in self.__shards:
+            for channel, count in shard.takeCounts().iteritems():
+                if channel in self.__owners:
+                    self.__rates[channel] = count / elapsed
+        for channel in self.__owners:
+            if channel not in self.__rates:
+                self.__rates[channel] = 0.0
+
+    def rebalance(self, maxMoves=10, ratio=REBALANCE_RATIO):
+        """
+        Measure the message rate of every channel since the last call and move channels from the hottest shard
+        to the coldest one until their loads are within `ratio` of each other.
+        Moved channels are parted on the old connection and joined on the new one
+        :param maxMoves: max amount of channels to move
+        :param ratio: max allowed load ratio between the hottest and coldest shard
+        :return: list of (channel, fromShard, toShard) moves
+        """
+        with self.__lock:
+            self.__measure()
+            moves = []
+            if len(self.__shards) < 2:
+                return moves
+
+            for _ in xrange(maxMoves):
+                loads = self.__loads()
+                hot = max(xrange(len(loads)), key=loads.__getitem__)
+                cold = min(xrange(len(loads)), key=loads.__getitem__)
+                if loads[hot] <= loads[cold] * ratio:
+                    break
+
+                # the channel that brings both shards closest to the middle, without swapping which one is hot
+                gap = (loads[hot] - loads[cold]) / 2
+                candidates = [(abs(self.__rates[channel] - gap), channel) for channel, index in
+                              self.__owners.iteritems() if index == hot and 0 < self.__rates[channel] < gap * 2]
+                if not candidates:
+                    break
+
+                channel = min(candidates)[1]
+                self.__owners[channel] = cold
+                moves.append((channel, hot, cold))
+
+        for channel, hot, cold in moves:
+            self.__shards[hot].partChannels([channel])
+            self.__shards[cold].joinChannels([channel])
+        return [(channel, self.__shards[hot], self.__shards[cold]) for channel, hot, cold in moves]
+
+    def __rebalanceWorker(self):
+        while not self.__shutdown:
+            time.sleep(self.__rebalanceInterval)
+            if not self.__shutdown:
+                self.rebalance()
+
+    """
+    -----------------------------------------------------------------------------------------------
+                                       Communication Functions
+    -----------------------------------------------------------------------------------------------
+    """
+
+    def sendMessage(self, channelName, msg):
+        """
+        Send a message through the connection that owns the channel
+        :param channelName: channel to send the message to
+        :param msg: message to send
+        :exception IllegalArgumentError when the channel wasn't joined through this pool
+        """
+        shard = self.getShard(channelName)
+        if shard is None:
+            raise IllegalArgumentError("Channel {} is not joined".format(channelName))
+        shard.sendMessage(channelName, msg)
+
+    def sendCommand(self, cmd, channel=None):
+        """
+        Send a raw command through the connection that owns the channel, or the first connection
+        """
+        shard = self.getShard(channel) if channel is not None else None
+        (shard or self.__shards[0]).sendCommand(cmd, channel)
@@ -0,0 +1,58 @@
+"""
+    TLS for the IRC connections.
+
+    Give the IRC `tls=True` (or a TLS object) and it connects to port 6697 and does the TLS handshake right after
+    the TCP handshake. A TLS object is meant to be shared by every connection of a process: its SSLContext, whose
+    CA certificate loading is the expensive part, is built once:
+
+        tls = TLS()
+        bots = [MyIRC("oauth:abcdefghijklmnopqrstuvwxyz", "username", tls=tls) for _ in xrange(4)]
+
+    Python 2.7 can't resume client sessions, so every connect and reconnect does a full handshake.
+    Tests use a self-signed certificate with TLS(cafile="localhost.pem").
+"""
+import ssl
+import threading
+
+# raised by the handshake when the server certificate doesn't match the hostname
+CertificateError = ssl.CertificateError
+
+
+def createContext(cafile=None, verify=True):
+    """
+    :param string cafile: PEM file of the trusted certificates. Defaults to the system CA certificates
+    :param bool verify: verify the server certificate and hostname. Only turn off against test servers
+    :return: client ssl.SSLContext
+    """
+    context = ssl.create_default_context(cafile=cafile)
+    if not verify:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class TLS(object):
+    def __init__(self, context=None, cafile=None, verify=True):
+        """
+        :param ssl.SSLContext context: client context to use. Built with createContext(cafile, verify) if `None`
+        """
+        self.context = context if context is not None else createContext(cafile, verify)
+        self.__lock = threading.Lock()
+        self.__handshakes = 0
+
+    def wrap(self, conn, hostname):
+        """
+        Do the TLS handshake on a connected socket
+        :param socket conn: connected TCP socket
+        :param string hostname: name the server certificate must match
+        :return: ssl.SSLSocket
+        :exception ssl.SSLError when the handshake fails
+        :exception CertificateError when the certificate doesn't match the hostname
+        """
+        conn = self.context.wrap_socket(conn, server_hostname=hostname)
+        with self.__lock:
+            self.__handshakes += 1
+        return conn
+
+    def getHandshakes(self):
+        return self.__handshakes
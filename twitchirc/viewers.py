@@ -0,0 +1,227 @@
+"""
+    Cached chatter lists from the Twitch TMI API.
+
+    Each channel is fetched at most once per TTL, and concurrent callers asking for the same channel share one
+    in-flight request. Requests go over a small pool of keep-alive HTTP connections, and getBulk() fetches many
+    channels concurrently:
+
+        cache = ViewerCache(ttl=60)
+        cache.getBulk(["channel1", "channel2", "channel3"])
+"""
+import Queue
+import httplib
+import socket
+import threading
+from json import loads
+from urlparse import urlsplit
+
+from twitchirc.exception import APIError
+from twitchirc.ratelimit import monotonic
+
+TWITCH_TMI_URL = "http://tmi.twitch.tv"
+CHATTERS_PATH = "/group/user/{channel}/chatters"
+
+VIEWERS_TTL = 60  # secs a chatter list is served from the cache
+CONNECTIONS = 8  # max keep-alive connections and concurrent requests
+HTTP_TIMEOUT = 10
+
+
+class _Flight(object):
+    """
+        Request of one channel that every concurrent caller waits on
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _ConnectionPool(object):
+    """
+        Keep-alive HTTP connections to one host. Connections are reused until the server closes them
+    """
+
+    def __init__(self, baseUrl, size=CONNECTIONS, timeout=HTTP_TIMEOUT):
+        url = urlsplit(baseUrl)
+        if url.scheme not in ("http", "https"):
+            raise ValueError("Unsupported base url: {}".format(baseUrl))
+
+        self.__connectionClass = httplib.HTTPSConnection if url.scheme == "https" else httplib.HTTPConnection
+        self.__host = url.netloc
+        self.__prefix = url.path.rstrip("/")
+        self.__timeout = timeout
+        self.__idle = Queue.LifoQueue(size)  # most recently used first, it is the least likely to be closed
+
+    def get(self, path):
+        """
+        GET a path relative to the base url
+        :return: (status, body)
+        :exception httplib.HTTPException, socket.error when the request failed
+        """
+        conn = self.__take()
+        reused = conn.sock is not None
+        try:
+            status, body = self.__request(conn, path)
+        except (httplib.HTTPException, socket.error):
+            conn.close()
+            if not reused:
+                raise
+            # the server closed the idle keep-alive connection, retry once on a new one
+            conn = self.__connectionClass(self.__host, timeout=self.__timeout)
+            try:
+                status, body = self.__request(conn, path)
+            except (httplib.HTTPException, socket.error):
+                conn.close()
+                raise
+
+        self.__release(conn)
+        return status, body
+
+    def __request(self, conn, path):
+        conn.request("GET", self.__prefix + path, headers={"Accept": "application/json"})
+        response = conn.getresponse()
+        body = response.read()  # the whole body has to be read before the connection can be reused
+        if response.will_close:
+            conn.close()
+        return response.status, body
+
+    def __take(self):
+        try:
+            return self.__idle.get_nowait()
+        except Queue.Empty:
+            return self.__connectionClass(self.__host, timeout=self.__timeout)
+
+    def __release(self, conn):
+        if conn.sock is None:
+            return
+        try:
+            self.__idle.put_nowait(conn)
+        except Queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self.__idle.get_nowait().close()
+            except Queue.Empty:
+                return
+
+
+class ViewerCache(object):
+    def __init__(self, baseUrl=TWITCH_TMI_URL, ttl=VIEWERS_TTL, connections=CONNECTIONS, timeout=HTTP_TIMEOUT,
+                 clock=monotonic):
+        """
+        :param string baseUrl: scheme and host of the TMI API. Ex: a local server in tests
+        :param float ttl: secs a chatter list is served from the cache. 0 to always fetch
+        :param int connections: max keep-alive connections and concurrent requests of getBulk()
+        :param float timeout: socket timeout of the HTTP requests
+        """
+        if connections < 1:
+            raise ValueError("At least 1 connection is needed")
+
+        self.__pool = _ConnectionPool(baseUrl, connections, timeout)
+        self.__ttl = ttl
+        self.__connections = connections
+        self.__clock = clock
+        self.__cache = {}  # channel -> (expires at, viewers)
+        self.__flights = {}  # channel -> _Flight
+        self.__lock = threading.Lock()
+
+    def get(self, channel):
+        """
+        Get the chatters of a channel from the cache, or fetch them if they are missing or expired.
+        The result is shared with other callers and must not be modified
+        :param string channel:
+        :return: dict with 'viewers' (dict of group -> list of usernames) and 'count'
+        :exception APIError when the TMI API can't be reached or returned an error
+        """
+        with self.__lock:
+            cached = self.__cache.get(channel)
+            if cached is not None and cached[0] > self.__clock():
+                return cached[1]
+
+            flight = self.__flights.get(channel)
+            leader = flight is None
+            if leader:
+                flight = self.__flights[channel] = _Flight()
+
+        if leader:
+            try:
+                flight.result = self.__fetch(channel)
+            except APIError, e:
+                flight.error = e
+            finally:
+                with self.__lock:
+                    if flight.result is not None and self.__ttl > 0:
+                        self.__cache[channel] = (self.__clock() + self.__ttl, flight.result)
+                    del self.__flights[channel]
+                flight.done.set()
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def getBulk(self, channels):
+        """
+        Get the chatters of many channels, fetching the missing ones concurrently
+        :param channels: list of channels
+        :return: dict of channel -> result of get(), or `None` for channels that couldn't be fetched
+        """
+        channels = list(set(channels))
+        results = {}
+        q = Queue.Queue()
+        for channel in channels:
+            q.put(channel)
+
+        def work():
+            while True:
+                try:
+                    channel = q.get_nowait()
+                except Queue.Empty:
+                    return
+                try:
+                    results[channel] = self.get(channel)
+                except APIError:
+                    results[channel] = None
+
+        threads = [threading.Thread(target=work) for _ in xrange(min(self.__connections, len(channels)))]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def invalidate(self, channel=None):
+        """
+        Drop a channel, or every channel if `None`, from the cache
+        """
+        with self.__lock:
+            if channel is None:
+                self.__cache.clear()
+            else:
+                self.__cache.pop(channel, None)
+
+    def close(self):
+        """
+        Close the idle keep-alive connections
+        """
+        self.__pool.close()
+
+    def __fetch(self, channel):
+        try:
+            status, body = self.__pool.get(CHATTERS_PATH.format(channel=channel))
+        except (httplib.HTTPException, socket.error), e:
+            raise APIError('Unable to connect Twitch API: {}'.format(e))
+
+        if status != httplib.OK:
+            raise APIError('Twitch API returned status {} for {}'.format(status, channel))
+
+        try:
+            data = loads(body.decode('utf-8'))
+            return {'viewers': data['chatters'], 'count': data['chatter_count']}
+        except (ValueError, KeyError, TypeError):
+            raise APIError('Invalid Twitch API response for {}'.format(channel))
@@ -0,0 +1,129 @@
+import errno
+import socket
+import struct
+import threading
+
+from twitchirc.ratelimit import monotonic
+
+WRITE_TIMEOUT = 30  # max secs a write may stall before giving up on the connection
+KEEPALIVE_INTERVAL = 10  # secs between keepalive probes
+KEEPALIVE_COUNT = 3  # unanswered probes before the connection is dropped
+SEND_TIMEOUT = 1  # max secs a single send on a blocking socket waits for buffer space
+
+
+def setNoDelay(conn, enabled=True):
+    """
+    Turn Nagle's algorithm off (or back on) for a TCP socket, so small writes are sent without waiting on ACKs
+    :param socket conn: TCP socket
+    :param bool enabled: True to set TCP_NODELAY
+    """
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1 if enabled else 0)
+
+
+def setKeepAlive(conn, idle, interval=KEEPALIVE_INTERVAL, count=KEEPALIVE_COUNT):
+    """
+    Turn TCP keepalive on, so a connection that silently died is dropped instead of blocking the recv forever.
+    Options the platform doesn't have are skipped
+    :param socket conn: TCP socket
+    :param int idle: secs the connection is idle before the first probe
+    :param int interval: secs between probes
+    :param int count: unanswered probes before the connection is dropped
+    """
+    conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (("TCP_KEEPIDLE", idle), ("TCP_KEEPINTVL", interval), ("TCP_KEEPCNT", count)):
+        if hasattr(socket, option):
+            conn.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+
+def setSendTimeout(conn, timeout=SEND_TIMEOUT):
+    """
+    Bound how long a send on a blocking socket waits for buffer space. A send that times out returns what it
+    wrote, or fails with EAGAIN, so the LineWriter can notice a peer that stopped reading
+    :param socket conn: TCP socket
+    :param float timeout: secs
+    """
+    conn.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, struct.pack("ll", int(timeout), int(timeout % 1 * 1e6)))
+
+
+class LineWriter(object):
+    """
+        Coalescing line writer for IRC sockets.
+
+        Lines that are ready at the same time are joined and written with as few send calls as the socket
+        accepts. Short writes are resumed from the first unsent byte instead of being dropped, and writes from
+        different threads never interleave within a line.
+    """
+
+    def __init__(self, conn=None, timeout=WRITE_TIMEOUT, clock=monotonic):
+        """
+        :param socket conn: connected socket to write to. A blocking socket needs setSendTimeout, else a stalled
+            peer blocks the send forever
+        :param float timeout: max secs a write may make no progress before socket.timeout is raised
+        """
+        self.__conn = conn
+        self.__timeout = timeout
+        self.__clock = clock
+        self.__lock = threading.Lock()
+        self.__writes = 0
+        self.__bytes = 0
+
+    def write(self, data):
+        """
+        Write all of the data
+        :param string data: one or more lines, including the trailing `\\r\\n`
+        :exception socket.error when the socket fails or no data could be written within the timeout
+        """
+        if not data:
+            return
+        if isinstance(data, unicode):
+            data = data.encode("utf-8")
+
+        with self.__lock:
+            self.__sendall(data)
+
+    def writeLines(self, lines):
+        """
+        Write several lines with one buffered write
+        :param lines: list of lines, including the trailing `\\r\\n`
+        """
+        self.write("".join(lines))
+
+    def __sendall(self, data):
+        view = memoryview(data)
+        stalledSince = None
+        while view:
+            try:
+                sent = self.__conn.send(view)
+            except socket.timeout:
+                sent = 0
+            except socket.error, e:
+                if e.errno not in (errno.EINTR, errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
+                sent = 0
+
+            self.__writes += 1
+            if sent:
+                self.__bytes += sent
+                view = view[sent:]
+                stalledSince = None
+            elif stalledSince is None:
+                stalledSince = self.__clock()
+            elif self.__clock() - stalledSince > self.__timeout:
+                raise socket.timeout("Write made no progress for {} secs".format(self.__timeout))
+
+    def reset(self, conn):
+        """
+        Start writing to a new socket
+        :param socket conn: new socket to write to
+        """
+        with self.__lock:
+            self.__conn = conn
+
+    def getWrites(self):
+        """
+        :return: amount of send calls made
+        """
+        return self.__writes
+
+    def getBytesWritten(self):
+        return self.__bytes